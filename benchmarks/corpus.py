@@ -0,0 +1,146 @@
+"""
+Generator of synthetic release trees: multi-disc image+.cue rips with logs,
+dr14 reports and tiny valid flac files.
+Run as: python -m benchmarks.corpus [-d DISCS] [-t TRACKS] output_dir
+"""
+import random
+import pathlib
+import argparse
+import typing as tt
+
+from rt_tools import flac
+
+SAMPLE_RATE = 44100
+COMPOSERS = ("Bach", "Mozart", "Beethoven", "Haydn", "Schubert", "Brahms")
+PIECES = ("Concerto", "Sonata", "Symphony", "Suite", "Partita", "Quartet")
+PARTS = ("I. Allegro", "II. Adagio", "III. Menuetto", "IV. Presto")
+PERFORMERS = ("Berliner Philharmoniker", "Wiener Philharmoniker", "Academy of St Martin in the Fields")
+
+
+def write_flac_header(path: pathlib.Path, sample_rate: int = SAMPLE_RATE, total_samples: int = SAMPLE_RATE * 300):
+    """
+    Write tiny flac file which contains only the STREAMINFO block
+    """
+    packed = (sample_rate << 44) | (1 << 41) | (15 << 36) | total_samples
+    body = (4096).to_bytes(2, "big") * 2 + bytes(6) + packed.to_bytes(8, "big") + bytes(16)
+    path.write_bytes(flac.FLAC_MAGIC + bytes([0x80 | flac.BLOCK_STREAMINFO]) +
+                     len(body).to_bytes(3, "big") + body)
+
+
+def frames_to_msf(frames: int) -> str:
+    return f"{frames // 4500:02}:{frames // 75 % 60:02}:{frames % 75:02}"
+
+
+def make_cue(rnd: random.Random, disc: int, tracks: int) -> tt.Tuple[str, int]:
+    """
+    Generate text of the cue
+    :return: text and total length in CD frames
+    """
+    lines = [
+        'REM GENRE "Classical"',
+        f"REM DATE {rnd.randint(1950, 2020)}",
+        f"REM DISCID {rnd.getrandbits(32):08X}",
+        'REM COMMENT "ExactAudioCopy v1.6"',
+        f'PERFORMER "{rnd.choice(PERFORMERS)}"',
+        f'TITLE "Complete Works CD{disc}"',
+        f'FILE "CD{disc:03}.flac" WAVE',
+    ]
+    frames = 0
+    composer = rnd.choice(COMPOSERS)
+    piece = rnd.choice(PIECES)
+    for num in range(1, tracks + 1):
+        if rnd.random() < 0.25:
+            piece = f"{rnd.choice(PIECES)} No. {rnd.randint(1, 20)}"
+        if rnd.random() < 0.1:
+            composer = rnd.choice(COMPOSERS)
+        lines += [
+            f"  TRACK {num:02} AUDIO",
+            f'    TITLE "{piece}: {PARTS[num % len(PARTS)]}"',
+            f'    PERFORMER "{composer}; {rnd.choice(PERFORMERS)}"',
+            f"    ISRC DEX{rnd.randint(0, 999999999):09}",
+        ]
+        if num > 1 and rnd.random() < 0.3:
+            lines.append(f"    INDEX 00 {frames_to_msf(frames)}")
+            frames += rnd.randint(1, 150)
+        lines.append(f"    INDEX 01 {frames_to_msf(frames)}")
+        frames += rnd.randint(75 * 60, 75 * 60 * 12)
+    return "\r\n".join(lines) + "\r\n", frames
+
+
+def make_log(rnd: random.Random, disc: int, tracks: int) -> str:
+    lines = [
+        "Exact Audio Copy V1.6 from 23. October 2020",
+        "",
+        f"EAC extraction logfile from {rnd.randint(1, 28)}. May 2021",
+        "",
+        f"Complete Works / CD{disc}",
+        "",
+        "Used drive  : PLEXTOR DVDR   PX-716A   Adapter: 1  ID: 0",
+        "Read mode               : Secure",
+        "Read offset correction                      : 30",
+        "",
+    ]
+    for num in range(1, tracks + 1):
+        crc = f"{rnd.getrandbits(32):08X}"
+        lines += [
+            f"Track {num:2}",
+            "",
+            f"     Peak level {rnd.uniform(50, 100):.1f} %",
+            f"     Test CRC {crc}",
+            f"     Copy CRC {crc}",
+            f"     Accurately ripped (confidence {rnd.randint(1, 200)})  [{rnd.getrandbits(32):08X}]  (AR v2)",
+            "     Copy OK",
+            "",
+        ]
+    lines += ["All tracks accurately ripped", "", "No errors occurred", "", "End of status report"]
+    return "\r\n".join(lines) + "\r\n"
+
+
+def make_dr14(rnd: random.Random, tracks: int) -> str:
+    lines = ["", "dr14.t.meter", "-" * 80, ""]
+    for num in range(1, tracks + 1):
+        lines.append(f" DR{rnd.randint(8, 16)}    -{rnd.uniform(0, 3):.2f} dB   -{rnd.uniform(15, 25):.2f} dB  "
+                     f"  {num:02}-track.flac")
+    lines += ["-" * 80, f"Official DR value: DR{rnd.randint(8, 16)}", ""]
+    return "\n".join(lines) + "\n"
+
+
+def generate_release(root: pathlib.Path, discs: int = 10, tracks: int = 20, seed: int = 0) -> tt.List[pathlib.Path]:
+    """
+    Write release tree with given amount of discs
+    :param root: directory to create discs in
+    :param discs: amount of discs
+    :param tracks: amount of tracks per disc
+    :param seed: seed of random generator
+    :return: sorted paths of generated cues
+    """
+    rnd = random.Random(seed)
+    cue_paths = []
+    for disc in range(1, discs + 1):
+        disc_dir = root / f"CD{disc:03}"
+        disc_dir.mkdir(parents=True, exist_ok=True)
+        cue_text, frames = make_cue(rnd, disc, tracks)
+        cue_path = disc_dir / f"CD{disc:03}.cue"
+        cue_path.write_text(cue_text, encoding="utf-8")
+        write_flac_header(cue_path.with_suffix(".flac"), total_samples=frames * SAMPLE_RATE // 75)
+        # EAC writes UTF-16 logs, XLD and others write UTF-8
+        encoding = "utf-16" if disc % 2 else "utf-8"
+        cue_path.with_suffix(".log").write_text(make_log(rnd, disc, tracks), encoding=encoding)
+        (disc_dir / "dr14.txt").write_text(make_dr14(rnd, tracks), encoding="utf-8")
+        cue_paths.append(cue_path)
+    return cue_paths
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-d", "--discs", type=int, default=10, help="Amount of discs, default=10")
+    parser.add_argument("-t", "--tracks", type=int, default=20, help="Amount of tracks per disc, default=20")
+    parser.add_argument("-s", "--seed", type=int, default=0, help="Random seed, default=0")
+    parser.add_argument("output", help="Directory to write release to")
+    args = parser.parse_args()
+    generate_release(pathlib.Path(args.output), discs=args.discs, tracks=args.tracks, seed=args.seed)
+    return 0
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,54 @@
+"""
+Benchmark of flac duration probing: STREAMINFO reader vs ffprobe subprocess.
+Run as: python -m benchmarks.durations [-n FILES] [dir_with_flacs]
+"""
+import time
+import shutil
+import pathlib
+import argparse
+import tempfile
+import typing as tt
+
+from rt_tools import flac, durations
+from benchmarks.corpus import write_flac_header
+
+
+def measure(func: tt.Callable[[pathlib.Path], tt.Any], paths: tt.List[pathlib.Path]) -> float:
+    start = time.perf_counter()
+    for p in paths:
+        func(p)
+    return time.perf_counter() - start
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-n", "--files", type=int, default=2000,
+                        help="Amount of synthetic files to generate, default=2000")
+    parser.add_argument("input", nargs="?", help="Optional directory with real flac files")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        if args.input is not None:
+            paths = sorted(pathlib.Path(args.input).glob("**/*.flac"))
+        else:
+            paths = []
+            for idx in range(args.files):
+                p = pathlib.Path(tmp) / f"{idx:05}.flac"
+                write_flac_header(p)
+                paths.append(p)
+
+        runs = [("streaminfo", lambda p: flac.read_stream_info(p).duration)]
+        if shutil.which("ffprobe") is not None:
+            runs.append(("ffprobe", durations.get_ffprobe_duration))
+        else:
+            print("ffprobe not found, skipping it")
+
+        for name, func in runs:
+            elapsed = measure(func, paths)
+            print(f"{name:>12}: {len(paths)} files in {elapsed:.3f}s, "
+                  f"{len(paths) / elapsed:.0f} files/s")
+    return 0
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,169 @@
+"""
+Benchmark of processing stages on synthetic release corpus.
+Run as: python -m benchmarks.runner [-d DISCS] [-t TRACKS] [--save FILE] [--compare FILE]
+"""
+import sys
+import json
+import time
+import pathlib
+import argparse
+import tempfile
+import tracemalloc
+import typing as tt
+
+from rt_tools.cueparser import CueSheet
+from rt_tools.titles import ComposersMode, TitlesGenerator, TrackRecord, group_performers
+from rt_tools.scripts import cue_gen
+from benchmarks.corpus import generate_release
+
+DEFAULT_THRESHOLD = 0.25
+
+StageFunc = tt.Callable[[], tt.Any]
+
+
+def parse_all(cue_paths: tt.List[pathlib.Path]) -> tt.List[CueSheet]:
+    return [cue_gen.load_cue(p)[1] for p in cue_paths]
+
+
+def split_performer(performer: str) -> tt.Tuple[str, str]:
+    comp, performer = performer.split(";", maxsplit=1)
+    return comp, performer.strip()
+
+
+def render_titles(cues: tt.List[CueSheet]):
+    for cue in cues:
+        TitlesGenerator(ComposersMode.Prepend, separators=[]).add_tracks(
+            TrackRecord(track.number, split_performer(track.performer)[0], track.title)
+            for track in cue.tracks
+        )
+
+
+def group_all(cues: tt.List[CueSheet]):
+    for cue in cues:
+        list(group_performers([split_performer(t.performer)[1] for t in cue.tracks]))
+
+
+def render_output(cue_paths: tt.List[pathlib.Path]):
+    for _ in cue_gen.generate_output(cue_gen.GenMode.Full, cue_paths, ComposersMode.Prepend,
+                                     separators=[], calculate_duration=True):
+        pass
+
+
+def measure(func: StageFunc, repeat: int) -> tt.Tuple[float, int]:
+    """
+    Run the stage
+    :return: best wall time of runs and peak of traced memory in bytes
+    """
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        elapsed = time.perf_counter() - start
+        if best is None or elapsed < best:
+            best = elapsed
+    # separate run, as tracing slows the code down a lot
+    tracemalloc.start()
+    try:
+        func()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return best, peak
+
+
+def retained_per_track(cue_paths: tt.List[pathlib.Path]) -> float:
+    """
+    Memory kept by parsed cues, in bytes per track
+    """
+    tracemalloc.start()
+    try:
+        cues = parse_all(cue_paths)
+        current, _ = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return current / max(1, sum(len(c.tracks) for c in cues))
+
+
+def run(discs: int, tracks: int, repeat: int = 3, seed: int = 0) -> tt.Dict[str, tt.Any]:
+    with tempfile.TemporaryDirectory() as tmp:
+        cue_paths = generate_release(pathlib.Path(tmp), discs=discs, tracks=tracks, seed=seed)
+        cues = parse_all(cue_paths)
+        total_tracks = sum(len(c.tracks) for c in cues)
+        stages: tt.List[tt.Tuple[str, StageFunc]] = [
+            ("parse", lambda: parse_all(cue_paths)),
+            ("titles", lambda: render_titles(cues)),
+            ("performers", lambda: group_all(cues)),
+            ("cue_gen", lambda: render_output(cue_paths)),
+        ]
+        res = {}
+        for name, func in stages:
+            seconds, peak = measure(func, repeat)
+            res[name] = {
+                "seconds": seconds,
+                "tracks_per_sec": total_tracks / seconds if seconds else 0.0,
+                "peak_kb": peak / 1024,
+            }
+        bytes_per_track = retained_per_track(cue_paths)
+    return {
+        "params": {"discs": discs, "tracks": tracks, "seed": seed},
+        "stages": res,
+        "memory": {"bytes_per_track": bytes_per_track},
+    }
+
+
+def compare(results: tt.Dict[str, tt.Any], baseline: tt.Dict[str, tt.Any],
+            threshold: float = DEFAULT_THRESHOLD) -> tt.List[str]:
+    """
+    Compare results with baseline
+    :return: descriptions of stages which became slower than threshold allows
+    """
+    regressions = []
+    for name, base in baseline["stages"].items():
+        cur = results["stages"].get(name)
+        if cur is None:
+            continue
+        ratio = cur["seconds"] / base["seconds"] if base["seconds"] else 1.0
+        if ratio > 1 + threshold:
+            regressions.append(f"{name}: {base['seconds']:.4f}s -> {cur['seconds']:.4f}s ({ratio:.2f}x)")
+    return regressions
+
+
+def format_table(results: tt.Dict[str, tt.Any]) -> tt.Generator[str, None, None]:
+    yield f"{'stage':<12} {'seconds':>10} {'tracks/s':>12} {'peak KiB':>10}"
+    for name, r in results["stages"].items():
+        yield f"{name:<12} {r['seconds']:>10.4f} {r['tracks_per_sec']:>12.0f} {r['peak_kb']:>10.0f}"
+    memory = results.get("memory")
+    if memory is not None:
+        yield f"parsed cues keep {memory['bytes_per_track']:.0f} bytes per track"
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-d", "--discs", type=int, default=50, help="Amount of discs, default=50")
+    parser.add_argument("-t", "--tracks", type=int, default=20, help="Amount of tracks per disc, default=20")
+    parser.add_argument("-r", "--repeat", type=int, default=3, help="Runs of every stage, default=3")
+    parser.add_argument("--save", help="Save results as baseline JSON file")
+    parser.add_argument("--compare", help="Baseline JSON file to compare results with")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help=f"Allowed slowdown relative to baseline, default={DEFAULT_THRESHOLD}")
+    args = parser.parse_args()
+
+    results = run(args.discs, args.tracks, repeat=args.repeat)
+    for l in format_table(results):
+        print(l)
+
+    if args.save is not None:
+        pathlib.Path(args.save).write_text(json.dumps(results, indent=2))
+
+    if args.compare is not None:
+        baseline = json.loads(pathlib.Path(args.compare).read_text())
+        regressions = compare(results, baseline, args.threshold)
+        for r in regressions:
+            print("Regression: " + r, file=sys.stderr)
+        if regressions:
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,251 @@
+"""
+Persistent caches shared between runs of the tools
+"""
+import os
+import time
+import hashlib
+import pathlib
+import sqlite3
+import datetime
+import typing as tt
+
+CACHE_DIR_NAME = "rt_tools"
+DURATIONS_FILE_NAME = "durations.sqlite"
+SECTIONS_FILE_NAME = "sections.sqlite"
+DIGESTS_FILE_NAME = "digests.sqlite"
+# bump when rendering of sections changes, so old entries are never hit
+SECTIONS_VERSION = 2
+SECTIONS_MAX_AGE_DAYS = 30
+
+# identity of file on disk: size, mtime_ns, inode
+FileKey = tt.Tuple[int, int, int]
+
+
+def user_cache_dir() -> pathlib.Path:
+    """
+    Directory for cache files, honors XDG_CACHE_HOME
+    """
+    base = os.environ.get("XDG_CACHE_HOME")
+    if not base:
+        base = os.path.join(os.path.expanduser("~"), ".cache")
+    return pathlib.Path(base) / CACHE_DIR_NAME
+
+
+def file_key(path: pathlib.Path) -> tt.Optional[FileKey]:
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return st.st_size, st.st_mtime_ns, st.st_ino
+
+
+def fingerprint(files: tt.Iterable[tt.Optional[pathlib.Path]], options: tt.Iterable[tt.Any]) -> str:
+    """
+    Fingerprint of rendering inputs: paths and identities of files plus options
+    :param files: input files, None and missing files are allowed
+    :param options: values of options which affect rendering
+    :return: hex digest
+    """
+    h = hashlib.sha1(repr(SECTIONS_VERSION).encode())
+    for path in files:
+        if path is not None:
+            h.update(repr((os.path.abspath(path), file_key(path))).encode())
+        else:
+            h.update(b"None")
+    h.update(repr(tuple(options)).encode())
+    return h.hexdigest()
+
+
+def connect(db_path: pathlib.Path) -> sqlite3.Connection:
+    """
+    Open sqlite database which could be used by several processes at once
+    """
+    db_path.parent.mkdir(parents=True, exist_ok=True)
+    conn = sqlite3.connect(str(db_path), timeout=30)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    return conn
+
+
+class DurationCache:
+    """
+    Durations of audio files keyed by path and file identity. Entry is stale
+    once file's size, mtime or inode changes.
+    """
+    def __init__(self, db_path: tt.Optional[pathlib.Path] = None):
+        if db_path is None:
+            db_path = user_cache_dir() / DURATIONS_FILE_NAME
+        self.db_path = db_path
+        self.hits = 0
+        self.misses = 0
+        self._conn = connect(db_path)
+        with self._conn:
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS durations ("
+                "path TEXT PRIMARY KEY, size INTEGER, mtime_ns INTEGER, inode INTEGER, seconds REAL)"
+            )
+
+    def close(self):
+        self._conn.close()
+
+    def __enter__(self) -> "DurationCache":
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    @staticmethod
+    def _key_path(path: pathlib.Path) -> str:
+        return os.path.abspath(path)
+
+    def get(self, path: pathlib.Path, key: tt.Optional[FileKey] = None) -> tt.Optional[datetime.timedelta]:
+        """
+        :param key: identity of the file if already taken, file is stat'ed otherwise
+        """
+        if key is None:
+            key = file_key(path)
+        row = self._conn.execute(
+            "SELECT size, mtime_ns, inode, seconds FROM durations WHERE path = ?",
+            (self._key_path(path),)
+        ).fetchone()
+        if key is None or row is None or tuple(row[:3]) != key:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return datetime.timedelta(seconds=row[3])
+
+    def put_many(self, items: tt.Iterable[tt.Tuple[pathlib.Path, tt.Optional[FileKey], datetime.timedelta]]):
+        """
+        Store durations with identities of files taken before they were read, so file
+        rewritten during probing is probed again next time. Files without identity are skipped.
+        """
+        rows = [(self._key_path(path), *key, duration.total_seconds())
+                for path, key, duration in items if key is not None]
+        with self._conn:
+            self._conn.executemany("INSERT OR REPLACE INTO durations VALUES (?, ?, ?, ?, ?)", rows)
+
+    def put(self, path: pathlib.Path, duration: datetime.timedelta):
+        self.put_many([(path, file_key(path), duration)])
+
+    def prune(self) -> int:
+        """
+        Remove entries of files which were deleted or changed
+        :return: count of removed entries
+        """
+        stale = []
+        for path, size, mtime_ns, inode in self._conn.execute(
+                "SELECT path, size, mtime_ns, inode FROM durations"):
+            if file_key(pathlib.Path(path)) != (size, mtime_ns, inode):
+                stale.append((path,))
+        with self._conn:
+            self._conn.executemany("DELETE FROM durations WHERE path = ?", stale)
+        return len(stale)
+
+    def stats(self) -> str:
+        return f"Duration cache {self.db_path}: {self.hits} hits, {self.misses} misses"
+
+
+class DigestCache:
+    """
+    Content hashes of files keyed by path and file identity, entry is stale
+    once file's size, mtime or inode changes
+    """
+    def __init__(self, db_path: tt.Optional[pathlib.Path] = None):
+        if db_path is None:
+            db_path = user_cache_dir() / DIGESTS_FILE_NAME
+        self.db_path = db_path
+        self.hits = 0
+        self.misses = 0
+        self._conn = connect(db_path)
+        with self._conn:
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS digests ("
+                "path TEXT PRIMARY KEY, size INTEGER, mtime_ns INTEGER, inode INTEGER, digest TEXT)"
+            )
+
+    def close(self):
+        self._conn.close()
+
+    def __enter__(self) -> "DigestCache":
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def get(self, path: pathlib.Path, key: tt.Optional[FileKey]) -> tt.Optional[str]:
+        """
+        :param key: identity of the file, taken before it was hashed
+        """
+        row = self._conn.execute(
+            "SELECT size, mtime_ns, inode, digest FROM digests WHERE path = ?", (os.path.abspath(path),)
+        ).fetchone()
+        if key is None or row is None or tuple(row[:3]) != key:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return row[3]
+
+    def put_many(self, items: tt.Iterable[tt.Tuple[pathlib.Path, FileKey, str]]):
+        """
+        Store digests with identities of files taken before hashing, so file changed
+        during hashing is hashed again next time
+        """
+        rows = [(os.path.abspath(path), *key, digest) for path, key, digest in items]
+        with self._conn:
+            self._conn.executemany("INSERT OR REPLACE INTO digests VALUES (?, ?, ?, ?, ?)", rows)
+
+    def stats(self) -> str:
+        return f"Digest cache {self.db_path}: {self.hits} hits, {self.misses} misses"
+
+
+class SectionCache:
+    """
+    Rendered sections of posts keyed by fingerprint of their inputs
+    """
+    def __init__(self, db_path: tt.Optional[pathlib.Path] = None):
+        if db_path is None:
+            db_path = user_cache_dir() / SECTIONS_FILE_NAME
+        self.db_path = db_path
+        self.hits = 0
+        self.misses = 0
+        self._conn = connect(db_path)
+        with self._conn:
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS sections (key TEXT PRIMARY KEY, text TEXT, used REAL)"
+            )
+
+    def close(self):
+        self._conn.close()
+
+    def __enter__(self) -> "SectionCache":
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def get(self, key: str) -> tt.Optional[str]:
+        row = self._conn.execute("SELECT text FROM sections WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        with self._conn:
+            self._conn.execute("UPDATE sections SET used = ? WHERE key = ?", (time.time(), key))
+        return row[0]
+
+    def put(self, key: str, text: str):
+        with self._conn:
+            self._conn.execute("INSERT OR REPLACE INTO sections VALUES (?, ?, ?)", (key, text, time.time()))
+
+    def prune(self, max_age_days: float = SECTIONS_MAX_AGE_DAYS) -> int:
+        """
+        Remove sections which weren't used for a while
+        :return: count of removed entries
+        """
+        with self._conn:
+            cur = self._conn.execute("DELETE FROM sections WHERE used < ?",
+                                     (time.time() - max_age_days * 86400,))
+        return cur.rowcount
+
+    def stats(self) -> str:
+        return f"Section cache {self.db_path}: {self.hits} hits, {self.misses} misses"
@@ -0,0 +1,103 @@
+"""
+Consistency of cue sheets with their audio files, checked against FLAC headers only
+"""
+import pathlib
+import typing as tt
+
+from rt_tools import flac
+from rt_tools.cueparser import CueSheet, NO_OFFSET, FRAMES_PER_SECOND
+from rt_tools.stats import timed, PROBE
+
+# shorter tracks are not allowed by Red Book, so such last track usually means truncated image
+MIN_TRACK_FRAMES = 4 * FRAMES_PER_SECOND
+FLAC_SUFFIX = ".flac"
+
+
+def resolve_file(cue_path: pathlib.Path, name: str) -> tt.Optional[pathlib.Path]:
+    """
+    Audio file referenced by FILE of the cue. Rippers often leave the name of the wav
+    they wrote, so flac with the same stem is taken when referenced file is missing.
+    :return: path, None if there is no such file
+    """
+    path = cue_path.parent / name
+    if path.is_file():
+        return path
+    path = path.with_suffix(FLAC_SUFFIX)
+    if path.is_file():
+        return path
+    return None
+
+
+@timed(PROBE)
+def read_length(path: pathlib.Path) -> flac.StreamInfo:
+    return flac.read_stream_info(path)
+
+
+def check_file(name: str, info: flac.StreamInfo,
+               tracks: tt.List[tt.Tuple[int, int]]) -> tt.List[str]:
+    """
+    Check tracks of one FILE against its stream
+    :param tracks: numbers and start frames of tracks in the file
+    """
+    res = []
+    if not info.total_samples or not info.sample_rate:
+        return [f'"{name}" has no length in its header']
+    samples_per_frame, rest = divmod(info.sample_rate, FRAMES_PER_SECOND)
+    if rest:
+        return [f'"{name}" has sample rate {info.sample_rate}, which has no whole CD frames']
+    total_frames, extra = divmod(info.total_samples, samples_per_frame)
+    if extra:
+        res.append(f'"{name}" length is {extra} samples off CD frame boundary')
+    prev = None
+    for number, start in tracks:
+        if start >= total_frames:
+            res.append(f"track {number} starts at {_msf(start)}, past the end of \"{name}\" at {_msf(total_frames)}")
+        elif prev is not None and start <= prev:
+            res.append(f"track {number} doesn't start after previous track")
+        prev = start
+    if tracks:
+        number, start = tracks[-1]
+        length = total_frames - start
+        if 0 < length < MIN_TRACK_FRAMES:
+            res.append(f"last track {number} of \"{name}\" is only {length / FRAMES_PER_SECOND:.2f}s long")
+    return res
+
+
+def _msf(frames: int) -> str:
+    seconds, ff = divmod(frames, FRAMES_PER_SECOND)
+    return f"{seconds // 60:02}:{seconds % 60:02}:{ff:02}"
+
+
+def check_cue(cue_path: pathlib.Path, cue: CueSheet) -> tt.List[str]:
+    """
+    Compare FILE references and track offsets of the cue with headers of referenced files:
+    missing files, offsets past the end, lengths off CD frames and too short last tracks
+    :return: problems, empty if the cue is consistent
+    """
+    res = []
+    files: tt.Dict[tt.Optional[str], tt.List[tt.Tuple[int, int]]] = {}
+    for track, start in zip(cue.tracks, cue.frames):
+        if start == NO_OFFSET:
+            res.append(f"track {track.number} has no INDEX")
+            continue
+        files.setdefault(track.file, []).append((track.number, start))
+    if not files and not res:
+        return ["no tracks"]
+    for name, tracks in files.items():
+        if name is None:
+            res.append(f"track {tracks[0][0]} has no FILE")
+            continue
+        path = resolve_file(cue_path, name)
+        if path is None:
+            res.append(f'missing file "{name}"')
+            continue
+        try:
+            info = read_length(path)
+        except ValueError:
+            res.append(f'"{path.name}" is not a flac file')
+            continue
+        except OSError as e:
+            res.append(f'"{path.name}" is not readable: {e.strerror}')
+            continue
+        res.extend(check_file(name, info, tracks))
+    return res
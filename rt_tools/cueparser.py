@@ -7,8 +7,29 @@ import re
 import sys
 import argparse
 import math
+import array
+import bisect
+import functools
 from datetime import datetime, timedelta
-from typing import Optional
+from collections.abc import Sequence
+from typing import Dict, Iterable, List, Optional, Tuple, Union, TextIO
+
+
+_SHEET_TEXT_FIELDS = {
+    "PERFORMER": "performer",
+    "SONGWRITER": "songwriter",
+    "TITLE": "title",
+}
+_TRACK_TEXT_FIELDS = dict(_SHEET_TEXT_FIELDS, FLAGS="flags", ISRC="isrc")
+# columns of per-sheet track table
+_TRACK_COLUMNS = ("performer", "songwriter", "title", "flags", "isrc", "index", "rem", "file", "pregap", "offset")
+# values repeated across tracks and sheets are shared
+_INTERNED_COLUMNS = frozenset(("performer", "songwriter", "flags", "index", "file"))
+_FILE_RE = re.compile(r'^(?:"(.*)"|(\S+))\s+(\S+)$')
+_INDEX_RE = re.compile(r'^(\d+)\s+(\S+)$')
+
+FRAMES_PER_SECOND = 75
+NO_OFFSET = -1
 
 
 class CueSheet():
@@ -34,93 +55,139 @@ class CueSheet():
         self.flags = None
         self.isrc = None
         self.aformat = None
-        self.tracks = []
-
-        self.iterator = 0
+        # tracks are stored by columns, CueTrack objects are views of rows
+        self._columns: Dict[str, List[Optional[str]]] = {name: [] for name in _TRACK_COLUMNS}
+        self._trackFormats: Dict[int, str] = {}
+        self.tracks = TrackList(self)
+        # start of every track in CD frames, NO_OFFSET if track has no INDEX
+        self.frames = array.array('q')
+        # duration of every track in CD frames, NO_OFFSET if unknown
+        self.durationFrames = array.array('q')
+        # total length of FILE in frames, when known
+        self.fileFrames: Dict[Optional[str], int] = {}
+        self._fileRanges: Dict[Optional[str], Tuple[int, int]] = {}
+        # sorted starts of tracks with INDEX in every FILE and indices of those tracks, for lookups by time
+        self._fileStarts: Dict[Optional[str], Tuple[List[int], List[int]]] = {}
 
     def setData(self, data):
+        if data.startswith("\ufeff"):
+            data = data[1:]
         self.data = data.split('\n')
 
-    def __next__(self) -> Optional[str]:
-        if self.iterator < len(self.data):
-            ret = self.data[self.iterator]
-            self.iterator += 1
-            return ret.strip()
-        return None
-
-    def back(self):
-        self.iterator -= 1
+    def _addTrack(self, file: Optional[str]) -> int:
+        for column in self._columns.values():
+            column.append(None)
+        self._columns["file"][-1] = file
+        self.frames.append(NO_OFFSET)
+        self.durationFrames.append(NO_OFFSET)
+        return len(self.frames) - 1
 
     def parse(self):
-        line = next(self)
-        if not line:
-            return
-
-        if not self.rem:
-            match = re.match('^REM .(.*).$', line)
-            rem_tmp = ''
-            while match:
-                # TODO: maybe os.linesep
-                rem_tmp += match.group(0) + '\n'
-                line = next(self)
-                if line:
-                    match = re.match('^REM .(.*).$', line)
-            if rem_tmp:
-                self.rem = rem_tmp.strip()
-
-        for field in ["performer", "songwriter", "title"]:
-            if line and not getattr(self, field):
-                match = re.match("^{} .(.*).$".format(field.upper()), line)
-                if match:
-                    setattr(self, field, match.group(1))
-                    line = next(self)
-
-        if line and not self.file:
-            match = re.match('^FILE .(.*). (.*)$', line)
-            if match:
-                self.file = match.group(1)
-                self.aformat = match.group(2)
-                line = next(self)
-
-        if line:
-            match = re.match('^TRACK.*$', line)
-            if match:
-                cuetrack = CueTrack()
-                cuetrack.setOutputFormat(self.trackOutputFormat)
-                cuetrack.number = len(self.tracks) + 1
-                self.track(cuetrack)
-                if cuetrack.offset:
-                    splitted_offset = cuetrack.offset.split(":")
-                    td = timedelta(minutes=int(splitted_offset[0]), seconds=int(splitted_offset[1]))
-                    cuetrack.cuetime = datetime.min + td
-                if len(self.tracks) > 0:
-                    previous = self.tracks[len(self.tracks) - 1]
-                    offset = offsetToTimedelta(cuetrack.offset)
-                    previosOffset = offsetToTimedelta(previous.offset)
-                    previous.duration = offset - previosOffset
-
-                self.tracks.append(cuetrack)
-
-        self.parse()
-
-    def track(self, track):
-        line = next(self)
-        if not line:
-            return
-
-        for field in CueSheet._fields:
-            match = re.match("^{} .(.*).$".format(field.upper()), line)
-            if match:
-                setattr(track, field, match.group(1))
-                self.track(track)
-
-        match = re.match('^INDEX (.*) (.*)$', line)
-        if match:
-            track.index = match.group(1)
-            track.offset = match.group(2)
-            self.track(track)
-
-        self.back()
+        """
+        Parse lines given to setData in one flat pass. Every line is dispatched
+        by its leading keyword, lines before the first TRACK fill the sheet,
+        the rest fill the current track. Lines are dropped once parsed.
+        """
+        columns = self._columns
+        indexes, offsets, pregaps, rems = columns["index"], columns["offset"], columns["pregap"], columns["rem"]
+        frames = self.frames
+        has_track = False
+        cur_file = None
+        rem_lines = []
+
+        for line in self.data:
+            line = line.strip()
+            if not line:
+                continue
+            keyword, _, value = line.partition(" ")
+            keyword = keyword.upper()
+            value = value.strip()
+
+            if keyword == "TRACK":
+                self._addTrack(cur_file)
+                has_track = True
+            elif keyword == "INDEX":
+                match = _INDEX_RE.match(value)
+                if not has_track or not match:
+                    continue
+                index, offset = match.groups()
+                if index == "00":
+                    pregaps[-1] = offset
+                # INDEX 01 is the track start, others are used only when it is absent
+                if offsets[-1] is None or index == "01":
+                    indexes[-1] = sys.intern(index)
+                    offsets[-1] = offset
+                    frames[-1] = offsetToFrames(offset)
+            elif keyword == "FILE":
+                match = _FILE_RE.match(value)
+                if not match:
+                    continue
+                cur_file = match.group(1) if match.group(1) is not None else match.group(2)
+                cur_file = sys.intern(cur_file)
+                if self.file is None:
+                    self.file = cur_file
+                    self.aformat = match.group(3)
+            elif keyword == "REM":
+                if not has_track:
+                    rem_lines.append(line)
+                elif rems[-1]:
+                    rems[-1] += "\n" + line
+                else:
+                    rems[-1] = line
+            elif not has_track:
+                attr = _SHEET_TEXT_FIELDS.get(keyword)
+                if attr is not None and not getattr(self, attr):
+                    setattr(self, attr, unquote(value))
+            else:
+                attr = _TRACK_TEXT_FIELDS.get(keyword)
+                if attr is not None:
+                    value = unquote(value)
+                    columns[attr][-1] = sys.intern(value) if attr in _INTERNED_COLUMNS else value
+
+        if rem_lines and not self.rem:
+            self.rem = "\n".join(rem_lines)
+        self.data = []
+        self._updateTimes()
+
+    def _updateTimes(self):
+        """
+        Derive durations of tracks from frames array
+        """
+        self._fileRanges = {}
+        frames = self.frames
+        files = self._columns["file"]
+        count = len(frames)
+        durations = self.durationFrames = array.array('q', [NO_OFFSET]) * count
+        for idx in range(count):
+            file = files[idx]
+            lo, _ = self._fileRanges.get(file, (idx, idx))
+            self._fileRanges[file] = (lo, idx + 1)
+            start = frames[idx]
+            if start == NO_OFFSET:
+                continue
+            # offsets restart in every FILE, so next track of other file doesn't limit this one
+            if idx + 1 < count and files[idx + 1] == file:
+                end = frames[idx + 1]
+            else:
+                end = self.fileFrames.get(file, NO_OFFSET)
+            if end != NO_OFFSET and end >= start:
+                durations[idx] = end - start
+        self._fileStarts = {}
+        for file, (lo, hi) in self._fileRanges.items():
+            # tracks without INDEX could be anywhere in the file and break order of frames, so they are left out
+            starts = sorted((frames[idx], idx) for idx in range(lo, hi) if frames[idx] != NO_OFFSET)
+            self._fileStarts[file] = ([start for start, _ in starts], [idx for _, idx in starts])
+
+    def setLength(self, length: Union[timedelta, int], file: Optional[str] = None):
+        """
+        Set length of the audio file, which gives duration of its last track
+        :param length: length as timedelta or in frames
+        :param file: name of FILE, by default the first one
+        """
+        if isinstance(length, timedelta):
+            length = timedeltaToFrames(length)
+        self.fileFrames[file if file is not None else self.file] = length
+        self._updateTimes()
 
     def setOutputFormat(self, outputFormat, trackOutputFormat=""):
         self.outputFormat = outputFormat
@@ -132,29 +199,71 @@ class CueSheet():
     def getTrackByNumber(self, number):
         return self.tracks[number - 1] if self.tracks[number - 1] else None
 
-    def getTrackByTime(self, time):
-        for track in reversed(self.tracks):
-            trackOffset = offsetToTimedelta(track.offset)
-            if time > trackOffset:
-                return track
-        return None
+    def getTrackByTime(self, time: Union[timedelta, int], file: Optional[str] = None) -> Optional["CueTrack"]:
+        """
+        Find track playing at given time
+        :param time: position as timedelta or in frames
+        :param file: name of FILE position belongs to, by default the first one
+        :return: track or None if position is before the first track
+        """
+        return self.getTracksByTime([time], file=file)[0]
+
+    def getTracksByTime(self, times: Iterable[Union[timedelta, int]],
+                        file: Optional[str] = None) -> List[Optional["CueTrack"]]:
+        """
+        Batch version of getTrackByTime
+        """
+        offsets, indices = self._fileStarts.get(file if file is not None else self.file, ([], []))
+        res = []
+        for time in times:
+            if isinstance(time, timedelta):
+                time = timedeltaToFrames(time)
+            pos = bisect.bisect_right(offsets, time) - 1
+            res.append(self.tracks[indices[pos]] if pos >= 0 else None)
+        return res
+
+    def renderTracks(self) -> List[str]:
+        """
+        Render every track with track output format
+        """
+        template = compileTemplate(self.trackOutputFormat, TRACK_PLACEHOLDERS)
+        return [template.render(track._templateValues(template.names)) for track in self.tracks]
+
+    def writeTracks(self, writer: TextIO):
+        """
+        Write every track with track output format, line by line
+        """
+        template = compileTemplate(self.trackOutputFormat, TRACK_PLACEHOLDERS)
+        for track in self.tracks:
+            writer.writelines(template.fill(track._templateValues(template.names)))
+            writer.write("\n")
 
     def __repr__(self):
-        ret = self.outputFormat
-        for field in CueSheet._fields:
-            if getattr(self, field):
-                ret = ret.replace("%{}%".format(field), getattr(self, field))
+        template = compileTemplate(self.outputFormat, SHEET_PLACEHOLDERS)
+        values = {}
+        for name in template.names:
+            if name == "tracks":
+                lines = self.renderTracks()
+                values[name] = "\n".join(lines) + "\n" if lines else ""
+            else:
+                values[name] = getattr(self, name) or None
+        return template.render(values)
 
-        trackOutput = ""
-        for track in self.tracks:
-            track.setOutputFormat(self.trackOutputFormat)
-            trackOutput += "%s\n" % track.output()
 
-        ret = ret.replace("%tracks%", trackOutput)
-        return ret
+def _trackColumn(name: str) -> property:
+    def get(self):
+        return self._sheet._columns[name][self._idx]
+
+    def set(self, value):
+        self._sheet._columns[name][self._idx] = value
+
+    return property(get, set)
 
 
 class CueTrack():
+    """
+    View of the track row in the table of its sheet
+    """
 
     _fields = [
         "performer",
@@ -164,65 +273,197 @@ class CueTrack():
         "offset"
     ]
 
-    outputFormat:str
-    number:int
-
-    def __init__(self):
-        self.performer = None
-        self.songwriter = None
-        self.title = None
-        self.flags = None
-        self.isrc = None
-        self.index = None
-
-        self.offset = None
-        self.duration = None
-        self.cuetime: Optional[datetime] = None
+    __slots__ = ("_sheet", "_idx")
+
+    performer = _trackColumn("performer")
+    songwriter = _trackColumn("songwriter")
+    title = _trackColumn("title")
+    flags = _trackColumn("flags")
+    isrc = _trackColumn("isrc")
+    index = _trackColumn("index")
+    rem = _trackColumn("rem")
+    file = _trackColumn("file")
+    pregap = _trackColumn("pregap")
+    offset = _trackColumn("offset")
+
+    def __init__(self, sheet: Optional[CueSheet] = None, idx: Optional[int] = None):
+        if sheet is None:
+            # standalone track is the only row of its own sheet
+            sheet = CueSheet()
+            sheet.setOutputFormat("", "")
+            idx = sheet._addTrack(None)
+        self._sheet = sheet
+        self._idx = idx
+
+    def __eq__(self, other):
+        if not isinstance(other, CueTrack):
+            return NotImplemented
+        return self._sheet is other._sheet and self._idx == other._idx
+
+    def __hash__(self):
+        return hash((id(self._sheet), self._idx))
+
+    @property
+    def number(self) -> int:
+        return self._idx + 1
+
+    @property
+    def outputFormat(self) -> str:
+        return self._sheet._trackFormats.get(self._idx, self._sheet.trackOutputFormat)
+
+    @property
+    def duration(self) -> Optional[timedelta]:
+        frames = self._sheet.durationFrames[self._idx]
+        return framesToTimedelta(frames) if frames != NO_OFFSET else None
+
+    @property
+    def cuetime(self) -> Optional[datetime]:
+        start = self._sheet.frames[self._idx]
+        if start == NO_OFFSET:
+            return None
+        return datetime.min + timedelta(seconds=start // FRAMES_PER_SECOND)
 
     def setOutputFormat(self, outputFormat):
-        self.outputFormat = outputFormat
+        self._sheet._trackFormats[self._idx] = outputFormat
 
     def output(self):
         return self.__repr__()
 
+    def _templateValues(self, names: Iterable[str]) -> Dict[str, Optional[str]]:
+        values = {}
+        for name in names:
+            if name == "number":
+                values[name] = "%02d" % self.number
+            elif name == "duration":
+                duration = self.duration
+                if duration:
+                    minutes = math.floor(duration.seconds / 60)
+                    values[name] = "%02d:%02d" % (minutes, duration.seconds - 60 * minutes)
+                else:
+                    values[name] = ""
+            elif name == "cuetime":
+                cuetime = self.cuetime
+                values[name] = cuetime.strftime("%H:%M:%S") if cuetime else ""
+            else:
+                values[name] = getattr(self, name) or None
+        return values
+
     def __repr__(self):
-        ret = self.outputFormat
-
-        for field in CueTrack._fields:
-            if getattr(self, field):
-                ret = ret.replace("%{}%".format(field), getattr(self, field))
-
-        if self.number:
-            ret = ret.replace("%number%", "%02d" % self.number)
-        if self.duration:
-            minutes = math.floor(self.duration.seconds / 60)
-            ret = ret.replace("%duration%", "%02d:%02d" %
-                              (minutes, self.duration.seconds - 60 * minutes))
-        else:
-            ret = ret.replace("%duration%", "")
-        if self.cuetime:
-            ret = ret.replace("%cuetime%", self.cuetime.strftime("%H:%M:%S"))
-        else:
-            ret = ret.replace("%cuetime%", "")
+        template = compileTemplate(self.outputFormat, TRACK_PLACEHOLDERS)
+        return template.render(self._templateValues(template.names))
+
+
+class TrackList(Sequence):
+    """
+    Tracks of the sheet, views are created on access
+    """
+
+    __slots__ = ("_sheet",)
 
-        return ret
+    def __init__(self, sheet: CueSheet):
+        self._sheet = sheet
+
+    def __len__(self):
+        return len(self._sheet.frames)
+
+    def __getitem__(self, idx):
+        if isinstance(idx, slice):
+            return [CueTrack(self._sheet, i) for i in range(*idx.indices(len(self)))]
+        if idx < 0:
+            idx += len(self)
+        if not 0 <= idx < len(self):
+            raise IndexError("track index out of range")
+        return CueTrack(self._sheet, idx)
+
+    def __iter__(self):
+        sheet = self._sheet
+        return (CueTrack(sheet, idx) for idx in range(len(sheet.frames)))
+
+
+SHEET_PLACEHOLDERS = tuple(CueSheet._fields) + ("tracks",)
+TRACK_PLACEHOLDERS = tuple(CueTrack._fields) + ("number", "duration", "cuetime")
+
+
+class Template():
+    """
+    Output template split once into literal parts and %name% placeholders.
+    Placeholder without value (None) is left in output as is.
+    """
+
+    def __init__(self, template: str, names: Iterable[str]):
+        pattern = "%(" + "|".join(re.escape(name) for name in names) + ")%"
+        # literals are on even positions, names of placeholders on odd ones
+        self.parts = re.split(pattern, template)
+        self.names = frozenset(self.parts[1::2])
+
+    def fill(self, values: Dict[str, Optional[str]]) -> List[str]:
+        parts = list(self.parts)
+        for idx in range(1, len(parts), 2):
+            value = values.get(parts[idx])
+            if value is None:
+                value = "%" + parts[idx] + "%"
+            parts[idx] = value
+        return parts
+
+    def render(self, values: Dict[str, Optional[str]]) -> str:
+        return "".join(self.fill(values))
+
+
+@functools.lru_cache(maxsize=128)
+def compileTemplate(template: str, names: Tuple[str, ...]) -> Template:
+    return Template(template, names)
+
+
+def renderTracks(sheets: Iterable[CueSheet]) -> List[str]:
+    """
+    Render tracks of many sheets into one list
+    """
+    res = []
+    for sheet in sheets:
+        res.extend(sheet.renderTracks())
+    return res
+
+
+def writeTracks(sheets: Iterable[CueSheet], writer: TextIO):
+    """
+    Write tracks of many sheets into writer
+    """
+    for sheet in sheets:
+        sheet.writeTracks(writer)
+
+
+def unquote(value):
+    if len(value) >= 2 and value[0] == '"' and value[-1] == '"':
+        return value[1:-1]
+    return value
+
+
+def offsetToFrames(offset: str) -> int:
+    """
+    Convert MM:SS:FF offset (FF are 1/75 s CD frames) into frames count,
+    MM and MM:SS forms are accepted too
+    """
+    parts = offset.split(':')
+    if not 1 <= len(parts) <= 3:
+        raise ValueError("Wrong offset value")
+    minutes = int(parts[0])
+    seconds = int(parts[1]) if len(parts) > 1 else 0
+    frames = int(parts[2]) if len(parts) > 2 else 0
+    return (minutes * 60 + seconds) * FRAMES_PER_SECOND + frames
+
+
+def framesToTimedelta(frames: int) -> timedelta:
+    return timedelta(seconds=frames / FRAMES_PER_SECOND)
+
+
+def timedeltaToFrames(td: timedelta) -> int:
+    microseconds = (td.days * 86400 + td.seconds) * 1000000 + td.microseconds
+    # timedelta rounds to microseconds, half of it added to round-trip framesToTimedelta exactly
+    return (microseconds * FRAMES_PER_SECOND + FRAMES_PER_SECOND // 2) // 1000000
 
 
 def offsetToTimedelta(offset):
-    offset = offset.split(':')
-    if len(offset) == 1:
-        offset = timedelta(minutes=int(offset[0]))
-    elif len(offset) == 2:
-        offset = timedelta(minutes=int(offset[0]), seconds=int(offset[1]))
-    elif len(offset) == 3:
-        if len(offset[2]) < 3:
-            offset[2] += "0"
-        offset = timedelta(minutes=int(offset[0]), seconds=int(offset[1]),
-                           milliseconds=int(offset[2]))
-    else:
-        print("Wrong offset value")
-        exit()
-    return offset
+    return framesToTimedelta(offsetToFrames(offset))
 
 
 def main():
@@ -0,0 +1,232 @@
+"""
+Daemon running commands of rt_tools in one warm process, and its client.
+
+Protocol over the Unix socket: client sends one JSON line {"command": str, "args": [str], "cwd": str},
+daemon answers with frames of one byte channel and 4 bytes big-endian length followed by payload:
+"o" is stdout text, "e" is stderr text, "x" ends the answer with exit code as payload.
+Commands are run one at a time, as they share working directory and standard streams of the process.
+"""
+import io
+import os
+import sys
+import json
+import socket
+import struct
+import pathlib
+import importlib
+import traceback
+import contextlib
+import typing as tt
+
+SOCKET_ENV = "RT_TOOLS_SOCKET"
+SOCKET_FILE_NAME = "daemon.sock"
+
+# command name -> module with main() function, modules are imported on first use
+COMMANDS = {
+    "cue_gen": "rt_tools.scripts.cue_gen",
+    "trk_gen": "rt_tools.scripts.trk_gen",
+    "img_copy": "rt_tools.scripts.img_copy",
+    "batch_gen": "rt_tools.scripts.batch_gen",
+    "rip_check": "rt_tools.scripts.rip_check",
+    "lib_index": "rt_tools.scripts.lib_index",
+    "lib_find": "rt_tools.scripts.lib_find",
+    "torrent_gen": "rt_tools.scripts.torrent_gen",
+    "disc_check": "rt_tools.scripts.disc_check",
+    "cue_check": "rt_tools.scripts.cue_check",
+}
+# options which make command run forever, such commands are never sent to the daemon
+LOCAL_ONLY_OPTIONS = ("--watch",)
+
+CHANNEL_STDOUT = b"o"
+CHANNEL_STDERR = b"e"
+CHANNEL_EXIT = b"x"
+_HEADER = struct.Struct(">cI")
+
+
+def default_socket_path() -> pathlib.Path:
+    path = os.environ.get(SOCKET_ENV)
+    if path:
+        return pathlib.Path(path)
+    runtime_dir = os.environ.get("XDG_RUNTIME_DIR")
+    if runtime_dir:
+        return pathlib.Path(runtime_dir) / ("rt_tools." + SOCKET_FILE_NAME)
+    # imported here to keep startup of the client small
+    from rt_tools.cache import user_cache_dir
+    return user_cache_dir() / SOCKET_FILE_NAME
+
+
+def run_command(command: str, args: tt.List[str]) -> int:
+    """
+    Run main() of the command in this process as if it was started with args
+    :return: exit code
+    """
+    module = importlib.import_module(COMMANDS[command])
+    old_argv = sys.argv
+    sys.argv = [command] + list(args)
+    try:
+        code = module.main()
+    except SystemExit as e:
+        code = e.code
+    finally:
+        sys.argv = old_argv
+    if code is None:
+        return 0
+    if isinstance(code, int):
+        return code
+    print(code, file=sys.stderr)
+    return 1
+
+
+class _FrameWriter(io.TextIOBase):
+    """
+    Text stream sending everything written as frames of the channel
+    """
+    def __init__(self, sock: socket.socket, channel: bytes):
+        self._sock = sock
+        self._channel = channel
+
+    @property
+    def encoding(self) -> str:
+        return "utf-8"
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, text: str) -> int:
+        if text:
+            data = text.encode("utf-8", errors="surrogateescape")
+            self._sock.sendall(_HEADER.pack(self._channel, len(data)) + data)
+        return len(text)
+
+
+def _read_request(sock: socket.socket) -> tt.Dict[str, tt.Any]:
+    buf = bytearray()
+    while not buf.endswith(b"\n"):
+        chunk = sock.recv(65536)
+        if not chunk:
+            break
+        buf += chunk
+    return json.loads(buf.decode("utf-8"))
+
+
+def handle(sock: socket.socket):
+    """
+    Serve one request of the client
+    """
+    request = _read_request(sock)
+    out = _FrameWriter(sock, CHANNEL_STDOUT)
+    err = _FrameWriter(sock, CHANNEL_STDERR)
+    old_cwd = os.getcwd()
+    code = 1
+    try:
+        os.chdir(request.get("cwd", old_cwd))
+        from rt_tools import stats
+        # every command starts with clean instrumentation, as it is enabled by options
+        stats.STATS.enabled = False
+        stats.STATS.reset()
+        with contextlib.redirect_stdout(out), contextlib.redirect_stderr(err):
+            try:
+                code = run_command(request["command"], request.get("args", []))
+            except (BrokenPipeError, ConnectionResetError):
+                raise
+            except Exception:
+                traceback.print_exc()
+                code = 1
+    finally:
+        os.chdir(old_cwd)
+    sock.sendall(_HEADER.pack(CHANNEL_EXIT, 4) + struct.pack(">i", code))
+
+
+def serve(socket_path: tt.Optional[pathlib.Path] = None):
+    """
+    Listen on the socket and run commands of clients, until interrupted
+    """
+    from rt_tools import warm
+    if socket_path is None:
+        socket_path = default_socket_path()
+    socket_path.parent.mkdir(parents=True, exist_ok=True)
+    if socket_path.exists():
+        socket_path.unlink()
+    warm.enable()
+    # commands are imported up front, so the first request is as fast as next ones
+    for module in COMMANDS.values():
+        importlib.import_module(module)
+
+    server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        server.bind(str(socket_path))
+        os.chmod(socket_path, 0o600)
+        server.listen(16)
+        print(f"Listening on {socket_path}", file=sys.stderr)
+        while True:
+            conn, _ = server.accept()
+            with conn:
+                try:
+                    handle(conn)
+                except (BrokenPipeError, ConnectionResetError):
+                    pass
+                except Exception:
+                    traceback.print_exc()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.close()
+        if socket_path.exists():
+            socket_path.unlink()
+        print(warm.stats(), file=sys.stderr)
+
+
+def _recv_exact(sock: socket.socket, size: int) -> bytes:
+    buf = bytearray()
+    while len(buf) < size:
+        chunk = sock.recv(size - len(buf))
+        if not chunk:
+            raise ConnectionError("Daemon closed connection")
+        buf += chunk
+    return bytes(buf)
+
+
+def run_remote(command: str, args: tt.List[str], socket_path: tt.Optional[pathlib.Path] = None,
+               stdout: tt.Optional[tt.BinaryIO] = None,
+               stderr: tt.Optional[tt.BinaryIO] = None) -> tt.Optional[int]:
+    """
+    Run command in the daemon, streaming its output into stdout and stderr
+    :return: exit code, None if daemon is not running
+    """
+    if socket_path is None:
+        socket_path = default_socket_path()
+    if stdout is None:
+        stdout = sys.stdout.buffer
+    if stderr is None:
+        stderr = sys.stderr.buffer
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        try:
+            sock.connect(str(socket_path))
+        except OSError:
+            return None
+        request = {"command": command, "args": list(args), "cwd": os.getcwd()}
+        sock.sendall(json.dumps(request).encode("utf-8") + b"\n")
+        streams = {CHANNEL_STDOUT: stdout, CHANNEL_STDERR: stderr}
+        while True:
+            channel, size = _HEADER.unpack(_recv_exact(sock, _HEADER.size))
+            payload = _recv_exact(sock, size)
+            if channel == CHANNEL_EXIT:
+                stdout.flush()
+                stderr.flush()
+                return struct.unpack(">i", payload)[0]
+            streams[channel].write(payload)
+    finally:
+        sock.close()
+
+
+def run(command: str, args: tt.List[str], socket_path: tt.Optional[pathlib.Path] = None,
+        use_daemon: bool = True) -> int:
+    """
+    Run command in the daemon when it is running, in this process otherwise
+    """
+    if use_daemon and not any(a in LOCAL_ONLY_OPTIONS for a in args):
+        code = run_remote(command, args, socket_path)
+        if code is not None:
+            return code
+    return run_command(command, args)
@@ -0,0 +1,211 @@
+"""
+TOC fingerprints of discs: CDDB, MusicBrainz and AccurateRip disc IDs computed from cue sheets,
+and persistent index of them with exact and tolerant lookups
+"""
+import os
+import base64
+import hashlib
+import pathlib
+import typing as tt
+
+from rt_tools.cache import user_cache_dir, connect, FileKey
+from rt_tools.cueparser import CueSheet, NO_OFFSET, FRAMES_PER_SECOND, timedeltaToFrames
+from rt_tools.durations import get_flac_duration
+
+DISCIDS_FILE_NAME = "discids.sqlite"
+# bump when fingerprints or schema change, index is rebuilt from scratch then
+DISCIDS_VERSION = 1
+# frames of lead-in before the first track, disc IDs count offsets from the start of lead-in
+LEAD_IN_FRAMES = 150
+MAX_TRACKS = 99
+# max difference of every track length for tolerant match, in frames
+DEFAULT_TOLERANCE = FRAMES_PER_SECOND
+
+_SCHEMA = [
+    "CREATE TABLE IF NOT EXISTS discs ("
+    "path TEXT PRIMARY KEY, size INTEGER, mtime_ns INTEGER, inode INTEGER, "
+    "tracks INTEGER, span INTEGER, toc TEXT, musicbrainz TEXT, accuraterip TEXT, cddb TEXT)",
+    "CREATE INDEX IF NOT EXISTS discs_musicbrainz ON discs (musicbrainz)",
+    # tolerant lookups take discs with the same count of tracks and close span first
+    "CREATE INDEX IF NOT EXISTS discs_shape ON discs (tracks, span)",
+]
+
+
+class Toc(tt.NamedTuple):
+    # start of every track in frames from the start of the first track
+    offsets: tt.Tuple[int, ...]
+    # end of the last track in frames
+    leadout: int
+
+    @property
+    def lengths(self) -> tt.List[int]:
+        ends = self.offsets[1:] + (self.leadout,)
+        return [end - start for start, end in zip(self.offsets, ends)]
+
+    @property
+    def span(self) -> int:
+        return self.leadout - self.offsets[0]
+
+    def cddb_id(self) -> str:
+        def digit_sum(n: int) -> int:
+            return sum(map(int, str(n)))
+
+        n = sum(digit_sum((o + LEAD_IN_FRAMES) // FRAMES_PER_SECOND) for o in self.offsets)
+        t = (self.leadout + LEAD_IN_FRAMES) // FRAMES_PER_SECOND - \
+            (self.offsets[0] + LEAD_IN_FRAMES) // FRAMES_PER_SECOND
+        return f"{((n % 255) << 24) | (t << 8) | len(self.offsets):08x}"
+
+    def musicbrainz_id(self) -> str:
+        parts = [f"{1:02X}", f"{len(self.offsets):02X}", f"{self.leadout + LEAD_IN_FRAMES:08X}"]
+        parts.extend(f"{o + LEAD_IN_FRAMES:08X}" for o in self.offsets)
+        parts.extend("00000000" for _ in range(MAX_TRACKS - len(self.offsets)))
+        digest = hashlib.sha1("".join(parts).encode("ascii")).digest()
+        return base64.b64encode(digest).decode("ascii").translate(str.maketrans("+/=", "._-"))
+
+    def accuraterip_id(self) -> str:
+        id1 = sum(self.offsets) + self.leadout
+        id2 = sum(max(o, 1) * n for n, o in enumerate(self.offsets, start=1)) + \
+            self.leadout * (len(self.offsets) + 1)
+        return f"{len(self.offsets):03d}-{id1 & 0xFFFFFFFF:08x}-{id2 & 0xFFFFFFFF:08x}-{self.cddb_id()}"
+
+    def matches(self, other: "Toc", tolerance: int = DEFAULT_TOLERANCE) -> bool:
+        """
+        Whether every track has the same length up to tolerance, which holds
+        for pressings with all the tracks shifted by the same offset
+        """
+        return len(self.offsets) == len(other.offsets) and \
+            all(abs(a - b) <= tolerance for a, b in zip(self.lengths, other.lengths))
+
+    def dumps(self) -> str:
+        return " ".join(map(str, self.offsets + (self.leadout,)))
+
+    @classmethod
+    def loads(cls, text: str) -> "Toc":
+        values = tuple(map(int, text.split()))
+        return cls(values[:-1], values[-1])
+
+
+def file_frames(path: pathlib.Path) -> int:
+    return timedeltaToFrames(get_flac_duration(path))
+
+
+def cue_toc(cue: CueSheet, cue_path: pathlib.Path,
+            length: tt.Callable[[pathlib.Path], int] = file_frames) -> tt.Optional[Toc]:
+    """
+    TOC of the disc: offsets of tracks from the cue, files of the cue are laid out one after another
+    :param length: gives length of the audio file in frames, files are looked up next to the cue
+    :return: TOC, None if some track has no INDEX or audio file is missing
+    """
+    frames = cue.frames
+    files = [track.file for track in cue.tracks]
+    if not frames or len(frames) > MAX_TRACKS or NO_OFFSET in frames:
+        return None
+    offsets = []
+    base = 0
+    cur_file = files[0]
+    try:
+        for start, file in zip(frames, files):
+            if file != cur_file:
+                base += length(cue_path.parent / cur_file)
+                cur_file = file
+            offsets.append(base + start)
+        leadout = base + length(cue_path.parent / cur_file)
+    except (OSError, ValueError, TypeError):
+        return None
+    if leadout <= offsets[-1]:
+        return None
+    return Toc(tuple(offsets), leadout)
+
+
+class DiscMatch(tt.NamedTuple):
+    path: pathlib.Path
+    toc: Toc
+    # True if TOCs are the same, False if they match with tolerance
+    exact: bool
+
+
+class DiscIdIndex:
+    """
+    Fingerprints of cues keyed by path and file identity
+    """
+    def __init__(self, db_path: tt.Optional[pathlib.Path] = None):
+        if db_path is None:
+            db_path = user_cache_dir() / DISCIDS_FILE_NAME
+        self.db_path = db_path
+        self._conn = connect(db_path)
+        version = self._conn.execute("PRAGMA user_version").fetchone()[0]
+        with self._conn:
+            if version != DISCIDS_VERSION:
+                self._conn.execute("DROP TABLE IF EXISTS discs")
+                self._conn.execute(f"PRAGMA user_version = {DISCIDS_VERSION}")
+            for statement in _SCHEMA:
+                self._conn.execute(statement)
+
+    def close(self):
+        self._conn.close()
+
+    def __enter__(self) -> "DiscIdIndex":
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def known(self, root: pathlib.Path) -> tt.Dict[str, tt.Optional[FileKey]]:
+        """
+        Cues indexed under root
+        :return: absolute path -> identity of the file when indexed, None for cues without TOC,
+        their audio files could appear or change without change of the cue itself
+        """
+        root_path = os.path.abspath(root)
+        res = {}
+        # paths under root sort between "root/" and "root0", so the range is served by index of paths
+        for path, size, mtime_ns, inode, toc in self._conn.execute(
+                "SELECT path, size, mtime_ns, inode, toc FROM discs WHERE path = ? OR (path > ? AND path < ?)",
+                (root_path, os.path.join(root_path, ""), root_path.rstrip(os.sep) + chr(ord(os.sep) + 1))):
+            res[path] = (size, mtime_ns, inode) if toc is not None else None
+        return res
+
+    def put_many(self, items: tt.Iterable[tt.Tuple[pathlib.Path, FileKey, tt.Optional[Toc]]]):
+        """
+        Store TOCs of cues, cues without TOC are stored too and read again on the next indexing
+        """
+        rows = []
+        for path, key, toc in items:
+            if toc is None:
+                rows.append((os.path.abspath(path), *key, None, None, None, None, None, None))
+            else:
+                rows.append((os.path.abspath(path), *key, len(toc.offsets), toc.span, toc.dumps(),
+                             toc.musicbrainz_id(), toc.accuraterip_id(), toc.cddb_id()))
+        with self._conn:
+            self._conn.executemany("INSERT OR REPLACE INTO discs VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", rows)
+
+    def remove(self, paths: tt.Iterable[str]) -> int:
+        rows = [(p,) for p in paths]
+        with self._conn:
+            self._conn.executemany("DELETE FROM discs WHERE path = ?", rows)
+        return len(rows)
+
+    def find(self, toc: Toc, tolerance: int = DEFAULT_TOLERANCE) -> tt.List[DiscMatch]:
+        """
+        Discs with the same TOC, then discs matching it with tolerance
+        """
+        res = []
+        mbid = toc.musicbrainz_id()
+        for path, text in self._conn.execute(
+                "SELECT path, toc FROM discs WHERE musicbrainz = ? ORDER BY path", (mbid,)):
+            res.append(DiscMatch(pathlib.Path(path), Toc.loads(text), True))
+        if tolerance > 0:
+            count = len(toc.offsets)
+            for path, text, other_mbid in self._conn.execute(
+                    "SELECT path, toc, musicbrainz FROM discs WHERE tracks = ? AND span BETWEEN ? AND ? "
+                    "ORDER BY path", (count, toc.span - tolerance * count, toc.span + tolerance * count)):
+                if other_mbid == mbid:
+                    continue
+                other = Toc.loads(text)
+                if toc.matches(other, tolerance):
+                    res.append(DiscMatch(pathlib.Path(path), other, False))
+        return res
+
+    def stats(self) -> str:
+        discs, with_toc = self._conn.execute("SELECT COUNT(*), COUNT(toc) FROM discs").fetchone()
+        return f"Disc ID index {self.db_path}: {discs} cues, {with_toc} with TOC"
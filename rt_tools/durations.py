@@ -2,14 +2,95 @@ import pathlib
 import datetime
 import subprocess
 import typing as tt
+from concurrent.futures import ThreadPoolExecutor
+
+from rt_tools import flac, warm
+from rt_tools.cache import DurationCache, FileKey, file_key
+from rt_tools.stats import STATS, timed, PROBE, SUBPROCESSES, FFPROBE
 
 
 def get_flac_duration(flac_path: pathlib.Path) -> datetime.timedelta:
     """
-    Get duration of the flac file using ffprobe utility.
+    Get duration of the flac file from its STREAMINFO header. Falls back to
+    ffprobe for non-flac files or when header has no number of samples.
     :param flac_path: path to flac file
     :return: duration of flac file
     """
+    if warm.ENABLED:
+        return warm.DURATIONS.get(flac_path, _probe_flac_duration)
+    return _probe_flac_duration(flac_path)
+
+
+@timed(PROBE)
+def _probe_flac_duration(flac_path: pathlib.Path) -> datetime.timedelta:
+    try:
+        duration = flac.read_stream_info(flac_path).duration
+    except ValueError:
+        duration = None
+    if duration is not None:
+        return duration
+    return get_ffprobe_duration(flac_path)
+
+
+def iter_flac_durations(
+        flac_paths: tt.Iterable[pathlib.Path], jobs: int = 1,
+        cache: tt.Optional[DurationCache] = None,
+) -> tt.Generator[datetime.timedelta, None, None]:
+    """
+    Get durations of many flac files at once. All the lookups are submitted to
+    the thread pool up front, results are yielded in the order of paths as soon
+    as they are ready.
+    :param flac_paths: paths to flac files
+    :param jobs: max amount of concurrent lookups
+    :param cache: optional persistent cache, only files missing in it are probed
+    :return: generator of durations
+    """
+    flac_paths = list(flac_paths)
+    cached: tt.List[tt.Optional[datetime.timedelta]] = [None] * len(flac_paths)
+    keys: tt.List[tt.Optional[FileKey]] = []
+    if cache is not None:
+        # identities are taken before probing, file rewritten meanwhile isn't cached with old duration
+        keys = [file_key(p) for p in flac_paths]
+        cached = [cache.get(p, key) for p, key in zip(flac_paths, keys)]
+    missing = [p for p, d in zip(flac_paths, cached) if d is None]
+    missing_keys = [key for key, d in zip(keys, cached) if d is None]
+    probed = []
+
+    try:
+        if jobs <= 1 or len(missing) < 2:
+            probed_iter = map(get_flac_duration, missing)
+        else:
+            pool = ThreadPoolExecutor(max_workers=jobs)
+            probed_iter = pool.map(get_flac_duration, missing)
+            pool.shutdown(wait=False)
+        for d in cached:
+            if d is None:
+                d = next(probed_iter)
+                probed.append(d)
+            yield d
+    finally:
+        if cache is not None:
+            cache.put_many(zip(missing, missing_keys, probed))
+
+
+def get_flac_durations(
+        flac_paths: tt.Iterable[pathlib.Path], jobs: int = 1,
+        cache: tt.Optional[DurationCache] = None,
+) -> tt.List[datetime.timedelta]:
+    """
+    List version of iter_flac_durations
+    """
+    return list(iter_flac_durations(flac_paths, jobs=jobs, cache=cache))
+
+
+def get_ffprobe_duration(flac_path: pathlib.Path) -> datetime.timedelta:
+    """
+    Get duration of the audio file using ffprobe utility.
+    :param flac_path: path to audio file
+    :return: duration of audio file
+    """
+    STATS.count(SUBPROCESSES)
+    STATS.count(FFPROBE)
     output = subprocess.check_output(["ffprobe", "-v", "error", "-show_entries", "format=duration", "-of",
                                       "default=noprint_wrappers=1:nokey=1", str(flac_path)])
     return datetime.timedelta(seconds=float(output))
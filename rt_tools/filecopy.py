@@ -0,0 +1,124 @@
+"""
+Copying of files with kernel-side copies, links and skipping of unchanged destinations
+"""
+import os
+import enum
+import stat
+import errno
+import shutil
+import tempfile
+import hashlib
+import pathlib
+import typing as tt
+
+HASH_CHUNK_SIZE = 1024 * 1024
+# ioctl number of FICLONE from linux/fs.h
+FICLONE = 0x40049409
+# errors meaning kernel-side copy is not supported between these files
+_UNSUPPORTED_ERRNOS = {errno.EXDEV, errno.ENOSYS, errno.EINVAL, errno.EOPNOTSUPP, errno.ENOTSUP, errno.EBADF}
+
+
+class CopyMode(enum.Enum):
+    Copy = "copy"
+    Hardlink = "hardlink"
+    Reflink = "reflink"
+
+    @classmethod
+    def values(cls) -> tt.List[str]:
+        return [v.value for v in cls]
+
+
+def file_hash(path: pathlib.Path) -> str:
+    """
+    SHA-1 of file content, file is read by chunks
+    """
+    h = hashlib.sha1()
+    with open(path, "rb") as f:
+        while True:
+            chunk = f.read(HASH_CHUNK_SIZE)
+            if not chunk:
+                break
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def is_unchanged(src: pathlib.Path, dst: pathlib.Path, check_hash: bool = False) -> bool:
+    """
+    Check destination is already a copy of source: same size and mtime, or same content
+    when check_hash is set
+    """
+    try:
+        s_st, d_st = os.stat(src), os.stat(dst)
+    except OSError:
+        return False
+    if s_st.st_size != d_st.st_size:
+        return False
+    if (s_st.st_dev, s_st.st_ino) == (d_st.st_dev, d_st.st_ino):
+        return True
+    if s_st.st_mtime_ns == d_st.st_mtime_ns:
+        return True
+    return check_hash and file_hash(src) == file_hash(dst)
+
+
+def _kernel_copy(src_fd: int, dst_fd: int, size: int) -> bool:
+    """
+    Copy data between descriptors without passing it through user space
+    :return: False if neither copy_file_range nor sendfile is usable
+    """
+    for func in (getattr(os, "copy_file_range", None), getattr(os, "sendfile", None)):
+        if func is None:
+            continue
+        copied = 0
+        try:
+            while copied < size:
+                if func is os.sendfile:
+                    n = func(dst_fd, src_fd, copied, size - copied)
+                else:
+                    n = func(src_fd, dst_fd, size - copied, copied, copied)
+                if n == 0:
+                    break
+                copied += n
+        except OSError as e:
+            if e.errno not in _UNSUPPORTED_ERRNOS or copied:
+                raise
+            continue
+        return True
+    return False
+
+
+def _reflink(src_fd: int, dst_fd: int) -> bool:
+    try:
+        import fcntl
+        fcntl.ioctl(dst_fd, FICLONE, src_fd)
+    except (ImportError, OSError):
+        return False
+    return True
+
+
+def copy_file(src: pathlib.Path, dst: pathlib.Path, mode: CopyMode = CopyMode.Copy):
+    """
+    Copy file, destination is replaced atomically and gets mtime of the source.
+    Reflink falls back to copying when filesystem can't share extents, hardlink doesn't.
+    """
+    # unique name for every call, so concurrent copies to the same destination don't share it
+    fd, tmp_name = tempfile.mkstemp(prefix=f".{dst.name}.", suffix=".tmp", dir=dst.parent)
+    tmp = pathlib.Path(tmp_name)
+    try:
+        if mode == CopyMode.Hardlink:
+            os.close(fd)
+            os.unlink(tmp)
+            os.link(src, tmp)
+        else:
+            with os.fdopen(fd, "wb") as d_f, open(src, "rb") as s_f:
+                size = os.fstat(s_f.fileno()).st_size
+                done = mode == CopyMode.Reflink and _reflink(s_f.fileno(), d_f.fileno())
+                if not done and not _kernel_copy(s_f.fileno(), d_f.fileno(), size):
+                    shutil.copyfileobj(s_f, d_f)
+            st = os.stat(src)
+            # temp files are created private, copy gets permissions of the source like shutil.copy2
+            os.chmod(tmp, stat.S_IMODE(st.st_mode))
+            os.utime(tmp, ns=(st.st_atime_ns, st.st_mtime_ns))
+        os.replace(tmp, dst)
+    finally:
+        if os.path.lexists(tmp):
+            os.unlink(tmp)
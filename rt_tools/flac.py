@@ -0,0 +1,240 @@
+"""
+Reading of FLAC metadata blocks without decoding audio
+"""
+import pathlib
+import datetime
+import typing as tt
+
+FLAC_MAGIC = b"fLaC"
+ID3_MAGIC = b"ID3"
+
+BLOCK_STREAMINFO = 0
+BLOCK_VORBIS_COMMENT = 4
+BLOCK_CUESHEET = 5
+STREAMINFO_SIZE = 34
+# metadata blocks usually fit into the first read, larger ones like pictures are skipped with seek
+HEADER_READ_SIZE = 65536
+CUESHEET_TRACK_SIZE = 36
+CUESHEET_INDEX_SIZE = 12
+
+
+class StreamInfo(tt.NamedTuple):
+    sample_rate: int
+    channels: int
+    bits_per_sample: int
+    total_samples: int
+
+    @property
+    def duration(self) -> tt.Optional[datetime.timedelta]:
+        """
+        Exact duration of the stream, None if encoder hasn't stored number of samples
+        """
+        if not self.total_samples or not self.sample_rate:
+            return None
+        return datetime.timedelta(seconds=self.total_samples / self.sample_rate)
+
+
+def parse_stream_info(data: bytes) -> StreamInfo:
+    """
+    Decode body of STREAMINFO block
+    :param data: 34 bytes of block body
+    :return: decoded stream info
+    """
+    if len(data) < STREAMINFO_SIZE:
+        raise ValueError("STREAMINFO block is truncated")
+    # 20 bits of sample rate, 3 bits of channels, 5 bits of bps and 36 bits of samples
+    packed = int.from_bytes(data[10:18], "big")
+    return StreamInfo(
+        sample_rate=packed >> 44,
+        channels=((packed >> 41) & 0x7) + 1,
+        bits_per_sample=((packed >> 36) & 0x1F) + 1,
+        total_samples=packed & 0xF_FFFF_FFFF,
+    )
+
+
+def _skip_id3(f: tt.BinaryIO) -> bytes:
+    """
+    Skip ID3v2 tag some taggers put before the stream
+    :return: first 4 bytes after the tag
+    """
+    head = f.read(4)
+    if head[:3] != ID3_MAGIC:
+        return head
+    head += f.read(6)
+    size = 0
+    for b in head[6:10]:
+        size = (size << 7) | (b & 0x7F)
+    f.seek(size, 1)
+    return f.read(4)
+
+
+def read_stream_info(flac_path: pathlib.Path) -> StreamInfo:
+    """
+    Read STREAMINFO of flac file. It is always the first metadata block, so
+    only the first 42 bytes of the stream are read.
+    :param flac_path: path to flac file
+    :return: decoded stream info
+    """
+    with open(flac_path, "rb") as f:
+        if _skip_id3(f) != FLAC_MAGIC:
+            raise ValueError(f"{flac_path} is not a flac file")
+        header = f.read(4)
+        if len(header) < 4 or header[0] & 0x7F != BLOCK_STREAMINFO:
+            raise ValueError(f"{flac_path} has no STREAMINFO block")
+        return parse_stream_info(f.read(STREAMINFO_SIZE))
+
+
+class CueSheetTrack(tt.NamedTuple):
+    number: int
+    # offset of the track in samples from the start of the stream
+    offset: int
+    isrc: str
+
+
+class Metadata(tt.NamedTuple):
+    stream_info: StreamInfo
+    # vorbis comments by upper-cased field names, field could repeat
+    comments: tt.Dict[str, tt.List[str]]
+    cuesheet: tt.List[CueSheetTrack]
+
+    @property
+    def duration(self) -> tt.Optional[datetime.timedelta]:
+        return self.stream_info.duration
+
+    def tag(self, *names: str) -> tt.Optional[str]:
+        """
+        Values of the first present field joined with ", "
+        """
+        for name in names:
+            values = self.comments.get(name)
+            if values:
+                return ", ".join(values)
+        return None
+
+    @property
+    def title(self) -> tt.Optional[str]:
+        return self.tag("TITLE")
+
+    @property
+    def composer(self) -> tt.Optional[str]:
+        return self.tag("COMPOSER")
+
+    @property
+    def performer(self) -> tt.Optional[str]:
+        return self.tag("PERFORMER", "ARTIST")
+
+    def _number(self, name: str) -> tt.Optional[int]:
+        # "3" and "3/12" forms are used
+        value = self.tag(name)
+        if value is None:
+            return None
+        value = value.partition("/")[0].strip()
+        return int(value) if value.isdigit() else None
+
+    @property
+    def track_number(self) -> tt.Optional[int]:
+        return self._number("TRACKNUMBER")
+
+    @property
+    def disc_number(self) -> tt.Optional[int]:
+        return self._number("DISCNUMBER")
+
+
+def parse_vorbis_comment(data: bytes) -> tt.Dict[str, tt.List[str]]:
+    """
+    Decode body of VORBIS_COMMENT block, lengths in it are little-endian unlike the rest of flac
+    """
+    res: tt.Dict[str, tt.List[str]] = {}
+    try:
+        pos = 4 + int.from_bytes(data[0:4], "little")
+        count = int.from_bytes(data[pos:pos + 4], "little")
+        pos += 4
+        for _ in range(count):
+            size = int.from_bytes(data[pos:pos + 4], "little")
+            pos += 4
+            if pos + size > len(data):
+                break
+            name, sep, value = data[pos:pos + size].decode("utf-8", errors="replace").partition("=")
+            pos += size
+            if sep:
+                res.setdefault(name.upper(), []).append(value)
+    except IndexError:
+        pass
+    return res
+
+
+def parse_cuesheet(data: bytes) -> tt.List[CueSheetTrack]:
+    """
+    Decode tracks of CUESHEET block, lead-out track is included
+    """
+    # media catalog number, lead-in samples, flags with reserved bytes
+    pos = 128 + 8 + 259
+    if len(data) <= pos:
+        raise ValueError("CUESHEET block is truncated")
+    count = data[pos]
+    pos += 1
+    res = []
+    for _ in range(count):
+        if pos + CUESHEET_TRACK_SIZE > len(data):
+            raise ValueError("CUESHEET block is truncated")
+        offset = int.from_bytes(data[pos:pos + 8], "big")
+        number = data[pos + 8]
+        isrc = data[pos + 9:pos + 21].rstrip(b"\0").decode("ascii", errors="replace")
+        indexes = data[pos + 35]
+        res.append(CueSheetTrack(number, offset, isrc))
+        pos += CUESHEET_TRACK_SIZE + indexes * CUESHEET_INDEX_SIZE
+    return res
+
+
+def read_metadata(flac_path: pathlib.Path) -> Metadata:
+    """
+    Walk metadata blocks of flac file, decoding STREAMINFO, VORBIS_COMMENT and CUESHEET.
+    Blocks are taken from one read of the file head, only blocks beyond it need more reads.
+    :param flac_path: path to flac file
+    :return: decoded metadata
+    """
+    with open(flac_path, "rb") as f:
+        data = f.read(HEADER_READ_SIZE)
+        # offset of data in the file
+        base = 0
+
+        def take(pos: int, size: int) -> bytes:
+            nonlocal data, base
+            if pos < base or pos + size > base + len(data):
+                f.seek(pos)
+                data = f.read(max(size, HEADER_READ_SIZE))
+                base = pos
+            if pos + size > base + len(data):
+                raise ValueError(f"{flac_path} is truncated")
+            return data[pos - base:pos - base + size]
+
+        pos = 0
+        if data[:3] == ID3_MAGIC and len(data) >= 10:
+            size = 0
+            for b in data[6:10]:
+                size = (size << 7) | (b & 0x7F)
+            pos = 10 + size
+        if take(pos, 4) != FLAC_MAGIC:
+            raise ValueError(f"{flac_path} is not a flac file")
+        pos += 4
+
+        stream_info = None
+        comments: tt.Dict[str, tt.List[str]] = {}
+        cuesheet: tt.List[CueSheetTrack] = []
+        while True:
+            header = take(pos, 4)
+            block_type = header[0] & 0x7F
+            size = int.from_bytes(header[1:4], "big")
+            pos += 4
+            if block_type == BLOCK_STREAMINFO:
+                stream_info = parse_stream_info(take(pos, size))
+            elif block_type == BLOCK_VORBIS_COMMENT:
+                comments = parse_vorbis_comment(take(pos, size))
+            elif block_type == BLOCK_CUESHEET:
+                cuesheet = parse_cuesheet(take(pos, size))
+            pos += size
+            if header[0] & 0x80:
+                break
+        if stream_info is None:
+            raise ValueError(f"{flac_path} has no STREAMINFO block")
+        return Metadata(stream_info, comments, cuesheet)
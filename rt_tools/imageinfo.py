@@ -0,0 +1,116 @@
+"""
+Dimensions and format of JPEG and PNG images read from their headers, pixels are never decoded
+"""
+import os
+import struct
+import pathlib
+import typing as tt
+from concurrent.futures import ThreadPoolExecutor
+
+FORMAT_JPEG = "jpeg"
+FORMAT_PNG = "png"
+
+PNG_MAGIC = b"\x89PNG\r\n\x1a\n"
+JPEG_MAGIC = b"\xff\xd8"
+# SOF markers carry dimensions, C4 (DHT), C8 (JPG) and CC (DAC) share the range but don't
+_SOF_MARKERS = frozenset(range(0xC0, 0xD0)) - {0xC4, 0xC8, 0xCC}
+# markers without length: TEM and RST0-7
+_STANDALONE_MARKERS = frozenset([0x01] + list(range(0xD0, 0xD8)))
+# head of the file read at once, segments beyond it are reached with seek
+HEAD_READ_SIZE = 4096
+
+
+class ImageInfo(tt.NamedTuple):
+    path: pathlib.Path
+    format: str
+    width: int
+    height: int
+    # size of the file in bytes
+    size: int
+
+    @property
+    def pixels(self) -> int:
+        return self.width * self.height
+
+    def __str__(self) -> str:
+        return f"{self.format} {self.width}x{self.height}, {self.size / 1024:.0f} KiB"
+
+
+def _png_size(head: bytes) -> tt.Optional[tt.Tuple[int, int]]:
+    # IHDR is always the first chunk: length, type, width, height
+    if len(head) < 24 or head[12:16] != b"IHDR":
+        return None
+    return struct.unpack(">II", head[16:24])
+
+
+def _jpeg_size(f: tt.BinaryIO, head: bytes) -> tt.Optional[tt.Tuple[int, int]]:
+    data = head
+    base = 0
+    pos = 2
+    while True:
+        if pos + 4 > base + len(data):
+            # segments like EXIF thumbnails are skipped, only next marker is read
+            f.seek(pos)
+            data = f.read(HEAD_READ_SIZE)
+            base = pos
+            if len(data) < 4:
+                return None
+        i = pos - base
+        if data[i] != 0xFF:
+            return None
+        marker = data[i + 1]
+        if marker == 0xFF:
+            # fill byte before marker
+            pos += 1
+            continue
+        if marker in _STANDALONE_MARKERS:
+            pos += 2
+            continue
+        if marker in (0xD9, 0xDA):
+            # end of image or start of scan without frame header
+            return None
+        length = (data[i + 2] << 8) | data[i + 3]
+        if marker in _SOF_MARKERS:
+            if pos + 9 > base + len(data):
+                f.seek(pos)
+                data = f.read(HEAD_READ_SIZE)
+                base = pos
+                i = 0
+                if len(data) < 9:
+                    return None
+            height, width = struct.unpack(">HH", data[i + 5:i + 9])
+            return width, height
+        pos += 2 + length
+
+
+def probe_image(path: pathlib.Path) -> tt.Optional[ImageInfo]:
+    """
+    Read format and dimensions of the image
+    :return: image info, None if the file isn't readable JPEG or PNG
+    """
+    try:
+        with open(path, "rb") as f:
+            head = f.read(HEAD_READ_SIZE)
+            if head.startswith(PNG_MAGIC):
+                fmt, dims = FORMAT_PNG, _png_size(head)
+            elif head.startswith(JPEG_MAGIC):
+                fmt, dims = FORMAT_JPEG, _jpeg_size(f, head)
+            else:
+                return None
+            size = os.fstat(f.fileno()).st_size
+    except OSError:
+        return None
+    if dims is None:
+        return None
+    return ImageInfo(path, fmt, dims[0], dims[1], size)
+
+
+def probe_images(paths: tt.Iterable[pathlib.Path], jobs: int = 1) -> tt.List[tt.Optional[ImageInfo]]:
+    """
+    Probe many images at once, results are in the order of paths
+    """
+    paths = list(paths)
+    if jobs <= 1 or len(paths) < 2:
+        return list(map(probe_image, paths))
+    with ThreadPoolExecutor(max_workers=jobs) as pool:
+        return list(pool.map(probe_image, paths))
@@ -0,0 +1,185 @@
+"""
+Index of cue sheets of the music library: sheet and track fields in sqlite
+with full-text search over titles, performers and composers
+"""
+import os
+import pathlib
+import typing as tt
+
+from rt_tools.cache import user_cache_dir, connect, FileKey
+
+LIBRARY_FILE_NAME = "library.sqlite"
+# bump when schema or indexed fields change, index is rebuilt from scratch then
+LIBRARY_VERSION = 1
+# columns of full-text index, filters of queries refer to them
+TEXT_COLUMNS = ("title", "performer", "composer", "album")
+
+_SCHEMA = [
+    "CREATE TABLE IF NOT EXISTS discs ("
+    "id INTEGER PRIMARY KEY, path TEXT UNIQUE, size INTEGER, mtime_ns INTEGER, inode INTEGER, "
+    "performer TEXT, title TEXT, seconds REAL, tracks INTEGER)",
+    "CREATE TABLE IF NOT EXISTS tracks ("
+    "id INTEGER PRIMARY KEY, disc_id INTEGER, number INTEGER, "
+    "title TEXT, performer TEXT, composer TEXT, seconds REAL)",
+    "CREATE INDEX IF NOT EXISTS tracks_disc ON tracks (disc_id)",
+    # own copy of the text, so rows are removed by rowid without keeping old values around
+    "CREATE VIRTUAL TABLE IF NOT EXISTS track_text USING fts5("
+    + ", ".join(TEXT_COLUMNS) + ", tokenize='unicode61 remove_diacritics 2')",
+]
+
+
+class DiscInfo(tt.NamedTuple):
+    path: pathlib.Path
+    performer: tt.Optional[str]
+    title: tt.Optional[str]
+    # duration in seconds, None when unknown
+    seconds: tt.Optional[float]
+    tracks: int
+
+
+class TrackInfo(tt.NamedTuple):
+    number: int
+    title: tt.Optional[str]
+    performer: tt.Optional[str]
+    composer: tt.Optional[str]
+    seconds: tt.Optional[float] = None
+
+
+class Match(tt.NamedTuple):
+    disc: DiscInfo
+    # matching tracks of the disc in order of numbers
+    tracks: tt.List[TrackInfo]
+
+
+def build_query(words: tt.Iterable[str], column: tt.Optional[str] = None) -> str:
+    """
+    Turn plain words into FTS query matching all of them, so punctuation
+    like "Op. 27" is never taken as query syntax. Word ending with * matches as prefix.
+    :param column: restrict words to one of TEXT_COLUMNS
+    """
+    terms = []
+    for word in words:
+        prefix = word.endswith("*")
+        word = word.rstrip("*")
+        if not word:
+            continue
+        term = '"' + word.replace('"', '""') + '"' + ("*" if prefix else "")
+        terms.append(term)
+    if not terms:
+        return ""
+    query = " ".join(terms)
+    if column is not None:
+        query = f"{column} : ({query})"
+    return query
+
+
+class LibraryIndex:
+    """
+    Parsed cue sheets keyed by path and file identity. Sheet is indexed again
+    once its size, mtime or inode changes.
+    """
+    def __init__(self, db_path: tt.Optional[pathlib.Path] = None):
+        if db_path is None:
+            db_path = user_cache_dir() / LIBRARY_FILE_NAME
+        self.db_path = db_path
+        self._conn = connect(db_path)
+        version = self._conn.execute("PRAGMA user_version").fetchone()[0]
+        with self._conn:
+            if version != LIBRARY_VERSION:
+                for table in ("track_text", "tracks", "discs"):
+                    self._conn.execute(f"DROP TABLE IF EXISTS {table}")
+                self._conn.execute(f"PRAGMA user_version = {LIBRARY_VERSION}")
+            for statement in _SCHEMA:
+                self._conn.execute(statement)
+
+    def close(self):
+        self._conn.close()
+
+    def __enter__(self) -> "LibraryIndex":
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    @staticmethod
+    def _key_path(path: pathlib.Path) -> str:
+        return os.path.abspath(path)
+
+    def known(self, root: pathlib.Path) -> tt.Dict[str, tt.Tuple[FileKey, bool]]:
+        """
+        Sheets indexed under root
+        :return: absolute path -> identity of the file when indexed and whether duration is known
+        """
+        root_path = self._key_path(root)
+        res = {}
+        # paths under root sort between "root/" and "root0", so the range is served by index of paths
+        for path, size, mtime_ns, inode, seconds in self._conn.execute(
+                "SELECT path, size, mtime_ns, inode, seconds FROM discs WHERE path = ? OR (path > ? AND path < ?)",
+                (root_path, os.path.join(root_path, ""), root_path.rstrip(os.sep) + chr(ord(os.sep) + 1))):
+            res[path] = ((size, mtime_ns, inode), seconds is not None)
+        return res
+
+    def put(self, path: pathlib.Path, key: FileKey, disc: DiscInfo, tracks: tt.Iterable[TrackInfo]):
+        """
+        Store the sheet replacing its previous version
+        """
+        with self._conn:
+            self._remove(self._key_path(path))
+            cur = self._conn.execute(
+                "INSERT INTO discs (path, size, mtime_ns, inode, performer, title, seconds, tracks) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (self._key_path(path), *key, disc.performer, disc.title, disc.seconds, disc.tracks))
+            disc_id = cur.lastrowid
+            album = " - ".join(v for v in (disc.performer, disc.title) if v)
+            for t in tracks:
+                cur = self._conn.execute(
+                    "INSERT INTO tracks (disc_id, number, title, performer, composer, seconds) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    (disc_id, t.number, t.title, t.performer, t.composer, t.seconds))
+                self._conn.execute(
+                    "INSERT INTO track_text (rowid, title, performer, composer, album) VALUES (?, ?, ?, ?, ?)",
+                    (cur.lastrowid, t.title, t.performer, t.composer, album))
+
+    def _remove(self, path: str):
+        row = self._conn.execute("SELECT id FROM discs WHERE path = ?", (path,)).fetchone()
+        if row is None:
+            return
+        self._conn.execute("DELETE FROM track_text WHERE rowid IN (SELECT id FROM tracks WHERE disc_id = ?)", row)
+        self._conn.execute("DELETE FROM tracks WHERE disc_id = ?", row)
+        self._conn.execute("DELETE FROM discs WHERE id = ?", row)
+
+    def remove(self, paths: tt.Iterable[str]) -> int:
+        """
+        Remove sheets by their absolute paths
+        :return: count of removed sheets
+        """
+        count = 0
+        with self._conn:
+            for path in paths:
+                self._remove(path)
+                count += 1
+        return count
+
+    def search(self, query: str, limit: tt.Optional[int] = None) -> tt.List[Match]:
+        """
+        Find tracks by FTS query, see build_query
+        :param limit: max count of discs
+        :return: discs ordered by path with their matching tracks
+        """
+        rows = self._conn.execute(
+            "SELECT d.path, d.performer, d.title, d.seconds, d.tracks, "
+            "t.number, t.title, t.performer, t.composer, t.seconds "
+            "FROM track_text JOIN tracks t ON t.id = track_text.rowid JOIN discs d ON d.id = t.disc_id "
+            "WHERE track_text MATCH ? ORDER BY d.path, t.number", (query,))
+        res: tt.List[Match] = []
+        for row in rows:
+            if not res or str(res[-1].disc.path) != row[0]:
+                if limit is not None and len(res) >= limit:
+                    break
+                res.append(Match(DiscInfo(pathlib.Path(row[0]), *row[1:5]), []))
+            res[-1].tracks.append(TrackInfo(*row[5:]))
+        return res
+
+    def stats(self) -> str:
+        discs, tracks = self._conn.execute("SELECT COUNT(*), SUM(tracks) FROM discs").fetchone()
+        return f"Library index {self.db_path}: {discs} discs, {tracks or 0} tracks"
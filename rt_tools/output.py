@@ -0,0 +1,106 @@
+"""
+Buffered output of generated posts
+"""
+import sys
+import pathlib
+import typing as tt
+
+from rt_tools.textfiles import iter_text_chunks
+from rt_tools.stats import STATS, timed, OUTPUT
+
+DEFAULT_BUFFER_SIZE = 1024 * 1024
+
+
+class EmbeddedFile(tt.NamedTuple):
+    """
+    Text file to be embedded in the output as is. Sink copies it by chunks,
+    str() gives the whole text.
+    """
+    path: pathlib.Path
+    # amount of chars to drop from start and end of the text
+    skip_head: int = 0
+    skip_tail: int = 0
+
+    def chunks(self) -> tt.Generator[str, None, None]:
+        head = self.skip_head
+        pending = ""
+        for chunk in iter_text_chunks(self.path):
+            if head:
+                drop = min(head, len(chunk))
+                chunk = chunk[drop:]
+                head -= drop
+            if self.skip_tail:
+                chunk = pending + chunk
+                pending = chunk[-self.skip_tail:]
+                chunk = chunk[:-self.skip_tail]
+            if chunk:
+                yield chunk
+
+    def __str__(self) -> str:
+        return "".join(self.chunks())
+
+
+Line = tt.Union[str, EmbeddedFile]
+
+
+class OutputSink:
+    """
+    Line-oriented output into stdout or file with large write buffer
+    """
+    def __init__(self, path: tt.Optional[pathlib.Path] = None, buffer_size: int = DEFAULT_BUFFER_SIZE,
+                 stream: tt.Optional[tt.TextIO] = None):
+        """
+        :param path: file to write, stdout if neither path nor stream is given
+        :param stream: already opened stream to write, not closed by the sink
+        """
+        if stream is not None or path is None:
+            self._stream = stream if stream is not None else sys.stdout
+            self._owned = False
+        else:
+            self._stream = open(path, "w", encoding="utf-8")
+            self._owned = True
+        self.buffer_size = buffer_size
+        self._buf: tt.List[str] = []
+        self._buffered = 0
+
+    def __enter__(self) -> "OutputSink":
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def write(self, text: str):
+        self._buf.append(text)
+        self._buffered += len(text)
+        if self._buffered >= self.buffer_size:
+            self.flush()
+
+    def line(self, item: Line = ""):
+        """
+        Write line, the same as print() does
+        """
+        if isinstance(item, EmbeddedFile):
+            for chunk in item.chunks():
+                self.write(chunk)
+        else:
+            self.write(item)
+        self.write("\n")
+
+    def lines(self, items: tt.Iterable[Line]):
+        for item in items:
+            self.line(item)
+
+    @timed(OUTPUT)
+    def flush(self):
+        if self._buf:
+            # chars, not encoded bytes
+            STATS.add_bytes(OUTPUT, self._buffered)
+            self._stream.write("".join(self._buf))
+            self._buf.clear()
+            self._buffered = 0
+        self._stream.flush()
+
+    def close(self):
+        self.flush()
+        if self._owned:
+            self._stream.close()
@@ -0,0 +1,133 @@
+"""
+Index of release tree built with a single walk of directories
+"""
+import os
+import pathlib
+import typing as tt
+
+from rt_tools import warm
+from rt_tools.stats import timed, SCAN
+
+AUDIOCHECKER_LOG = "audiochecker.log"
+COVER_SUFFIXES = (".jpg", ".jpeg", ".png")
+
+
+class DiscDir:
+    """
+    Files of one directory classified by their kind
+    """
+    def __init__(self, path: pathlib.Path):
+        self.path = path
+        self.names: tt.Set[str] = set()
+        self.cues: tt.List[pathlib.Path] = []
+        self.flacs: tt.List[pathlib.Path] = []
+        self.logs: tt.List[pathlib.Path] = []
+        self.dr_reports: tt.List[pathlib.Path] = []
+        self.covers: tt.List[pathlib.Path] = []
+
+    def add(self, name: str):
+        self.names.add(name)
+        path = self.path / name
+        lower = name.lower()
+        if name.endswith(".cue"):
+            self.cues.append(path)
+        elif name.endswith(".flac"):
+            self.flacs.append(path)
+        elif name.endswith(".log"):
+            self.logs.append(path)
+        elif name.startswith("dr14") and name.endswith(".txt"):
+            self.dr_reports.append(path)
+        elif lower.endswith(COVER_SUFFIXES):
+            self.covers.append(path)
+
+    def finish(self):
+        for files in (self.cues, self.flacs, self.logs, self.dr_reports, self.covers):
+            files.sort()
+
+    def has(self, name: str) -> bool:
+        return name in self.names
+
+    @property
+    def rip_logs(self) -> tt.List[pathlib.Path]:
+        return [p for p in self.logs if p.name != AUDIOCHECKER_LOG]
+
+    @property
+    def audiochecker_log(self) -> tt.Optional[pathlib.Path]:
+        if self.has(AUDIOCHECKER_LOG):
+            return self.path / AUDIOCHECKER_LOG
+        return None
+
+
+@timed(SCAN)
+def list_dir(path: pathlib.Path) -> tt.Tuple[DiscDir, tt.List[pathlib.Path]]:
+    """
+    List the directory
+    :return: files of directory and its subdirectories
+    """
+    disc = DiscDir(path)
+    subdirs = []
+    try:
+        with os.scandir(path) as it:
+            for entry in it:
+                # symlinked directories aren't walked, like glob("**") didn't, so link cycles don't loop
+                if entry.is_dir(follow_symlinks=False):
+                    subdirs.append(path / entry.name)
+                elif not entry.is_dir():
+                    disc.add(entry.name)
+    except OSError:
+        pass
+    disc.finish()
+    return disc, subdirs
+
+
+class ReleaseIndex:
+    """
+    Lazily filled index of directories. Every directory is listed at most once,
+    whether it was reached by the tree walk or requested directly.
+    """
+    def __init__(self):
+        self._dirs: tt.Dict[pathlib.Path, DiscDir] = {}
+
+    def _list_dir(self, path: pathlib.Path) -> tt.Tuple[DiscDir, tt.List[pathlib.Path]]:
+        if warm.ENABLED:
+            # mtime of directory changes once its entries are added, removed or renamed
+            disc, subdirs = warm.LISTINGS.get(path, list_dir)
+        else:
+            disc, subdirs = list_dir(path)
+        self._dirs[path] = disc
+        return disc, subdirs
+
+    def dir(self, path: pathlib.Path) -> DiscDir:
+        """
+        Get listing of single directory
+        """
+        disc = self._dirs.get(path)
+        if disc is None:
+            disc, _ = self._list_dir(path)
+        return disc
+
+    def scan(self, root: pathlib.Path) -> tt.List[DiscDir]:
+        """
+        Walk the tree under root
+        :return: all directories of the tree sorted by path
+        """
+        res = []
+        stack = [root]
+        while stack:
+            disc, subdirs = self._list_dir(stack.pop())
+            res.append(disc)
+            stack.extend(subdirs)
+        res.sort(key=lambda d: d.path)
+        return res
+
+    def cues(self, root: pathlib.Path) -> tt.List[pathlib.Path]:
+        """
+        Same as sorted(root.glob("**/*.cue"))
+        """
+        return sorted(p for disc in self.scan(root) for p in disc.cues)
+
+    def flac_dirs(self, root: pathlib.Path) -> tt.List[DiscDir]:
+        """
+        Directories under root which contain flac files
+        """
+        return [disc for disc in self.scan(root) if disc.flacs]
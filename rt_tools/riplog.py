@@ -0,0 +1,268 @@
+"""
+Analysis of EAC and XLD rip logs: read mode, drive, CRCs, AccurateRip results and errors
+"""
+import re
+import sys
+import functools
+import pathlib
+import typing as tt
+
+from rt_tools.cache import file_key, FileKey
+from rt_tools.textfiles import iter_text_chunks
+from rt_tools.stats import timed, RIPLOG
+
+RIPPER_EAC = "EAC"
+RIPPER_XLD = "XLD"
+
+AR_ACCURATE = "accurate"
+AR_INACCURATE = "inaccurate"
+AR_NOT_PRESENT = "not present"
+
+# number of track standing for the whole range of image rips
+RANGE_TRACK = 0
+ANALYZE_CACHE_SIZE = 1024
+
+# every line is matched once against all the variants, part of group name after "__"
+# only tells variants apart, field is the part before it
+_LINE_RE = re.compile("(?:" + "|".join([
+    r"(?P<eac>Exact Audio Copy V.*)",
+    r"(?P<xld>X Lossless Decoder version.*)",
+    r"Used drive\s*:\s*(?P<drive>.*?)(?:\s+Adapter:.*)?",
+    r"Read mode\s*:\s*(?P<read_mode>.+)",
+    r"Ripper mode\s*:\s*(?P<read_mode__xld>.+)",
+    r"Read offset correction\s*:\s*(?P<offset>-?\d+)",
+    r"Track\s+(?P<track>\d+)",
+    r"(?P<range>Selected range)",
+    r"Peak level (?P<peak>[\d.]+) %",
+    r"Peak\s*:\s*(?P<peak__xld>[\d.]+)",
+    r"Test CRC (?P<test_crc>[0-9A-Fa-f]{8})",
+    r"Copy CRC (?P<copy_crc>[0-9A-Fa-f]{8})",
+    r"CRC32 hash \(test run\)\s*:\s*(?P<test_crc__xld>[0-9A-Fa-f]{8})",
+    r"CRC32 hash\s*:\s*(?P<copy_crc__xld>[0-9A-Fa-f]{8})",
+    r"(?P<copy_ok>Copy OK)",
+    r"(?:->)?Accurately ripped \(.*?confidence (?P<ar_ok>\d+(?:\+\d+)*).*",
+    r"Cannot be verified as accurate \(confidence (?P<ar_bad>\d+).*",
+    r"->(?P<ar_bad__xld>Rip may not be accurate).*",
+    r"(?:->)?(?P<ar_missing>Track not present in AccurateRip database).*",
+    r"Track\s+(?P<ar_summary>\d+\s+(?:accurately ripped|cannot be verified|not present).*)",
+    r"(?P<track_error>Suspicious position .*|Missing samples.*|Timing problem .*)",
+    r"(?P<xld_error>(?:Read error|Jitter error|Retry sector count|Damaged sectors"
+    r"|Skipped \(treated as error\)|Inconsistency in error sectors)(?: \([^)]*\))?\s*:\s*\d+)",
+    r"(?P<log_error>There were errors|Some tracks could not be verified as accurate|Some inconsistencies found)",
+]) + ")$")
+_SUMMARY_RE = re.compile(r"(\d+)\s+(?:(accurately ripped)|(not present)|cannot be verified)"
+                         r"(?:.*?confidence (\d+))?")
+
+
+class TrackLog:
+    """
+    Results of one track, or of the whole range for image rips
+    """
+    def __init__(self, number: int):
+        self.number = number
+        # peak level in percents
+        self.peak: tt.Optional[float] = None
+        self.test_crc: tt.Optional[str] = None
+        self.copy_crc: tt.Optional[str] = None
+        self.ar_status: tt.Optional[str] = None
+        self.ar_confidence: tt.Optional[int] = None
+        # None when ripper doesn't report it
+        self.copy_ok: tt.Optional[bool] = None
+        self.errors: tt.List[str] = []
+
+    @property
+    def crc_mismatch(self) -> bool:
+        return self.test_crc is not None and self.copy_crc is not None and self.test_crc != self.copy_crc
+
+    def problems(self) -> tt.List[str]:
+        res = []
+        if self.crc_mismatch:
+            res.append("test and copy CRC differ")
+        if self.copy_ok is False:
+            res.append("copy is not OK")
+        if self.ar_status == AR_INACCURATE:
+            res.append("not accurate in AccurateRip")
+        res.extend(self.errors)
+        return res
+
+
+class RipLog:
+    """
+    Result of rip log analysis
+    """
+    def __init__(self, path: tt.Optional[pathlib.Path] = None):
+        self.path = path
+        self.ripper: tt.Optional[str] = None
+        self.drive: tt.Optional[str] = None
+        self.read_mode: tt.Optional[str] = None
+        self.read_offset: tt.Optional[int] = None
+        self.errors: tt.List[str] = []
+        self._tracks: tt.Dict[int, TrackLog] = {}
+
+    @property
+    def tracks(self) -> tt.List[TrackLog]:
+        return [self._tracks[n] for n in sorted(self._tracks)]
+
+    def track(self, number: int) -> TrackLog:
+        t = self._tracks.get(number)
+        if t is None:
+            t = self._tracks[number] = TrackLog(number)
+        return t
+
+    @property
+    def secure(self) -> bool:
+        if self.read_mode is None:
+            return False
+        if self.ripper == RIPPER_XLD:
+            return "Secure" in self.read_mode or "CDParanoia" in self.read_mode
+        return self.read_mode.startswith("Secure")
+
+    def problems(self) -> tt.List[str]:
+        if self.ripper is None:
+            return ["not an EAC or XLD log"]
+        res = []
+        if not self.secure:
+            res.append(f"read mode is {self.read_mode or 'unknown'}")
+        res.extend(self.errors)
+        for t in self.tracks:
+            name = "range" if t.number == RANGE_TRACK else f"track {t.number}"
+            res.extend(f"{name}: {p}" for p in t.problems())
+        return res
+
+    def summary(self) -> tt.Generator[str, None, None]:
+        """
+        Compact table of the log
+        """
+        offset = self.read_offset if self.read_offset is not None else "?"
+        yield f"{self.ripper or '?'}, drive {self.drive or '?'}, read mode {self.read_mode or '?'}, offset {offset}"
+        yield f"{'Track':<6} {'Peak':>7}  {'Test CRC':<8}  {'Copy CRC':<8}  AR"
+        for t in self.tracks:
+            name = "range" if t.number == RANGE_TRACK else str(t.number)
+            peak = f"{t.peak:.1f}%" if t.peak is not None else ""
+            if t.ar_status == AR_NOT_PRESENT:
+                ar = "-"
+            elif t.ar_status is not None:
+                ar = f"{'ok' if t.ar_status == AR_ACCURATE else 'bad'}"
+                if t.ar_confidence is not None:
+                    ar += f" ({t.ar_confidence})"
+            else:
+                ar = ""
+            yield f"{name:<6} {peak:>7}  {t.test_crc or '':<8}  {t.copy_crc or '':<8}  {ar}".rstrip()
+        problems = self.problems()
+        yield "Problems: " + ("; ".join(problems) if problems else "none")
+
+
+def iter_lines(chunks: tt.Iterable[str]) -> tt.Generator[str, None, None]:
+    """
+    Split text given by chunks into lines
+    """
+    pending = ""
+    for chunk in chunks:
+        lines = (pending + chunk).split("\n")
+        pending = lines.pop()
+        yield from lines
+    if pending:
+        yield pending
+
+
+def analyze_lines(lines: tt.Iterable[str], path: tt.Optional[pathlib.Path] = None) -> RipLog:
+    log = RipLog(path)
+    track: tt.Optional[TrackLog] = None
+    for line in lines:
+        m = _LINE_RE.match(line.strip())
+        if m is None:
+            continue
+        name = m.lastgroup
+        value = m.group(name)
+        field = name.partition("__")[0]
+        if field == "track":
+            track = log.track(int(value))
+            if log.ripper == RIPPER_EAC:
+                track.copy_ok = False
+        elif field == "range":
+            track = log.track(RANGE_TRACK)
+            track.copy_ok = False
+        elif field == "eac":
+            log.ripper = RIPPER_EAC
+        elif field == "xld":
+            log.ripper = RIPPER_XLD
+        elif field == "drive":
+            log.drive = " ".join(value.split())
+        elif field == "read_mode":
+            log.read_mode = value.strip()
+        elif field == "offset":
+            log.read_offset = int(value)
+        elif field == "ar_summary":
+            s = _SUMMARY_RE.match(value)
+            if s is not None:
+                t = log.track(int(s.group(1)))
+                t.ar_status = AR_ACCURATE if s.group(2) else AR_NOT_PRESENT if s.group(3) else AR_INACCURATE
+                t.ar_confidence = int(s.group(4)) if s.group(4) else None
+        elif field == "log_error":
+            log.errors.append(value)
+        elif track is None:
+            continue
+        elif field == "peak":
+            # XLD gives peak as ratio
+            track.peak = float(value) * 100 if name.endswith("__xld") else float(value)
+        elif field == "test_crc":
+            track.test_crc = value.upper()
+        elif field == "copy_crc":
+            track.copy_crc = value.upper()
+        elif field == "copy_ok":
+            track.copy_ok = True
+        elif field == "ar_ok":
+            track.ar_status = AR_ACCURATE
+            track.ar_confidence = sum(int(v) for v in value.split("+"))
+        elif field == "ar_bad":
+            track.ar_status = AR_INACCURATE
+            track.ar_confidence = int(value) if value.isdigit() else None
+        elif field == "ar_missing":
+            track.ar_status = AR_NOT_PRESENT
+        elif field == "track_error":
+            track.errors.append(value)
+        elif field == "xld_error":
+            if int(value.rpartition(":")[2]) > 0:
+                track.errors.append(" ".join(value.split()))
+    return log
+
+
+@functools.lru_cache(maxsize=ANALYZE_CACHE_SIZE)
+def _analyze_file(path: pathlib.Path, key: tt.Optional[FileKey]) -> RipLog:
+    return analyze_lines(iter_lines(iter_text_chunks(path)), path)
+
+
+@timed(RIPLOG)
+def analyze_log(path: pathlib.Path) -> RipLog:
+    """
+    Analyze rip log, reading it by chunks. Results are kept until the file changes.
+    """
+    return _analyze_file(path, file_key(path))
+
+
+def summary_spoiler(path: pathlib.Path) -> tt.Generator[str, None, None]:
+    """
+    Spoiler of the post with summary table of the log
+    """
+    yield '[spoiler="Сводка лога рипа"][pre]'
+    yield from analyze_log(path).summary()
+    yield '[/pre][/spoiler]'
+
+
+def report_problems(paths: tt.Iterable[tt.Optional[pathlib.Path]], file: tt.Optional[tt.TextIO] = None) -> int:
+    """
+    Print problems of every log which has them, missing logs are skipped
+    :param file: stream to print into, stderr by default
+    :return: count of logs with problems
+    """
+    if file is None:
+        file = sys.stderr
+    count = 0
+    for path in paths:
+        if path is None or not path.exists():
+            continue
+        problems = analyze_log(path).problems()
+        if problems:
+            count += 1
+            print(f"{path}: " + "; ".join(problems), file=file)
+    return count
@@ -0,0 +1,175 @@
+"""
+Utility to generate posts of many releases at once, every release is processed in its own worker process
+"""
+import os
+import sys
+import time
+import argparse
+import pathlib
+import traceback
+import typing as tt
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from rt_tools.titles import ComposersMode
+from rt_tools.cache import DurationCache
+from rt_tools.output import OutputSink
+from rt_tools.release_index import ReleaseIndex
+from rt_tools.scripts import cue_gen, trk_gen
+
+TOOL_CUE = "cue"
+TOOL_TRK = "trk"
+OUTPUT_SUFFIX = ".txt"
+
+
+class ReleaseJob(tt.NamedTuple):
+    tool: str
+    root: pathlib.Path
+    output: pathlib.Path
+    mode: str
+    composers: str
+    separators: tt.Tuple[str, ...]
+    duration: bool
+    use_cache: bool
+    performers: bool
+
+
+class ReleaseResult(tt.NamedTuple):
+    root: pathlib.Path
+    output: pathlib.Path
+    seconds: float
+    error: tt.Optional[str] = None
+
+
+def find_releases(root: pathlib.Path) -> tt.List[pathlib.Path]:
+    """
+    Every subdirectory of root is a separate release
+    """
+    return sorted(p for p in root.iterdir() if p.is_dir())
+
+
+def output_names(roots: tt.List[pathlib.Path]) -> tt.List[str]:
+    """
+    Names of output files for releases, name of the release directory where it is unique.
+    Releases with the same directory name, like CD1 of different boxes, get name of the parent too
+    and numbers if that doesn't help.
+    """
+    resolved = [r.resolve() for r in roots]
+    counts: tt.Dict[str, int] = {}
+    for r in resolved:
+        counts[r.name] = counts.get(r.name, 0) + 1
+    names = [f"{r.parent.name} - {r.name}" if counts[r.name] > 1 else r.name for r in resolved]
+    taken = set(names)
+    seen: tt.Set[str] = set()
+    res = []
+    for name in names:
+        unique = name
+        num = 2
+        while unique in seen or (unique != name and unique in taken):
+            unique = f"{name} ({num})"
+            num += 1
+        seen.add(unique)
+        res.append(unique + OUTPUT_SUFFIX)
+    return res
+
+
+def process_release(job: ReleaseJob) -> ReleaseResult:
+    """
+    Render post of one release into its output file. Errors are returned, not raised,
+    so one broken release doesn't stop others.
+    """
+    start = time.perf_counter()
+    duration_cache = None
+    try:
+        if not job.root.is_dir():
+            raise NotADirectoryError(f"Release directory {job.root} doesn't exist")
+        if job.duration and job.use_cache:
+            duration_cache = DurationCache()
+        with OutputSink(job.output) as out:
+            if job.tool == TOOL_CUE:
+                index = ReleaseIndex()
+                out.lines(cue_gen.generate_output(
+                    cue_gen.GenMode(job.mode), index.cues(job.root),
+                    composers_mode=ComposersMode(job.composers),
+                    separators=list(job.separators),
+                    calculate_duration=job.duration,
+                    duration_cache=duration_cache,
+                    index=index,
+                ))
+            else:
+                trk_gen.generate_dirs(
+                    [job.root], out, calc_duration=job.duration,
+                    separators=list(job.separators) or trk_gen.DEFAULT_SEPARATORS,
+                    performers=job.performers, duration_cache=duration_cache,
+                )
+    except Exception:
+        return ReleaseResult(job.root, job.output, time.perf_counter() - start, traceback.format_exc())
+    finally:
+        if duration_cache is not None:
+            duration_cache.close()
+    return ReleaseResult(job.root, job.output, time.perf_counter() - start)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-t", "--tool", choices=(TOOL_CUE, TOOL_TRK), default=TOOL_CUE,
+                        help="Generator to run: cue for image+.cue rips, trk for track rips, default=" + TOOL_CUE)
+    parser.add_argument("-o", "--output", required=True, help="Directory to write posts of releases into")
+    parser.add_argument("-w", "--workers", type=int, default=os.cpu_count(),
+                        help="Amount of releases processed concurrently, default=cpu count")
+    parser.add_argument("--many", action='store_true', default=False,
+                        help="Every input is a directory with many releases inside")
+    parser.add_argument("-m", "--mode", choices=cue_gen.GenMode.values(), default=cue_gen.GenMode.Titles.value,
+                        help="Mode of cue generation, default=" + cue_gen.GenMode.Titles.value)
+    parser.add_argument("-c", "--composers", choices=ComposersMode.values(),
+                        default=ComposersMode.Prepend.value,
+                        help="Mode of composers generation, default=" + ComposersMode.Prepend.value)
+    parser.add_argument("--sep", action='append', default=[],
+                        help="Optional separator of title parts, default=detect")
+    parser.add_argument("--duration", action='store_true', default=False,
+                        help="Calculate duration of flac files")
+    parser.add_argument("--no-cache", action='store_true', default=False,
+                        help="Don't use duration cache")
+    parser.add_argument("--no-performers", action='store_true', default=False,
+                        help="Disable performers section of trk posts")
+    parser.add_argument("input", nargs="+", help="Release directories to process")
+    args = parser.parse_args()
+
+    roots = []
+    seen = set()
+    for in_name in args.input:
+        in_path = pathlib.Path(in_name)
+        for root in find_releases(in_path) if args.many else [in_path]:
+            # the same release given twice would be written into two files concurrently
+            if root.resolve() not in seen:
+                seen.add(root.resolve())
+                roots.append(root)
+
+    out_dir = pathlib.Path(args.output)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    jobs = [
+        ReleaseJob(tool=args.tool, root=root, output=out_dir / name,
+                   mode=args.mode, composers=args.composers, separators=tuple(args.sep),
+                   duration=args.duration, use_cache=not args.no_cache, performers=not args.no_performers)
+        for root, name in zip(roots, output_names(roots))
+    ]
+
+    failed = []
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=max(1, min(args.workers, len(jobs) or 1))) as pool:
+        futures = [pool.submit(process_release, job) for job in jobs]
+        for done, fut in enumerate(as_completed(futures), start=1):
+            res = fut.result()
+            status = "ok" if res.error is None else "FAILED"
+            print(f"[{done}/{len(jobs)}] {res.root}: {status} ({res.seconds:.1f}s)", file=sys.stderr)
+            if res.error is not None:
+                failed.append(res)
+
+    print(f"Processed {len(jobs)} releases in {time.perf_counter() - start:.1f}s, "
+          f"{len(failed)} failed", file=sys.stderr)
+    for res in failed:
+        print(f"\n{res.root}:\n{res.error}", file=sys.stderr)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
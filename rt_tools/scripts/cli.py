@@ -0,0 +1,33 @@
+"""
+Single entry point of all the tools: rt_tools <command> [args].
+Commands are sent to the daemon when it is running (rt_tools daemon), otherwise run in this process.
+"""
+import sys
+import argparse
+import pathlib
+
+from rt_tools import daemon
+
+DAEMON_COMMAND = "daemon"
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(prog="rt_tools")
+    parser.add_argument("--socket", help="Path of daemon socket, default=$" + daemon.SOCKET_ENV +
+                                         " or user runtime dir")
+    parser.add_argument("--no-daemon", action='store_true', default=False,
+                        help="Run command in this process even if daemon is running")
+    parser.add_argument("command", choices=sorted(daemon.COMMANDS) + [DAEMON_COMMAND],
+                        help="Tool to run, 'daemon' starts the daemon")
+    parser.add_argument("args", nargs=argparse.REMAINDER, help="Arguments of the tool")
+    args = parser.parse_args()
+
+    socket_path = pathlib.Path(args.socket) if args.socket else None
+    if args.command == DAEMON_COMMAND:
+        daemon.serve(socket_path)
+        return 0
+    return daemon.run(args.command, args.args, socket_path, use_daemon=not args.no_daemon)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,59 @@
+"""
+Utility checks cues against their audio files: missing files, offsets past the end of audio,
+lengths off CD frames and too short last tracks. Only headers of FLAC files are read.
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import pathlib
+import typing as tt
+from concurrent.futures import ThreadPoolExecutor
+
+from rt_tools import cuecheck
+from rt_tools.scripts.cue_gen import load_cue, iter_cue_paths
+
+DEFAULT_JOBS = min(32, (os.cpu_count() or 1) * 4)
+
+
+def check_disc(cue_path: pathlib.Path) -> tt.List[str]:
+    try:
+        _, cue = load_cue(cue_path)
+    except (OSError, ValueError) as e:
+        return [f"cue is not readable: {e}"]
+    return cuecheck.check_cue(cue_path, cue)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-j", "--jobs", type=int, default=DEFAULT_JOBS,
+                        help=f"Amount of discs checked concurrently, default={DEFAULT_JOBS}")
+    parser.add_argument("--json", help="Write problems of all cues into JSON file")
+    parser.add_argument("input", nargs="+", help="Directory or CUE file to check")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    cue_paths = list(iter_cue_paths(args.input))
+    if args.jobs <= 1 or len(cue_paths) < 2:
+        results = list(map(check_disc, cue_paths))
+    else:
+        with ThreadPoolExecutor(max_workers=args.jobs) as pool:
+            results = list(pool.map(check_disc, cue_paths))
+
+    bad = 0
+    for path, problems in zip(cue_paths, results):
+        if problems:
+            bad += 1
+            print(f"{path}: " + "; ".join(problems))
+    print(f"Checked {len(cue_paths)} cues in {time.perf_counter() - start:.2f}s, {bad} with problems",
+          file=sys.stderr)
+
+    if args.json is not None:
+        pathlib.Path(args.json).write_text(json.dumps(
+            {str(path): problems for path, problems in zip(cue_paths, results)}, indent=2, ensure_ascii=False))
+    return 1 if bad else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
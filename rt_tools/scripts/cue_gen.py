@@ -1,14 +1,25 @@
 """
 Utility to generate rutracker classical music release from CUE files
 """
+import sys
 import datetime
 import enum
 import argparse
 import pathlib
 import typing as tt
+import collections
+from concurrent.futures import ThreadPoolExecutor
 from rt_tools.cueparser import CueSheet
-from rt_tools.titles import ComposersMode, TitlesGenerator, group_performers
-from rt_tools.durations import get_flac_duration, duration_to_min_sec
+from rt_tools.titles import ComposersMode, TitlesGenerator, TrackRecord
+from rt_tools.durations import iter_flac_durations, duration_to_min_sec
+from rt_tools.cache import DurationCache, SectionCache, fingerprint
+from rt_tools.release_index import ReleaseIndex
+from rt_tools.textfiles import TextCache, read_text
+from rt_tools.output import OutputSink, EmbeddedFile, Line
+from rt_tools.watch import watch
+from rt_tools import riplog, warm
+from rt_tools import stats
+from rt_tools.stats import timed
 
 HEADER_OUTPUT = "%performer% - %title%\n%file%\n%tracks%"
 TRACK_OUTPUT = "%performer% - %title%"
@@ -26,18 +37,63 @@ class GenMode(enum.Enum):
         return tuple(v.value for v in cls)
 
 
-def load_cue(cue_path: pathlib.Path) -> PathCue:
-    #print(cue_path)
+@timed(stats.PARSE)
+def parse_cue(cue_path: pathlib.Path, texts: tt.Optional[TextCache] = None) -> CueSheet:
     cue = CueSheet()
     cue.setOutputFormat(HEADER_OUTPUT, TRACK_OUTPUT)
-    cue.setData(cue_path.read_text('utf-8'))
+    cue.setData(texts.read(cue_path) if texts is not None else read_text(cue_path))
     cue.parse()
-    return cue_path, cue
+    return cue
 
 
-def generate_titles(cue: CueSheet, composers_mode: ComposersMode, separators: tt.List[str]) -> tt.Generator[str, None, None]:
-    perfs = []
-    titles_gen = TitlesGenerator(composers_mode, separators=separators)
+def load_cue(cue_path: pathlib.Path, texts: tt.Optional[TextCache] = None) -> PathCue:
+    if warm.ENABLED:
+        return cue_path, warm.CUES.get(cue_path, lambda p: parse_cue(p, texts))
+    return cue_path, parse_cue(cue_path, texts)
+
+
+def iter_cue_paths(inputs: tt.Iterable[str],
+                   index: tt.Optional[ReleaseIndex] = None) -> tt.Generator[pathlib.Path, None, None]:
+    """
+    Expand command line inputs into cue paths: files are taken as is, dirs are scanned
+    """
+    if index is None:
+        index = ReleaseIndex()
+    for in_name in inputs:
+        in_path = pathlib.Path(in_name)
+        if in_path.is_file():
+            yield in_path
+        elif in_path.is_dir():
+            yield from index.cues(in_path)
+
+
+def iter_cues(cue_paths: tt.Iterable[pathlib.Path], read_ahead: int = 0,
+              texts: tt.Optional[TextCache] = None) -> tt.Generator[PathCue, None, None]:
+    """
+    Parse cues lazily, one by one
+    :param cue_paths: paths of cues
+    :param read_ahead: amount of cues to parse in background ahead of consumer
+    :param texts: cache of file texts
+    :return: generator of parsed cues
+    """
+    if read_ahead <= 0:
+        for cue_path in cue_paths:
+            yield load_cue(cue_path, texts)
+        return
+    with ThreadPoolExecutor(max_workers=1) as pool:
+        pending = collections.deque()
+        for cue_path in cue_paths:
+            pending.append(pool.submit(load_cue, cue_path, texts))
+            if len(pending) > read_ahead:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+def track_records(cue: CueSheet) -> tt.Generator[TrackRecord, None, None]:
+    """
+    Tracks of the cue with composer taken from "composer; performer" when songwriter is not set
+    """
     global_performer = cue.performer
     for track in cue.tracks:
         performer = track.performer
@@ -45,32 +101,42 @@ def generate_titles(cue: CueSheet, composers_mode: ComposersMode, separators: tt
             performer = global_performer
         composer = track.songwriter
         if performer is not None and ';' in performer:
-            comp, performer = performer.split(';', maxsplit=1)
+            comp, _, performer = performer.partition(';')
             performer = performer.strip()
             if composer is None:
                 composer = comp
-        perfs.append(performer)
-        yield from titles_gen.add_track(track.number, composer, track.title)
+        yield TrackRecord(track.number, composer, track.title, performer)
 
-    if perfs:
+
+def generate_titles(cue: CueSheet, composers_mode: ComposersMode, separators: tt.List[str]) -> tt.Generator[str, None, None]:
+    res = TitlesGenerator(composers_mode, separators=separators).add_tracks(track_records(cue))
+    yield from res.lines
+
+    if res.performers:
         yield ""
         yield "[b]Исполнители[/b]:"
-        yield from group_performers(perfs)
+        yield from res.performers
 
 
-def generate_logs(cue_path: pathlib.Path, cue: CueSheet) -> tt.Generator[str, None, None]:
+@timed(stats.LOGS)
+def generate_logs(cue_path: pathlib.Path, cue: CueSheet,
+                  texts: tt.Optional[TextCache] = None,
+                  log_summary: bool = False) -> tt.Generator[Line, None, None]:
+    """
+    :param log_summary: put summary table of the rip log before the log itself
+    """
+    if texts is None:
+        texts = TextCache()
+    if log_summary:
+        yield from riplog.summary_spoiler(cue_path.with_suffix(".log"))
+        yield ''
     yield '[spoiler="Лог создания рипа"][pre]'
-    log_path = cue_path.with_suffix(".log")
-    try:
-        text = log_path.read_text()
-    except UnicodeDecodeError:
-        text = log_path.read_text(encoding='utf-16')
-    yield text
+    yield EmbeddedFile(cue_path.with_suffix(".log"))
     yield '[/pre][/spoiler]'
     yield ''
 
     yield '[spoiler="Содержание индексной карты (.CUE)"][pre]'
-    yield cue_path.read_text()
+    yield texts.read(cue_path)
     yield '[/pre][/spoiler]'
 
 
@@ -81,53 +147,134 @@ def get_section_name(idx: int, path: pathlib.Path) -> str:
     return f"CD{idx}"
 
 
+def generate_section(
+        mode: GenMode, idx: int, path: pathlib.Path, cue: CueSheet,
+        composers_mode: ComposersMode, separators: tt.List[str],
+        duration: tt.Optional[datetime.timedelta],
+        front_url: tt.Optional[str],
+        index: ReleaseIndex, texts: TextCache,
+        log_summary: bool = False,
+) -> tt.Generator[Line, None, None]:
+    """
+    Generate spoiler of one disc
+    """
+    section_name = get_section_name(idx, path)
+    length_part = ""
+    if mode != GenMode.Logs:
+        if duration is None:
+            length_part = " - [:]"
+        else:
+            min, sec = duration_to_min_sec(duration)
+            length_part = f" - [{min}:{sec:02}]"
+    yield f'[spoiler="{section_name}{length_part}"]'
+
+    if front_url is not None:
+        yield f"[img=right]{front_url}[/img]"
+
+    if mode == GenMode.Titles:
+        yield from generate_titles(cue, composers_mode=composers_mode, separators=separators)
+    elif mode == GenMode.Full:
+        yield from generate_titles(cue, composers_mode=composers_mode, separators=separators)
+        yield ''
+        yield from generate_logs(path, cue, texts, log_summary=log_summary)
+    elif mode == GenMode.Logs:
+        yield from generate_logs(path, cue, texts, log_summary=log_summary)
+
+    dr_reports = index.dir(path.parent).dr_reports
+    if dr_reports:
+        yield '[spoiler="Динамический отчет (DR)"][pre]'
+        yield EmbeddedFile(dr_reports[0], skip_head=1, skip_tail=1)
+        yield '[/pre][/spoiler]'
+        yield ""
+
+    yield '[/spoiler]'
+    yield ""
+
+
+def section_key(
+        mode: GenMode, idx: int, path: pathlib.Path,
+        composers_mode: ComposersMode, separators: tt.List[str],
+        calculate_duration: bool, front_url: tt.Optional[str], index: ReleaseIndex,
+        log_summary: bool = False,
+) -> str:
+    """
+    Fingerprint of everything spoiler of the disc depends on
+    """
+    dr_reports = index.dir(path.parent).dr_reports
+    files = [path, path.with_suffix(".log"), dr_reports[0] if dr_reports else None]
+    if calculate_duration:
+        files.append(path.with_suffix(".flac"))
+    options = ("cue_gen", mode.value, get_section_name(idx, path), composers_mode.value,
+               tuple(separators), calculate_duration, front_url)
+    if log_summary:
+        # appended only when set, so keys of sections without summary stay the same
+        options += ("log_summary",)
+    return fingerprint(files, options)
+
+
 def generate_output(
-        mode: GenMode, paths_cues: tt.List[PathCue],
+        mode: GenMode, cue_paths: tt.Iterable[pathlib.Path],
         composers_mode: ComposersMode, separators: tt.List[str],
         calculate_duration: bool = False,
         front_urls: tt.Optional[tt.List[str]] = None,
-) -> tt.Generator[str, None, None]:
+        jobs: int = 1,
+        duration_cache: tt.Optional[DurationCache] = None,
+        read_ahead: int = 0,
+        index: tt.Optional[ReleaseIndex] = None,
+        texts: tt.Optional[TextCache] = None,
+        section_cache: tt.Optional[SectionCache] = None,
+        log_summary: bool = False,
+) -> tt.Generator[Line, None, None]:
+    """
+    Generate spoilers of discs. Every cue is parsed right before its spoiler
+    and dropped after it, so output starts immediately and memory stays flat.
+    :param cue_paths: paths of cues, could be lazy
+    :param read_ahead: amount of cues to parse ahead in background
+    :param index: index of release tree, directories of cues are listed on demand if not given
+    :param texts: cache of file texts shared by parser and spoiler sections
+    :param section_cache: cache of rendered spoilers, cue is parsed only when its spoiler is missing
+    :param log_summary: put summary tables of rip logs before logs in full and logs modes
+    """
+    if index is None:
+        index = ReleaseIndex()
+    if texts is None:
+        texts = TextCache()
+    durations = None
     total_duration = datetime.timedelta()
-    for idx, (path, cue) in enumerate(paths_cues, start=1):
-        section_name = get_section_name(idx, path)
-        length_part = ""
+    if calculate_duration:
+        # probing needs all the paths up front to run concurrently
+        cue_paths = list(cue_paths)
+        durations = iter_flac_durations((path.with_suffix(".flac") for path in cue_paths),
+                                        jobs=jobs, cache=duration_cache)
+    if section_cache is None:
+        discs = iter_cues(cue_paths, read_ahead=read_ahead, texts=texts)
+    else:
+        discs = ((path, None) for path in cue_paths)
+
+    for idx, (path, cue) in enumerate(discs, start=1):
         duration = None
-        if calculate_duration:
-            flac_path = path.with_suffix(".flac")
-            duration = get_flac_duration(flac_path)
+        if durations is not None:
+            duration = next(durations)
             total_duration += duration
-        if mode != GenMode.Logs:
-            if duration is None:
-                length_part = " - [:]"
-            else:
-                min, sec = duration_to_min_sec(duration)
-                length_part = f" - [{min}:{sec:02}]"
-        yield f'[spoiler="{section_name}{length_part}"]'
-
-        if front_urls is not None:
-            url = front_urls[idx-1]
-            yield f"[img=right]{url}[/img]"
-
-        if mode == GenMode.Titles:
-            yield from generate_titles(cue, composers_mode=composers_mode, separators=separators)
-        elif mode == GenMode.Full:
-            yield from generate_titles(cue, composers_mode=composers_mode, separators=separators)
-            yield ''
-            yield from generate_logs(path, cue)
-        elif mode == GenMode.Logs:
-            yield from generate_logs(path, cue)
-
-        for dr14_path in path.parent.glob("dr14*.txt"):
-            yield '[spoiler="Динамический отчет (DR)"][pre]'
-            yield dr14_path.read_text()[1:-1]
-            yield '[/pre][/spoiler]'
-            yield ""
-            break
-
-        yield '[/spoiler]'
-        yield ""
+        front_url = front_urls[idx-1] if front_urls is not None else None
 
-    if calculate_duration:
+        if section_cache is None:
+            yield from generate_section(mode, idx, path, cue, composers_mode, separators,
+                                        duration, front_url, index, texts, log_summary)
+        else:
+            key = section_key(mode, idx, path, composers_mode, separators,
+                              calculate_duration, front_url, index, log_summary)
+            text = section_cache.get(key)
+            if text is None:
+                _, cue = load_cue(path, texts)
+                text = "\n".join(map(str, generate_section(mode, idx, path, cue, composers_mode, separators,
+                                                           duration, front_url, index, texts,
+                                                           log_summary)))
+                section_cache.put(key, text)
+            yield text
+        del cue
+
+    if durations is not None:
         min, sec = duration_to_min_sec(total_duration)
         hour = 0
         if min > 60:
@@ -146,31 +293,84 @@ def main() -> int:
     parser.add_argument("--sep", action='append', default=[],
                         help="Optional separator of title parts, default=detect")
     parser.add_argument("--duration", action='store_true', default=False,
-                        help="Use ffprobe to get duration of flac file")
+                        help="Calculate duration of flac file")
+    parser.add_argument("-j", "--jobs", type=int, default=1,
+                        help="Amount of concurrent duration lookups, default=1")
+    parser.add_argument("--cache", help="Path of duration cache file, default=user cache dir")
+    parser.add_argument("--no-cache", action='store_true', default=False,
+                        help="Don't use duration cache")
+    parser.add_argument("--prune-cache", action='store_true', default=False,
+                        help="Remove stale entries from duration cache")
+    parser.add_argument("--read-ahead", type=int, default=0,
+                        help="Amount of cues to parse in background ahead of output, default=0")
+    parser.add_argument("-o", "--output", help="Write output to file instead of stdout")
+    parser.add_argument("--incremental", action='store_true', default=False,
+                        help="Reuse spoilers of discs which inputs haven't changed since previous run")
+    parser.add_argument("--sections-cache", help="Path of spoilers cache file, default=user cache dir")
+    parser.add_argument("--watch", action='store_true', default=False,
+                        help="Watch inputs and render output again on every change, implies --incremental")
+    parser.add_argument("--stats", action='store_true', default=False,
+                        help="Print time spent in processing phases to stderr")
+    parser.add_argument("--stats-json", help="Write time spent in processing phases into JSON file")
+    parser.add_argument("--profile", help="Run under cProfile and dump its results into this file")
+    parser.add_argument("--log-summary", action='store_true', default=False,
+                        help="Put summary table before every rip log and report discs with problems to stderr")
     parser.add_argument("--fronts", help="Optional filename with url of front images to be inserted")
     parser.add_argument("input", nargs="+", help="Directory or CUE file to process")
     args = parser.parse_args()
 
-    paths_cues = []
-    for in_name in args.input:
-        in_path = pathlib.Path(in_name)
-        if in_path.is_file():
-            paths_cues.append(load_cue(in_path))
-        elif in_path.is_dir():
-            for f in sorted(in_path.glob("**/*.cue")):
-                paths_cues.append(load_cue(f))
-
     front_urls = None
     if args.fronts is not None:
         p = pathlib.Path(args.fronts)
         front_urls = [u for u in p.read_text().splitlines() if u]
 
-    for l in generate_output(GenMode(args.mode), paths_cues,
-                             composers_mode=ComposersMode(args.composers),
-                             separators=args.sep,
-                             calculate_duration=args.duration,
-                             front_urls=front_urls):
-        print(l)
+    duration_cache = None
+    if (args.duration or args.prune_cache) and not args.no_cache:
+        duration_cache = DurationCache(pathlib.Path(args.cache) if args.cache else None)
+        if args.prune_cache:
+            print(f"Pruned {duration_cache.prune()} stale cache entries", file=sys.stderr)
+
+    section_cache = None
+    if args.incremental or args.watch:
+        section_cache = SectionCache(pathlib.Path(args.sections_cache) if args.sections_cache else None)
+        if args.prune_cache:
+            print(f"Pruned {section_cache.prune()} unused sections", file=sys.stderr)
+
+    output = pathlib.Path(args.output) if args.output else None
+
+    def render():
+        # fresh index and texts every time, as files could change between renders in watch mode
+        index = ReleaseIndex()
+        with stats.STATS.phase(stats.TOTAL), OutputSink(output) as out:
+            out.lines(generate_output(GenMode(args.mode), iter_cue_paths(args.input, index),
+                                      composers_mode=ComposersMode(args.composers),
+                                      separators=args.sep,
+                                      calculate_duration=args.duration,
+                                      front_urls=front_urls,
+                                      jobs=args.jobs,
+                                      duration_cache=duration_cache,
+                                      read_ahead=args.read_ahead,
+                                      index=index,
+                                      section_cache=section_cache,
+                                      log_summary=args.log_summary))
+        if args.log_summary:
+            riplog.report_problems(path.with_suffix(".log") for path in iter_cue_paths(args.input, index))
+
+    stats.STATS.enabled = args.stats or args.stats_json is not None
+    profile = pathlib.Path(args.profile) if args.profile else None
+    if args.watch:
+        stats.run_profiled(lambda: watch(map(pathlib.Path, args.input), render,
+                                         ignore=[output] if output is not None else []), profile)
+    else:
+        stats.run_profiled(render, profile)
+    if stats.STATS.enabled:
+        stats.report(pathlib.Path(args.stats_json) if args.stats_json else None)
+
+    for c in (duration_cache, section_cache):
+        if c is not None:
+            if args.duration or c is section_cache:
+                print(c.stats(), file=sys.stderr)
+            c.close()
     return 0
 
 
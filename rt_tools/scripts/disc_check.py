@@ -0,0 +1,111 @@
+"""
+Utility checks discs of new release against TOC fingerprints of the library to find duplicates
+"""
+import os
+import sys
+import time
+import pathlib
+import argparse
+import subprocess
+import typing as tt
+
+from rt_tools.cache import file_key
+from rt_tools.discid import DiscIdIndex, DiscMatch, Toc, cue_toc, DEFAULT_TOLERANCE
+from rt_tools.release_index import ReleaseIndex
+from rt_tools.scripts.cue_gen import parse_cue, iter_cue_paths
+
+
+def read_toc(cue_path: pathlib.Path) -> tt.Optional[Toc]:
+    try:
+        return cue_toc(parse_cue(cue_path), cue_path)
+    except (OSError, ValueError, subprocess.CalledProcessError):
+        # ffprobe fails on files which aren't audio, such cue has no TOC
+        return None
+
+
+def index_discs(ids: DiscIdIndex, root: pathlib.Path,
+                index: tt.Optional[ReleaseIndex] = None) -> tt.Tuple[int, int, int]:
+    """
+    Bring fingerprints of cues under root up to date, cues without TOC are always read again
+    :return: counts of indexed, unchanged and removed cues
+    """
+    if index is None:
+        index = ReleaseIndex()
+    known = ids.known(root)
+    items = []
+    unchanged = 0
+    for cue_path in index.cues(root):
+        key = file_key(cue_path)
+        if key is None:
+            continue
+        if known.pop(os.path.abspath(cue_path), None) == key:
+            unchanged += 1
+            continue
+        items.append((cue_path, key, read_toc(cue_path)))
+    ids.put_many(items)
+    return len(items), unchanged, ids.remove(known)
+
+
+def check_cue(ids: DiscIdIndex, cue_path: pathlib.Path,
+              tolerance: int = DEFAULT_TOLERANCE) -> tt.Tuple[tt.Optional[Toc], tt.List[DiscMatch]]:
+    """
+    Find discs of the index matching the cue, the cue itself is skipped
+    """
+    toc = read_toc(cue_path)
+    if toc is None:
+        return None, []
+    own = os.path.abspath(cue_path)
+    return toc, [m for m in ids.find(toc, tolerance) if str(m.path) != own]
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--db", help="Path of disc ID index file, default=user cache dir")
+    parser.add_argument("-l", "--library", action='append', default=[],
+                        help="Library directory to index before the check, could be given several times")
+    parser.add_argument("-t", "--tolerance", type=int, default=DEFAULT_TOLERANCE,
+                        help=f"Max difference of track lengths in CD frames for close matches, 0 disables them, "
+                             f"default={DEFAULT_TOLERANCE}")
+    parser.add_argument("--add", action='store_true', default=False,
+                        help="Add checked discs to the index")
+    parser.add_argument("input", nargs="*", help="Directory or CUE file to check")
+    args = parser.parse_args()
+
+    found = 0
+    with DiscIdIndex(pathlib.Path(args.db) if args.db else None) as ids:
+        index = ReleaseIndex()
+        for root in args.library:
+            start = time.perf_counter()
+            indexed, unchanged, removed = index_discs(ids, pathlib.Path(root), index)
+            print(f"{root}: {indexed} indexed, {unchanged} unchanged, {removed} removed "
+                  f"in {time.perf_counter() - start:.2f}s", file=sys.stderr)
+
+        start = time.perf_counter()
+        cue_paths = list(iter_cue_paths(args.input, index))
+        for cue_path in cue_paths:
+            toc, matches = check_cue(ids, cue_path, args.tolerance)
+            if toc is None:
+                print(f"{cue_path}: no TOC, cue has tracks without INDEX or audio file is missing")
+                continue
+            print(f"{cue_path}: MusicBrainz {toc.musicbrainz_id()}, AccurateRip {toc.accuraterip_id()}")
+            for m in matches:
+                if m.exact:
+                    print(f"  same TOC: {m.path}")
+                else:
+                    diff = max(abs(a - b) for a, b in zip(toc.lengths, m.toc.lengths))
+                    print(f"  close TOC (tracks differ up to {diff} frames): {m.path}")
+            if matches:
+                found += 1
+        print(f"Checked {len(cue_paths)} discs in {time.perf_counter() - start:.3f}s, "
+              f"{found} with matches", file=sys.stderr)
+
+        if args.add:
+            keys = [(p, file_key(p)) for p in cue_paths]
+            # cues removed during the check have no key
+            ids.put_many((p, key, read_toc(p)) for p, key in keys if key is not None)
+        print(ids.stats(), file=sys.stderr)
+    return 1 if found else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
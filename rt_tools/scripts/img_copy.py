@@ -1,11 +1,127 @@
 """
 Utility copies front covers into separate directory
 """
+import os
 import pathlib
 import argparse
-import shutil
+import typing as tt
+from concurrent.futures import ThreadPoolExecutor
+from rt_tools.cache import DigestCache, file_key
+from rt_tools.release_index import ReleaseIndex
+from rt_tools.filecopy import CopyMode, copy_file, file_hash, is_unchanged
+from rt_tools.imageinfo import ImageInfo, FORMAT_PNG, probe_images
 
 DEFAULT_FILE_NAME = "Front.jpeg"
+MAPPING_FILE_NAME = "covers.txt"
+DEFAULT_JOBS = min(32, (os.cpu_count() or 1) * 4)
+# words in names of files which are likely front covers, the first is the best
+COVER_HINTS = ("front", "cover", "folder")
+
+
+class CoverCopy(tt.NamedTuple):
+    src: pathlib.Path
+    dst: pathlib.Path
+
+
+class Limits(tt.NamedTuple):
+    min_side: int = 0
+    max_side: tt.Optional[int] = None
+    max_bytes: tt.Optional[int] = None
+
+    def check(self, info: ImageInfo) -> tt.Optional[str]:
+        """
+        :return: why the image is out of limits, None if it is within them
+        """
+        if min(info.width, info.height) < self.min_side:
+            return f"{info.width}x{info.height} is smaller than {self.min_side}px"
+        if self.max_side is not None and max(info.width, info.height) > self.max_side:
+            return f"{info.width}x{info.height} is larger than {self.max_side}px"
+        if self.max_bytes is not None and info.size > self.max_bytes:
+            return f"{info.size / 1024:.0f} KiB is more than {self.max_bytes / 1024:.0f} KiB"
+        return None
+
+
+def cover_rank(info: ImageInfo, name: str) -> tt.Tuple[int, int, int]:
+    """
+    Sort key of cover candidates, the largest is the best: the file with requested name,
+    then names hinting at front cover, then more pixels
+    """
+    if info.path.name == name:
+        hint = len(COVER_HINTS) + 1
+    else:
+        stem = info.path.stem.lower()
+        hint = next((len(COVER_HINTS) - i for i, h in enumerate(COVER_HINTS) if h in stem), 0)
+    return hint, info.pixels, -info.size
+
+
+def choose_cover(candidates: tt.List[tt.Optional[ImageInfo]], name: str,
+                 limits: Limits = Limits()) -> tt.Optional[ImageInfo]:
+    """
+    The best of images within limits, None if there are no such images
+    """
+    valid = [c for c in candidates if c is not None and limits.check(c) is None]
+    if not valid:
+        return None
+    return max(valid, key=lambda c: cover_rank(c, name))
+
+
+def distinct_destinations(copies: tt.List[CoverCopy]) -> tt.List[CoverCopy]:
+    """
+    Give numbered names to copies which would go into the same destination,
+    e.g. covers of "Disc 1" and "Disc 2" both named Disc.jpeg, the first one keeps its name
+    """
+    taken = {c.dst for c in copies}
+    seen: tt.Set[pathlib.Path] = set()
+    res = []
+    for c in copies:
+        dst = c.dst
+        if dst in seen:
+            num = 2
+            while dst in taken:
+                dst = c.dst.with_name(f"{c.dst.stem}-{num}{c.dst.suffix}")
+                num += 1
+            taken.add(dst)
+            print(f"Destination {c.dst} is already used, storing {c.src} as {dst.name}")
+        seen.add(dst)
+        res.append(CoverCopy(c.src, dst))
+    return res
+
+
+def copy_covers(copies: tt.List[CoverCopy], mode: CopyMode = CopyMode.Copy,
+                check_hash: bool = False, jobs: int = DEFAULT_JOBS) -> tt.List[bool]:
+    """
+    Copy covers concurrently, destinations which already match their sources are skipped
+    :return: for every copy, whether it was done
+    """
+    def _copy(c: CoverCopy) -> bool:
+        if is_unchanged(c.src, c.dst, check_hash=check_hash):
+            return False
+        copy_file(c.src, c.dst, mode)
+        return True
+
+    with ThreadPoolExecutor(max_workers=max(1, jobs)) as pool:
+        return list(pool.map(_copy, copies))
+
+
+def dedup_covers(copies: tt.List[CoverCopy], jobs: int = DEFAULT_JOBS,
+                 cache: tt.Optional[DigestCache] = None) -> tt.Tuple[tt.List[CoverCopy], tt.List[pathlib.Path]]:
+    """
+    Find covers with the same content
+    :param cache: digests of covers from previous runs, only new and changed covers are hashed
+    :return: copies of unique covers and destination of every original copy
+    """
+    keys = [file_key(c.src) for c in copies]
+    hashes = [cache.get(c.src, key) if cache is not None else None for c, key in zip(copies, keys)]
+    missing = [idx for idx, h in enumerate(hashes) if h is None]
+    with ThreadPoolExecutor(max_workers=max(1, jobs)) as pool:
+        for idx, h in zip(missing, pool.map(file_hash, (copies[idx].src for idx in missing))):
+            hashes[idx] = h
+    if cache is not None:
+        cache.put_many((copies[idx].src, keys[idx], hashes[idx]) for idx in missing if keys[idx] is not None)
+    unique: tt.Dict[str, CoverCopy] = {}
+    for c, h in zip(copies, hashes):
+        unique.setdefault(h, c)
+    return list(unique.values()), [unique[h].dst for h in hashes]
 
 
 def main() -> int:
@@ -13,31 +129,102 @@ def main() -> int:
     parser.add_argument("-o", "--output", help="Name of directory to store front covers", required=True)
     parser.add_argument("-n", "--name", help="Name of the file to copy, default=" + DEFAULT_FILE_NAME,
                         default=DEFAULT_FILE_NAME)
+    parser.add_argument("-j", "--jobs", type=int, default=DEFAULT_JOBS,
+                        help=f"Amount of concurrent copies, default={DEFAULT_JOBS}")
+    parser.add_argument("-m", "--mode", choices=CopyMode.values(), default=CopyMode.Copy.value,
+                        help="How covers are stored: copied, hardlinked or reflinked, default=" + CopyMode.Copy.value)
+    parser.add_argument("--check-hash", action='store_true', default=False,
+                        help="Compare content of files with different mtime before copying again")
+    parser.add_argument("--dedup", action='store_true', default=False,
+                        help="Store identical covers once, mapping of discs to files is written "
+                             "into " + MAPPING_FILE_NAME)
+    parser.add_argument("--cache", help="Path of digest cache file used by --dedup, default=user cache dir")
+    parser.add_argument("--no-cache", action='store_true', default=False,
+                        help="Don't use digest cache")
+    parser.add_argument("--report", action='store_true', default=False,
+                        help="Print format, dimensions and size of every cover")
+    parser.add_argument("--min-side", type=int, default=0, help="Skip covers with smaller width or height in pixels")
+    parser.add_argument("--max-side", type=int, help="Skip covers with larger width or height in pixels")
+    parser.add_argument("--max-kib", type=int, help="Skip covers with larger file in KiB")
+    parser.add_argument("--best", action='store_true', default=False,
+                        help="Choose the best of all images of disc directory, not only the named one")
     parser.add_argument("input", nargs="+", help="Directory or cue path to process")
     args = parser.parse_args()
 
+    index = ReleaseIndex()
     dirs = []
     for in_name in args.input:
         in_path = pathlib.Path(in_name)
         if in_path.is_file():
             dirs.append(in_path.parent)
         elif in_path.is_dir():
-            for f in sorted(in_path.glob("**/*.cue")):
+            for f in index.cues(in_path):
                 dirs.append(f.parent)
 
     out_path = pathlib.Path(args.output)
     if not out_path.exists():
         out_path.mkdir(parents=True)
 
+    limits = Limits(args.min_side, args.max_side, args.max_kib * 1024 if args.max_kib is not None else None)
+    candidates: tt.List[tt.List[pathlib.Path]] = []
     for dir in dirs:
-        f_path = dir / args.name
-        if not f_path.exists():
+        disc = index.dir(dir)
+        if args.best:
+            candidates.append(disc.covers)
+        else:
+            candidates.append([dir / args.name] if disc.has(args.name) else [])
+
+    # headers are read only when something depends on them
+    infos: tt.Dict[pathlib.Path, tt.Optional[ImageInfo]] = {}
+    if args.report or args.best or limits != Limits():
+        paths = [p for c in candidates for p in c]
+        infos = dict(zip(paths, probe_images(paths, jobs=args.jobs)))
+
+    copies = []
+    for dir, paths in zip(dirs, candidates):
+        suffix = ".jpeg"
+        if infos and paths:
+            for p in paths:
+                info = infos[p]
+                if info is None:
+                    print(f"Skipping {p}: not a JPEG or PNG image")
+                    continue
+                if args.report:
+                    print(f"{p}: {info}")
+                reason = limits.check(info)
+                if reason is not None:
+                    print(f"Skipping {p}: {reason}")
+            best = choose_cover([infos[p] for p in paths], args.name, limits)
+            paths = [best.path] if best is not None else []
+            if best is not None and best.format == FORMAT_PNG:
+                suffix = ".png"
+        if not paths:
             print("Skipping " + str(dir))
         else:
             d_name = dir.name.split(" ")[0]
-            d_path = out_path / (d_name + ".jpeg")
-            shutil.copy(f_path, d_path)
-            print(f"{f_path} -> {d_path}")
+            copies.append(CoverCopy(paths[0], out_path / (d_name + suffix)))
+    # copies into one file would race with each other
+    copies = distinct_destinations(copies)
+
+    if args.dedup:
+        all_copies = copies
+        digest_cache = None
+        if not args.no_cache:
+            digest_cache = DigestCache(pathlib.Path(args.cache) if args.cache else None)
+        try:
+            copies, mapping = dedup_covers(all_copies, jobs=args.jobs, cache=digest_cache)
+        finally:
+            if digest_cache is not None:
+                digest_cache.close()
+        (out_path / MAPPING_FILE_NAME).write_text(
+            "".join(f"{c.dst.name}\t{dst.name}\n" for c, dst in zip(all_copies, mapping)), encoding="utf-8")
+
+    copied = copy_covers(copies, mode=CopyMode(args.mode), check_hash=args.check_hash, jobs=args.jobs)
+    for c, done in zip(copies, copied):
+        if done:
+            print(f"{c.src} -> {c.dst}")
+        else:
+            print(f"Unchanged {c.dst}")
 
     return 0
 
@@ -0,0 +1,77 @@
+"""
+Utility finds discs and tracks in the library index built by lib_index
+"""
+import sys
+import time
+import datetime
+import pathlib
+import argparse
+import typing as tt
+
+from rt_tools.library import LibraryIndex, Match, build_query
+from rt_tools.durations import duration_to_min_sec
+
+
+def format_seconds(seconds: tt.Optional[float]) -> str:
+    if seconds is None:
+        return "[:]"
+    min, sec = duration_to_min_sec(datetime.timedelta(seconds=seconds))
+    return f"[{min}:{sec:02}]"
+
+
+def format_match(match: Match) -> tt.Generator[str, None, None]:
+    disc = match.disc
+    album = " - ".join(v for v in (disc.performer, disc.title) if v)
+    yield f"{disc.path}: {album} {format_seconds(disc.seconds)}"
+    for t in match.tracks:
+        name = " - ".join(v for v in (t.composer, t.title) if v)
+        performer = f" ({t.performer})" if t.performer else ""
+        yield f"  {t.number:02}. {name}{performer} {format_seconds(t.seconds)}"
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--db", help="Path of library index file, default=user cache dir")
+    parser.add_argument("--title", action='append', default=[], help="Words of track title")
+    parser.add_argument("--performer", action='append', default=[], help="Words of performer")
+    parser.add_argument("--composer", action='append', default=[], help="Words of composer")
+    parser.add_argument("--album", action='append', default=[], help="Words of disc performer or title")
+    parser.add_argument("-l", "--limit", type=int, help="Max amount of discs")
+    parser.add_argument("-p", "--paths", action='store_true', default=False,
+                        help="Print only paths of cues")
+    parser.add_argument("--cue-gen", nargs=argparse.REMAINDER,
+                        help="Run cue_gen with the rest of arguments on found cues, must be the last option")
+    parser.add_argument("words", nargs="*", help="Words to find in any field, word* matches prefix")
+    args = parser.parse_args()
+
+    queries = [build_query(args.words)]
+    for column in ("title", "performer", "composer", "album"):
+        for value in getattr(args, column):
+            queries.append(build_query(value.split(), column))
+    query = " AND ".join(q for q in queries if q)
+    if not query:
+        parser.error("nothing to find")
+
+    start = time.perf_counter()
+    with LibraryIndex(pathlib.Path(args.db) if args.db else None) as library:
+        matches = library.search(query, limit=args.limit)
+    print(f"Found {len(matches)} discs, {sum(len(m.tracks) for m in matches)} tracks "
+          f"in {(time.perf_counter() - start) * 1000:.1f} ms", file=sys.stderr)
+
+    if args.cue_gen is not None:
+        if not matches:
+            return 1
+        # imported here, as the daemon module is only needed to run cue_gen
+        from rt_tools import daemon
+        return daemon.run_command("cue_gen", args.cue_gen + [str(m.disc.path) for m in matches])
+    for m in matches:
+        if args.paths:
+            print(m.disc.path)
+        else:
+            for l in format_match(m):
+                print(l)
+    return 0 if matches else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
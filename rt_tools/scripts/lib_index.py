@@ -0,0 +1,144 @@
+"""
+Utility indexes cue sheets of the music library for lib_find. Only new and changed cues are parsed again.
+"""
+import os
+import sys
+import time
+import datetime
+import pathlib
+import argparse
+import subprocess
+import typing as tt
+
+from rt_tools.cache import DurationCache, file_key, FileKey
+from rt_tools.durations import iter_flac_durations, get_flac_durations
+from rt_tools.library import LibraryIndex, DiscInfo, TrackInfo
+from rt_tools.release_index import ReleaseIndex
+from rt_tools.scripts.cue_gen import parse_cue, track_records
+
+
+class IndexResult(tt.NamedTuple):
+    indexed: int
+    unchanged: int
+    removed: int
+
+
+def disc_info(cue_path: pathlib.Path, duration: tt.Optional[datetime.timedelta] = None
+              ) -> tt.Tuple[DiscInfo, tt.List[TrackInfo]]:
+    """
+    Parse the cue into rows of the index
+    :param duration: length of the image, gives duration of the last track
+    """
+    cue = parse_cue(cue_path)
+    if duration is not None:
+        cue.setLength(duration)
+    tracks = []
+    for rec, track in zip(track_records(cue), cue.tracks):
+        track_duration = track.duration
+        tracks.append(TrackInfo(rec.num, rec.title, rec.performer, rec.composer,
+                                track_duration.total_seconds() if track_duration is not None else None))
+    seconds = duration.total_seconds() if duration is not None else None
+    return DiscInfo(cue_path, cue.performer, cue.title, seconds, len(tracks)), tracks
+
+
+def probe_durations(flacs: tt.List[pathlib.Path], jobs: int = 1,
+                    duration_cache: tt.Optional[DurationCache] = None) -> tt.Dict[pathlib.Path, datetime.timedelta]:
+    """
+    Lengths of images, images which can't be probed are reported and left out
+    :return: cue path -> length of its image
+    """
+    res = {}
+    try:
+        for flac_path, d in zip(flacs, iter_flac_durations(flacs, jobs=jobs, cache=duration_cache)):
+            res[flac_path.with_suffix(".cue")] = d
+    except (OSError, ValueError, subprocess.CalledProcessError):
+        # one by one, so the broken image is found and others still get lengths
+        for flac_path in flacs:
+            if flac_path.with_suffix(".cue") in res:
+                continue
+            try:
+                res[flac_path.with_suffix(".cue")] = get_flac_durations([flac_path], cache=duration_cache)[0]
+            except (OSError, ValueError, subprocess.CalledProcessError) as e:
+                print(f"{flac_path}: duration is not readable: {e}", file=sys.stderr)
+    return res
+
+
+def index_library(library: LibraryIndex, root: pathlib.Path,
+                  calculate_duration: bool = False, jobs: int = 1,
+                  duration_cache: tt.Optional[DurationCache] = None,
+                  index: tt.Optional[ReleaseIndex] = None) -> IndexResult:
+    """
+    Bring the index of cues under root up to date: new and changed cues are indexed,
+    removed ones are dropped
+    :param calculate_duration: get lengths of images, cues indexed without them are indexed again
+    """
+    if index is None:
+        index = ReleaseIndex()
+    known = library.known(root)
+    stale: tt.List[tt.Tuple[pathlib.Path, FileKey]] = []
+    unchanged = 0
+    for cue_path in index.cues(root):
+        key = file_key(cue_path)
+        if key is None:
+            continue
+        entry = known.pop(os.path.abspath(cue_path), None)
+        if entry is not None and entry[0] == key and (
+                entry[1] or not calculate_duration or not cue_path.with_suffix(".flac").exists()):
+            unchanged += 1
+            continue
+        stale.append((cue_path, key))
+    removed = library.remove(known)
+
+    durations: tt.Dict[pathlib.Path, datetime.timedelta] = {}
+    if calculate_duration:
+        flacs = [p.with_suffix(".flac") for p, _ in stale if p.with_suffix(".flac").exists()]
+        durations = probe_durations(flacs, jobs, duration_cache)
+
+    for cue_path, key in stale:
+        duration = durations.get(cue_path)
+        try:
+            disc, tracks = disc_info(cue_path, duration)
+        except (OSError, ValueError) as e:
+            print(f"{cue_path}: cue is not readable: {e}", file=sys.stderr)
+            # stored without tracks, so it isn't parsed again until changed
+            disc = DiscInfo(cue_path, None, None, duration.total_seconds() if duration is not None else None, 0)
+            tracks = []
+        library.put(cue_path, key, disc, tracks)
+    return IndexResult(len(stale), unchanged, removed)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--db", help="Path of library index file, default=user cache dir")
+    parser.add_argument("--duration", action='store_true', default=False,
+                        help="Calculate duration of flac files, so every track has duration")
+    parser.add_argument("-j", "--jobs", type=int, default=1,
+                        help="Amount of concurrent duration lookups, default=1")
+    parser.add_argument("--cache", help="Path of duration cache file, default=user cache dir")
+    parser.add_argument("--no-cache", action='store_true', default=False,
+                        help="Don't use duration cache")
+    parser.add_argument("input", nargs="+", help="Root directory of the library")
+    args = parser.parse_args()
+
+    duration_cache = None
+    if args.duration and not args.no_cache:
+        duration_cache = DurationCache(pathlib.Path(args.cache) if args.cache else None)
+
+    with LibraryIndex(pathlib.Path(args.db) if args.db else None) as library:
+        index = ReleaseIndex()
+        for in_name in args.input:
+            start = time.perf_counter()
+            res = index_library(library, pathlib.Path(in_name), calculate_duration=args.duration,
+                                jobs=args.jobs, duration_cache=duration_cache, index=index)
+            print(f"{in_name}: {res.indexed} indexed, {res.unchanged} unchanged, {res.removed} removed "
+                  f"in {time.perf_counter() - start:.2f}s", file=sys.stderr)
+        print(library.stats(), file=sys.stderr)
+
+    if duration_cache is not None:
+        print(duration_cache.stats(), file=sys.stderr)
+        duration_cache.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
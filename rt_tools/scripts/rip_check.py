@@ -0,0 +1,81 @@
+"""
+Utility checks rip logs of releases: read mode, CRCs, AccurateRip results and errors
+"""
+import os
+import sys
+import json
+import argparse
+import pathlib
+import typing as tt
+from concurrent.futures import ProcessPoolExecutor
+
+from rt_tools import riplog
+from rt_tools.release_index import ReleaseIndex
+
+# logs are small, so they are sent to worker processes in batches
+CHUNK_SIZE = 16
+
+
+def find_logs(inputs: tt.Iterable[str], index: tt.Optional[ReleaseIndex] = None) -> tt.List[pathlib.Path]:
+    """
+    Expand command line inputs into rip logs: files are taken as is, dirs are scanned
+    """
+    if index is None:
+        index = ReleaseIndex()
+    res = []
+    for in_name in inputs:
+        in_path = pathlib.Path(in_name)
+        if in_path.is_file():
+            res.append(in_path)
+        elif in_path.is_dir():
+            for disc in index.scan(in_path):
+                res.extend(disc.rip_logs)
+    return res
+
+
+def check_log(path: pathlib.Path) -> tt.Tuple[tt.List[str], tt.List[str]]:
+    """
+    Analyze the log in worker process
+    :return: problems and lines of summary table
+    """
+    log = riplog.analyze_log(path)
+    return log.problems(), list(log.summary())
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-j", "--jobs", type=int, default=os.cpu_count(),
+                        help="Amount of worker processes, default=cpu count")
+    parser.add_argument("-s", "--summary", action='store_true', default=False,
+                        help="Print summary table of every log, not only problems")
+    parser.add_argument("--json", help="Write problems of all logs into JSON file")
+    parser.add_argument("input", nargs="+", help="Directory or log file to check")
+    args = parser.parse_args()
+
+    logs = find_logs(args.input)
+    if args.jobs <= 1 or len(logs) < 2:
+        results = list(map(check_log, logs))
+    else:
+        with ProcessPoolExecutor(max_workers=args.jobs) as pool:
+            results = list(pool.map(check_log, logs, chunksize=CHUNK_SIZE))
+
+    bad = 0
+    for path, (problems, summary) in zip(logs, results):
+        if problems:
+            bad += 1
+        if args.summary:
+            print(f"{path}:")
+            for l in summary:
+                print("  " + l)
+        elif problems:
+            print(f"{path}: " + "; ".join(problems))
+    print(f"Checked {len(logs)} logs, {bad} with problems", file=sys.stderr)
+
+    if args.json is not None:
+        pathlib.Path(args.json).write_text(json.dumps(
+            {str(path): problems for path, (problems, _) in zip(logs, results)}, indent=2, ensure_ascii=False))
+    return 1 if bad else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,72 @@
+"""
+Utility creates .torrent file of the release directory
+"""
+import os
+import sys
+import time
+import argparse
+import pathlib
+
+from rt_tools import stats, torrent
+from rt_tools.release_index import ReleaseIndex
+
+RESUME_SUFFIX = ".resume"
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-o", "--output", help="Path of .torrent file, default=<release name>.torrent")
+    parser.add_argument("-a", "--announce", action='append', default=[],
+                        help="Announce URL, could be given several times")
+    parser.add_argument("--private", action='store_true', default=False, help="Mark torrent as private")
+    parser.add_argument("-c", "--comment", help="Comment of the torrent")
+    parser.add_argument("-p", "--piece-size", type=int,
+                        help="Piece size in KiB, power of two, default=chosen by size of release")
+    parser.add_argument("-j", "--jobs", type=int, default=os.cpu_count(),
+                        help="Amount of hashing threads, default=cpu count")
+    parser.add_argument("--resume", action='store_true', default=False,
+                        help="Save hashed pieces into <output>.resume and continue from it after interruption")
+    parser.add_argument("--stats", action='store_true', default=False,
+                        help="Print time spent in processing phases to stderr")
+    parser.add_argument("input", help="Release directory")
+    args = parser.parse_args()
+
+    root = pathlib.Path(args.input)
+    if not root.is_dir():
+        parser.error(f"{root} is not a directory")
+    name = root.resolve().name
+    output = pathlib.Path(args.output) if args.output else pathlib.Path(name + ".torrent")
+    resume_path = output.with_name(output.name + RESUME_SUFFIX)
+
+    piece_length = None
+    if args.piece_size is not None:
+        piece_length = args.piece_size * 1024
+        if piece_length < 16 * 1024 or piece_length & (piece_length - 1):
+            parser.error("piece size must be a power of two, at least 16 KiB")
+
+    stats.STATS.enabled = args.stats
+    start = time.perf_counter()
+    with stats.STATS.phase(stats.TOTAL):
+        files = torrent.collect_files(root, ReleaseIndex(), exclude=[output, resume_path])
+        total_size = sum(f.size for f in files)
+        if piece_length is None:
+            piece_length = torrent.choose_piece_length(total_size)
+        hasher = torrent.PieceHasher(files, piece_length)
+        resume = torrent.ResumeFile(resume_path, hasher) if args.resume else None
+        pieces = torrent.hash_pieces(hasher, jobs=args.jobs, resume=resume)
+        metainfo = torrent.make_metainfo(name, files, piece_length, pieces, announce=args.announce,
+                                         private=args.private, comment=args.comment,
+                                         creation_date=int(time.time()))
+        output.write_bytes(torrent.bencode(metainfo))
+
+    seconds = time.perf_counter() - start
+    print(f"{output}: {len(files)} files, {total_size / 2**20:.1f} MiB, {hasher.pieces} pieces of "
+          f"{piece_length // 1024} KiB in {seconds:.2f}s ({total_size / 2**20 / max(seconds, 1e-9):.0f} MiB/s), "
+          f"info hash {torrent.info_hash(metainfo)}", file=sys.stderr)
+    if stats.STATS.enabled:
+        stats.report()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,126 +1,340 @@
 """
 Utility to generate rutracker classical music release from tracks files
 """
+import io
+import sys
 import argparse
 import pathlib
 import datetime
 import typing as tt
-from rt_tools.durations import get_flac_duration, duration_to_min_sec, duration_to_hms
-from rt_tools.titles import ComposersMode, TitlesGenerator
+from concurrent.futures import ThreadPoolExecutor
+from rt_tools.durations import get_flac_durations, duration_to_min_sec, duration_to_hms
+from rt_tools.flac import Metadata, read_metadata
+from rt_tools.titles import ComposersMode, TitlesGenerator, TrackRecord
+from rt_tools.cache import DurationCache, SectionCache, fingerprint
+from rt_tools.release_index import ReleaseIndex
+from rt_tools.output import OutputSink, EmbeddedFile
+from rt_tools.watch import watch
+from rt_tools import stats, riplog, warm
 
 
 DEFAULT_SEPARATORS = (", ", ": ", "- ")
 
 
-def iterate_dirs(path: pathlib.Path) -> tt.List[pathlib.Path]:
+def iterate_dirs(path: pathlib.Path, index: tt.Optional[ReleaseIndex] = None) -> tt.List[pathlib.Path]:
     """
     Find all paths which looks like directories with flac files
     :param path: path to process
+    :param index: index to reuse listings from
     :return: list of paths
     """
-    paths = set()
-    for f in path.glob("**/*.flac"):
-        paths.add(f.parent)
-    return list(sorted(set(paths)))
+    if index is None:
+        index = ReleaseIndex()
+    return [disc.path for disc in index.flac_dirs(path)]
 
 
-def get_rip_log(dir: pathlib.Path) -> tt.Optional[pathlib.Path]:
-    for f in dir.glob("*.log"):
-        if f.name == "audiochecker.log":
-            continue
-        return f
-    return None
+def get_rip_log(dir: pathlib.Path, index: tt.Optional[ReleaseIndex] = None) -> tt.Optional[pathlib.Path]:
+    if index is None:
+        index = ReleaseIndex()
+    rip_logs = index.dir(dir).rip_logs
+    return rip_logs[0] if rip_logs else None
 
 
-def get_log_text(path: pathlib.Path) -> str:
+@stats.timed(stats.PROBE)
+def _read_tags(flac_path: pathlib.Path) -> tt.Optional[Metadata]:
     try:
-        res = path.read_text()
-    except UnicodeDecodeError:
-        res = path.read_text("utf-16")
+        return read_metadata(flac_path)
+    except (OSError, ValueError):
+        return None
+
+
+def read_tags(flac_path: pathlib.Path) -> tt.Optional[Metadata]:
+    """
+    Read tags and stream info of the file with one read of its head
+    :return: metadata, None if the file isn't flac
+    """
+    if warm.ENABLED:
+        return warm.TAGS.get(flac_path, _read_tags)
+    return _read_tags(flac_path)
+
+
+def read_all_tags(files: tt.List[pathlib.Path], jobs: int = 1) -> tt.List[tt.Optional[Metadata]]:
+    if jobs <= 1 or len(files) < 2:
+        return list(map(read_tags, files))
+    with ThreadPoolExecutor(max_workers=jobs) as pool:
+        return list(pool.map(read_tags, files))
+
+
+def get_durations(files: tt.List[pathlib.Path], tags: tt.List[tt.Optional[Metadata]], jobs: int = 1,
+                  cache: tt.Optional[DurationCache] = None) -> tt.List[datetime.timedelta]:
+    """
+    Durations of files, taken from already read stream info. Only files without it are probed.
+    """
+    res = [m.duration if m is not None else None for m in tags]
+    missing = [f for f, d in zip(files, res) if d is None]
+    if missing:
+        probed = iter(get_flac_durations(missing, jobs=jobs, cache=cache))
+        res = [d if d is not None else next(probed) for d in res]
     return res
 
 
+def order_tracks(files: tt.List[pathlib.Path], tags: tt.List[tt.Optional[Metadata]]) -> tt.List[int]:
+    """
+    Order of files by disc and track numbers when every file has them, by names otherwise
+    :return: indexes of files
+    """
+    order = list(range(len(files)))
+    if files and all(m is not None and m.track_number is not None for m in tags):
+        order.sort(key=lambda i: (tags[i].disc_number or 0, tags[i].track_number))
+    return order
+
+
+def track_record(num: int, flac_path: pathlib.Path, tags: tt.Optional[Metadata]) -> TrackRecord:
+    """
+    Track taken from tags, title falls back to the file name without leading number
+    """
+    title = tags.title if tags is not None else None
+    if title is None:
+        title = flac_path.stem
+        v = title.split(".", maxsplit=1)
+        if len(v) > 1:
+            title = v[1].strip()
+    composer = tags.composer if tags is not None else None
+    performer = tags.performer if tags is not None else None
+    return TrackRecord(num, composer or "", title, performer)
+
+
 def generate_dir(
         dir: pathlib.Path, calc_duration: bool = False,
         separators: tt.List[str] = DEFAULT_SEPARATORS,
         performers: bool = True,
+        files: tt.Optional[tt.List[pathlib.Path]] = None,
+        durations: tt.Optional[tt.List[datetime.timedelta]] = None,
+        index: tt.Optional[ReleaseIndex] = None,
+        out: tt.Optional[OutputSink] = None,
+        log_summary: bool = False,
+        tags: tt.Optional[tt.List[tt.Optional[Metadata]]] = None,
 ) -> datetime.timedelta:
+    """
+    Write spoiler of the directory
+    :param files: flac files of the directory, listed if not given
+    :param durations: already probed durations of files, probed if not given
+    :param tags: already read metadata of files, read if not given
+    :param index: index to reuse listings from
+    :param out: sink to write into, stdout if not given
+    :param log_summary: put summary table of the rip log before the log itself
+    :return: total duration of the directory
+    """
+    if out is None:
+        with OutputSink() as out:
+            return generate_dir(dir, calc_duration=calc_duration, separators=separators,
+                                performers=performers, files=files, durations=durations,
+                                index=index, out=out, log_summary=log_summary, tags=tags)
     res = datetime.timedelta()
-    files = []
+    if index is None:
+        index = ReleaseIndex()
+    disc = index.dir(dir)
+    if files is None:
+        files = disc.flacs
+    if tags is None:
+        tags = read_all_tags(files)
 
-    for f in sorted(dir.glob("*.flac")):
-        files.append(f)
-        if calc_duration:
-            duration = get_flac_duration(f)
-            res += duration
+    if calc_duration:
+        if durations is None:
+            durations = get_durations(files, tags)
+        res = sum(durations, res)
 
     length_part = ""
     if calc_duration:
         min, sec = duration_to_min_sec(res)
         length_part = f" - [{min}:{sec:02}]"
 
-    titles_gen = TitlesGenerator(ComposersMode.Prepend, separators=separators)
-    print(f'[spoiler="{dir.name}{length_part}"]')
-    for idx, f in enumerate(files, start=1):
-        name = f.stem
-        v = name.split(".", maxsplit=1)
-        if len(v) > 1:
-            name = v[1].strip()
-        for l in titles_gen.add_track(idx, "", name):
-            print(l)
+    tracks = [track_record(num, files[i], tags[i]) for num, i in enumerate(order_tracks(files, tags), start=1)]
+    titles = TitlesGenerator(ComposersMode.Prepend, separators=separators).add_tracks(tracks)
+    out.line(f'[spoiler="{dir.name}{length_part}"]')
+    out.lines(titles.lines)
 
     if performers:
-        print("\n[b]Исполнители[/b]:\n")
+        if any(t.performer for t in tracks):
+            out.line("\n[b]Исполнители[/b]:")
+            out.lines(titles.performers)
+        else:
+            out.line("\n[b]Исполнители[/b]:\n")
 
-    ac_log = dir / "audiochecker.log"
-    if ac_log.exists():
-        print('\n[spoiler="Лог проверки качества"][pre]')
-        print(ac_log.read_text())
-        print('[/pre][/spoiler]')
+    ac_log = disc.audiochecker_log
+    if ac_log is not None:
+        out.line('\n[spoiler="Лог проверки качества"][pre]')
+        out.line(EmbeddedFile(ac_log))
+        out.line('[/pre][/spoiler]')
 
-    rip_log = get_rip_log(dir)
+    rip_log = get_rip_log(dir, index)
     if rip_log is not None:
-        print('\n[spoiler="Лог создания рипа"][pre]')
-        print(get_log_text(rip_log))
-        print('[/pre][/spoiler]')
+        if log_summary:
+            out.line()
+            out.lines(riplog.summary_spoiler(rip_log))
+        out.line('\n[spoiler="Лог создания рипа"][pre]')
+        out.line(EmbeddedFile(rip_log))
+        out.line('[/pre][/spoiler]')
 
-    dr_files = list(dir.glob("dr14*.txt"))
+    dr_files = disc.dr_reports
     if dr_files:
-        print('\n[spoiler="Динамический отчет (dr14-tmeter)"][pre]')
-        print(dr_files[0].read_text()[1:])
-        print('[/pre][/spoiler]')
-    print('[/spoiler]\n')
+        out.line('\n[spoiler="Динамический отчет (dr14-tmeter)"][pre]')
+        out.line(EmbeddedFile(dr_files[0], skip_head=1))
+        out.line('[/pre][/spoiler]')
+    out.line('[/spoiler]\n')
 
     return res
 
 
+def dir_key(dir: pathlib.Path, files: tt.List[pathlib.Path], calc_duration: bool,
+            separators: tt.List[str], performers: bool, index: ReleaseIndex,
+            log_summary: bool = False) -> str:
+    """
+    Fingerprint of everything spoiler of the directory depends on
+    """
+    disc = index.dir(dir)
+    dr_files = disc.dr_reports
+    inputs = files + [disc.audiochecker_log, get_rip_log(dir, index), dr_files[0] if dr_files else None]
+    options = ("trk_gen", calc_duration, tuple(separators), performers)
+    if log_summary:
+        # appended only when set, so keys of spoilers without summary stay the same
+        options += ("log_summary",)
+    return fingerprint(inputs, options)
+
+
+def generate_dirs(
+        inputs: tt.Iterable[pathlib.Path], out: OutputSink, calc_duration: bool = False,
+        separators: tt.List[str] = DEFAULT_SEPARATORS,
+        performers: bool = True, jobs: int = 1,
+        duration_cache: tt.Optional[DurationCache] = None,
+        section_cache: tt.Optional[SectionCache] = None,
+        log_summary: bool = False,
+) -> datetime.timedelta:
+    """
+    Write spoilers of all directories with flac files under inputs
+    :param section_cache: cache of rendered spoilers, only changed directories are rendered when given
+    :param log_summary: put summary tables of rip logs before logs and report directories with problems to stderr
+    :return: total duration
+    """
+    duration = datetime.timedelta()
+    index = ReleaseIndex()
+    dirs_list = []
+    for in_path in inputs:
+        dirs_list.extend(iterate_dirs(in_path, index))
+    dirs_list.sort()
+
+    dirs_files = [index.dir(dir).flacs for dir in dirs_list]
+    dirs_durations: tt.List[tt.Optional[tt.List[datetime.timedelta]]] = [None] * len(dirs_list)
+    dirs_tags: tt.List[tt.Optional[tt.List[tt.Optional[Metadata]]]] = [None] * len(dirs_list)
+    if calc_duration:
+        # read heads of files of all the dirs at once, they give both tags and durations,
+        # then split results back per dir
+        all_files = [f for files in dirs_files for f in files]
+        all_tags = read_all_tags(all_files, jobs=jobs)
+        all_durations = iter(get_durations(all_files, all_tags, jobs=jobs, cache=duration_cache))
+        all_tags_iter = iter(all_tags)
+        dirs_durations = [[next(all_durations) for _ in files] for files in dirs_files]
+        dirs_tags = [[next(all_tags_iter) for _ in files] for files in dirs_files]
+
+    for dir, files, durations, tags in zip(dirs_list, dirs_files, dirs_durations, dirs_tags):
+        if section_cache is None:
+            duration += generate_dir(dir, calc_duration=calc_duration,
+                                     separators=separators, performers=performers,
+                                     files=files, durations=durations, index=index, out=out,
+                                     log_summary=log_summary, tags=tags)
+            continue
+        key = dir_key(dir, files, calc_duration, separators, performers, index, log_summary)
+        text = section_cache.get(key)
+        if text is None:
+            buf = io.StringIO()
+            with OutputSink(stream=buf) as dir_out:
+                generate_dir(dir, calc_duration=calc_duration,
+                             separators=separators, performers=performers,
+                             files=files, durations=durations, index=index, out=dir_out,
+                             log_summary=log_summary, tags=tags)
+            text = buf.getvalue()
+            section_cache.put(key, text)
+        out.write(text)
+        if durations is not None:
+            duration = sum(durations, duration)
+
+    if calc_duration:
+        hour, min, sec = duration_to_hms(duration)
+        out.line(f"Total duration: {hour}:{min:02}:{sec:02}")
+    if log_summary:
+        riplog.report_problems(get_rip_log(dir, index) for dir in dirs_list)
+    return duration
+
+
 def main() -> int:
     parser = argparse.ArgumentParser()
     parser.add_argument("-d", "--duration", action='store_true', default=False,
-                        help="Use ffprobe to get duration of flac files")
+                        help="Calculate duration of flac files")
     parser.add_argument("-s", "--separator", help="Use this string as separator of songs, default=" + str(DEFAULT_SEPARATORS))
+    parser.add_argument("-j", "--jobs", type=int, default=1,
+                        help="Amount of concurrent duration lookups, default=1")
+    parser.add_argument("--cache", help="Path of duration cache file, default=user cache dir")
+    parser.add_argument("--no-cache", action='store_true', default=False,
+                        help="Don't use duration cache")
+    parser.add_argument("--prune-cache", action='store_true', default=False,
+                        help="Remove stale entries from duration cache")
+    parser.add_argument("-o", "--output", help="Write output to file instead of stdout")
+    parser.add_argument("--incremental", action='store_true', default=False,
+                        help="Reuse spoilers of directories which inputs haven't changed since previous run")
+    parser.add_argument("--sections-cache", help="Path of spoilers cache file, default=user cache dir")
+    parser.add_argument("--watch", action='store_true', default=False,
+                        help="Watch inputs and render output again on every change, implies --incremental")
+    parser.add_argument("--stats", action='store_true', default=False,
+                        help="Print time spent in processing phases to stderr")
+    parser.add_argument("--stats-json", help="Write time spent in processing phases into JSON file")
+    parser.add_argument("--profile", help="Run under cProfile and dump its results into this file")
+    parser.add_argument("--log-summary", action='store_true', default=False,
+                        help="Put summary table before every rip log and report directories with problems to stderr")
     parser.add_argument("--no-performers", action='store_true', default=False, help="Disable performers section")
     parser.add_argument("input", nargs="+", help="Directory to process")
     args = parser.parse_args()
-    duration = datetime.timedelta()
-
-    dirs_list = []
-    for in_name in args.input:
-        in_path = pathlib.Path(in_name)
-        dirs_list.extend(iterate_dirs(in_path))
-    dirs_list.sort()
 
     separators = DEFAULT_SEPARATORS
     if args.separator:
         separators = [args.separator]
+    performers = not args.no_performers
 
-    for dir in dirs_list:
-        duration += generate_dir(dir, calc_duration=args.duration,
-                                 separators=separators, performers=not args.no_performers)
+    duration_cache = None
+    if (args.duration or args.prune_cache) and not args.no_cache:
+        duration_cache = DurationCache(pathlib.Path(args.cache) if args.cache else None)
+        if args.prune_cache:
+            print(f"Pruned {duration_cache.prune()} stale cache entries", file=sys.stderr)
 
-    if args.duration:
-        hour, min, sec = duration_to_hms(duration)
-        print(f"Total duration: {hour}:{min:02}:{sec:02}")
+    section_cache = None
+    if args.incremental or args.watch:
+        section_cache = SectionCache(pathlib.Path(args.sections_cache) if args.sections_cache else None)
+        if args.prune_cache:
+            print(f"Pruned {section_cache.prune()} unused sections", file=sys.stderr)
+
+    output = pathlib.Path(args.output) if args.output else None
+
+    def render():
+        with stats.STATS.phase(stats.TOTAL), OutputSink(output) as out:
+            generate_dirs(map(pathlib.Path, args.input), out, calc_duration=args.duration,
+                          separators=separators, performers=performers, jobs=args.jobs,
+                          duration_cache=duration_cache, section_cache=section_cache,
+                          log_summary=args.log_summary)
+
+    stats.STATS.enabled = args.stats or args.stats_json is not None
+    profile = pathlib.Path(args.profile) if args.profile else None
+    if args.watch:
+        stats.run_profiled(lambda: watch(map(pathlib.Path, args.input), render,
+                                         ignore=[output] if output is not None else []), profile)
+    else:
+        stats.run_profiled(render, profile)
+    if stats.STATS.enabled:
+        stats.report(pathlib.Path(args.stats_json) if args.stats_json else None)
+
+    for c in (duration_cache, section_cache):
+        if c is not None:
+            if args.duration or c is section_cache:
+                print(c.stats(), file=sys.stderr)
+            c.close()
 
 
 if __name__ == "__main__":
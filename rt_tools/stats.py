@@ -0,0 +1,190 @@
+"""
+Instrumentation of processing phases: wall time, calls, bytes and subprocess counters.
+Recording is a single flag check while disabled.
+"""
+import sys
+import json
+import time
+import cProfile
+import inspect
+import pathlib
+import functools
+import threading
+import typing as tt
+
+# names of phases
+SCAN = "scan"
+PARSE = "parse"
+READ = "read"
+PROBE = "probe"
+TITLES = "titles"
+LOGS = "logs"
+RIPLOG = "riplog"
+HASH = "hash"
+OUTPUT = "output"
+# whole run of the script
+TOTAL = "total"
+# names of counters
+SUBPROCESSES = "subprocesses"
+FFPROBE = "ffprobe"
+
+
+class PhaseStats:
+    __slots__ = ("calls", "seconds", "bytes")
+
+    def __init__(self):
+        self.calls = 0
+        self.seconds = 0.0
+        self.bytes = 0
+
+
+class _NullPhase:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        pass
+
+
+_NULL_PHASE = _NullPhase()
+
+
+class _Phase:
+    __slots__ = ("_stats", "_name", "_start")
+
+    def __init__(self, stats: "Stats", name: str):
+        self._stats = stats
+        self._name = name
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self._stats.add(self._name, seconds=time.perf_counter() - self._start)
+
+
+class Stats:
+    """
+    Registry of phases and counters. Phases are measured inclusively,
+    so time of nested phases is counted in outer ones too.
+    """
+    def __init__(self):
+        self.enabled = False
+        self.phases: tt.Dict[str, PhaseStats] = {}
+        self.counters: tt.Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def reset(self):
+        with self._lock:
+            self.phases.clear()
+            self.counters.clear()
+
+    def phase(self, name: str) -> tt.ContextManager:
+        """
+        Context manager measuring one call of the phase
+        """
+        if not self.enabled:
+            return _NULL_PHASE
+        return _Phase(self, name)
+
+    def add(self, name: str, seconds: float = 0.0, calls: int = 1, bytes: int = 0):
+        if not self.enabled:
+            return
+        with self._lock:
+            p = self.phases.get(name)
+            if p is None:
+                p = self.phases[name] = PhaseStats()
+            p.calls += calls
+            p.seconds += seconds
+            p.bytes += bytes
+
+    def add_bytes(self, name: str, bytes: int):
+        self.add(name, calls=0, bytes=bytes)
+
+    def count(self, name: str, n: int = 1):
+        if not self.enabled:
+            return
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + n
+
+    def as_dict(self) -> tt.Dict[str, tt.Any]:
+        with self._lock:
+            return {
+                "phases": {name: {"calls": p.calls, "seconds": p.seconds, "bytes": p.bytes}
+                           for name, p in self.phases.items()},
+                "counters": dict(self.counters),
+            }
+
+    def format_table(self) -> tt.Generator[str, None, None]:
+        data = self.as_dict()
+        yield f"{'phase':<10} {'calls':>8} {'seconds':>10} {'KiB':>10}"
+        for name, p in sorted(data["phases"].items(), key=lambda kv: -kv[1]["seconds"]):
+            yield f"{name:<10} {p['calls']:>8} {p['seconds']:>10.4f} {p['bytes'] / 1024:>10.0f}"
+        for name, value in sorted(data["counters"].items()):
+            yield f"{name:<10} {value:>8}"
+
+
+STATS = Stats()
+
+
+def timed(name: str) -> tt.Callable:
+    """
+    Decorator measuring every call of the function as the phase.
+    For generator functions only time spent inside the generator is counted.
+    """
+    def decorator(func):
+        if inspect.isgeneratorfunction(func):
+            @functools.wraps(func)
+            def gen_wrapper(*args, **kwargs):
+                if not STATS.enabled:
+                    return (yield from func(*args, **kwargs))
+                gen = func(*args, **kwargs)
+                seconds = 0.0
+                try:
+                    while True:
+                        start = time.perf_counter()
+                        try:
+                            item = next(gen)
+                        except StopIteration as e:
+                            seconds += time.perf_counter() - start
+                            return e.value
+                        seconds += time.perf_counter() - start
+                        yield item
+                finally:
+                    gen.close()
+                    STATS.add(name, seconds=seconds)
+            return gen_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not STATS.enabled:
+                return func(*args, **kwargs)
+            with _Phase(STATS, name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def report(json_path: tt.Optional[pathlib.Path] = None):
+    """
+    Print summary table to stderr, or write it as JSON when path is given
+    """
+    if json_path is not None:
+        json_path.write_text(json.dumps(STATS.as_dict(), indent=2))
+    else:
+        for l in STATS.format_table():
+            print(l, file=sys.stderr)
+
+
+def run_profiled(func: tt.Callable[[], tt.Any], path: tt.Optional[pathlib.Path]) -> tt.Any:
+    """
+    Call func under cProfile and dump results into path, func is just called when path is None
+    """
+    if path is None:
+        return func()
+    profile = cProfile.Profile()
+    try:
+        return profile.runcall(func)
+    finally:
+        profile.dump_stats(str(path))
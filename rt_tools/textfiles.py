@@ -0,0 +1,154 @@
+"""
+Reading of cues, rip logs and reports with detection of their encoding
+"""
+import io
+import os
+import mmap
+import codecs
+import pathlib
+import threading
+import collections
+import typing as tt
+
+from rt_tools import warm
+from rt_tools.stats import STATS, timed, READ
+
+# utf-16 codec removes BOM and picks byte order from it
+BOMS = (
+    (b"\xef\xbb\xbf", "utf-8-sig"),
+    (b"\xff\xfe", "utf-16"),
+    (b"\xfe\xff", "utf-16"),
+)
+# old russian rips are often in windows codepage
+FALLBACK_ENCODING = "cp1251"
+SNIFF_SIZE = 1024
+DEFAULT_CACHE_BYTES = 64 * 1024 * 1024
+# files bigger than this are decoded chunk by chunk from memory map
+MMAP_MIN_SIZE = 1024 * 1024
+CHUNK_SIZE = 256 * 1024
+
+
+def is_utf8(data: tt.Union[bytes, mmap.mmap]) -> bool:
+    """
+    Check data is valid UTF-8 without decoding it as a whole
+    """
+    decoder = codecs.getincrementaldecoder("utf-8")()
+    try:
+        for pos in range(0, len(data), CHUNK_SIZE):
+            chunk = data[pos:pos + CHUNK_SIZE]
+            # pure ASCII chunk is valid unless previous chunk ended inside of a char
+            if chunk.isascii() and not decoder.getstate()[0]:
+                continue
+            decoder.decode(chunk)
+        decoder.decode(b"", final=True)
+    except UnicodeDecodeError:
+        return False
+    return True
+
+
+def detect_encoding(data: tt.Union[bytes, mmap.mmap]) -> str:
+    """
+    Detect encoding by BOM, by zero bytes pattern of UTF-16 without BOM,
+    then by validity of UTF-8
+    :param data: content of the file
+    :return: name of encoding
+    """
+    head = data[:SNIFF_SIZE]
+    for bom, encoding in BOMS:
+        if head.startswith(bom):
+            return encoding
+    if len(head) >= 2:
+        even_zeros = head[0::2].count(0)
+        odd_zeros = head[1::2].count(0)
+        half = len(head) // 2
+        # ASCII text in UTF-16 has zero in every other byte
+        if odd_zeros > half * 3 // 4 and even_zeros < half // 4:
+            return "utf-16-le"
+        if even_zeros > half * 3 // 4 and odd_zeros < half // 4:
+            return "utf-16-be"
+    if not is_utf8(data):
+        return FALLBACK_ENCODING
+    return "utf-8"
+
+
+def decode(data: bytes) -> str:
+    """
+    Decode content of text file, newlines are translated the same way as text mode does
+    """
+    # bytes undefined in cp1251 like 0x98 or odd tail of UTF-16 shouldn't make whole file unreadable
+    text = data.decode(detect_encoding(data), errors="replace")
+    if "\r" in text:
+        text = text.replace("\r\n", "\n").replace("\r", "\n")
+    return text
+
+
+def read_text(path: pathlib.Path) -> str:
+    if warm.ENABLED:
+        return warm.TEXTS.get(path, _read_text)
+    return _read_text(path)
+
+
+@timed(READ)
+def _read_text(path: pathlib.Path) -> str:
+    with open(path, "rb") as f:
+        data = f.read()
+    STATS.add_bytes(READ, len(data))
+    return decode(data)
+
+
+@timed(READ)
+def iter_text_chunks(path: pathlib.Path) -> tt.Generator[str, None, None]:
+    """
+    Decode text file by chunks, so big logs are never held in memory as a whole.
+    Produces the same text as read_text.
+    """
+    with open(path, "rb") as f:
+        size = os.fstat(f.fileno()).st_size
+        STATS.add_bytes(READ, size)
+        if size < MMAP_MIN_SIZE:
+            yield decode(f.read())
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            decoder = io.IncrementalNewlineDecoder(
+                codecs.getincrementaldecoder(detect_encoding(mm))(errors="replace"), translate=True)
+            for pos in range(0, size, CHUNK_SIZE):
+                text = decoder.decode(mm[pos:pos + CHUNK_SIZE])
+                if text:
+                    yield text
+            text = decoder.decode(b"", final=True)
+            if text:
+                yield text
+
+
+class TextCache:
+    """
+    Decoded texts of files kept for the run, so every file is read once.
+    Least recently used texts are dropped when total size exceeds the limit.
+    """
+    def __init__(self, max_bytes: int = DEFAULT_CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self._size = 0
+        self._texts: tt.OrderedDict[pathlib.Path, str] = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def read(self, path: pathlib.Path) -> str:
+        with self._lock:
+            text = self._texts.get(path)
+            if text is not None:
+                self._texts.move_to_end(path)
+                return text
+        text = read_text(path)
+        with self._lock:
+            if path not in self._texts:
+                self._texts[path] = text
+                self._size += len(text)
+            while self._size > self.max_bytes and len(self._texts) > 1:
+                _, old = self._texts.popitem(last=False)
+                self._size -= len(old)
+        return text
+
+    def discard(self, path: pathlib.Path):
+        with self._lock:
+            text = self._texts.pop(path, None)
+            if text is not None:
+                self._size -= len(text)
@@ -1,6 +1,13 @@
+import re
 import enum
+import functools
 import typing as tt
 
+from rt_tools.stats import timed, TITLES
+
+# memoized splits kept per matcher, dropped as a whole when there are too many
+SPLIT_CACHE_SIZE = 65536
+
 
 class ComposersMode(enum.Enum):
     Prepend = "prepend"
@@ -20,15 +27,63 @@ def split_piece_part(title: str, separators: tt.List[str]) -> tt.Tuple[tt.Option
     return None, title
 
 
+class SeparatorMatcher:
+    """
+    Precompiled split_piece_part: titles without any separator are rejected by one regex search,
+    results are memoized, so repeated titles and pieces are split once and share strings
+    """
+    def __init__(self, separators: tt.Iterable[str]):
+        self.separators = tuple(separators)
+        self._any = re.compile("|".join(map(re.escape, self.separators)))
+        self._cache: tt.Dict[str, tt.Tuple[tt.Optional[str], str]] = {}
+
+    def split(self, title: str) -> tt.Tuple[tt.Optional[str], str]:
+        res = self._cache.get(title)
+        if res is not None:
+            return res
+        res = None, title
+        if self._any.search(title) is not None:
+            # separators are tried by priority, not by position in the title
+            for sep in self.separators:
+                pos = title.find(sep)
+                if pos >= 0:
+                    res = title[:pos], title[pos + len(sep):]
+                    break
+        if len(self._cache) >= SPLIT_CACHE_SIZE:
+            self._cache.clear()
+        self._cache[title] = res
+        return res
+
+
+@functools.lru_cache(maxsize=None)
+def compile_separators(separators: tt.Tuple[str, ...]) -> SeparatorMatcher:
+    return SeparatorMatcher(separators)
+
+
+class TrackRecord(tt.NamedTuple):
+    num: int
+    composer: tt.Optional[str]
+    title: str
+    performer: tt.Optional[str] = None
+
+
+class TitlesResult(tt.NamedTuple):
+    lines: tt.List[str]
+    # lines of grouped performers, empty if there were no tracks
+    performers: tt.List[str]
+
+
 class TitlesGenerator:
     DEFAULT_SEPARATORS = (": ", " - ")
 
-    def __init__(self, composers_mode: ComposersMode, separators: tt.List[str]):
+    def __init__(self, composers_mode: ComposersMode, separators: tt.Optional[tt.List[str]] = None):
         self._composers_mode = composers_mode
         self._separators = separators if separators else self.DEFAULT_SEPARATORS
+        self._matcher = compile_separators(tuple(self._separators))
         self._composer = None
         self._piece = None
 
+    @timed(TITLES)
     def add_track(self, num: int, composer: str, title: str) -> tt.Generator[str, None, None]:
         if self._composers_mode == ComposersMode.Inside:
             yield f"{num}. {composer}: {title}"
@@ -44,7 +99,7 @@ class TitlesGenerator:
                 yield ""
             yield f"[size=16]{composer}[/size]"
             self._composer = composer
-        piece, part = split_piece_part(title, separators=self._separators)
+        piece, part = self._matcher.split(title)
         if piece is not None and piece != self._piece:
             if not separator_shown:
                 if self._piece is None or self._piece != piece:
@@ -55,6 +110,55 @@ class TitlesGenerator:
             self._piece = None
         yield f"{num}. {part}"
 
+    @timed(TITLES)
+    def add_tracks(self, tracks: tt.Iterable[TrackRecord]) -> TitlesResult:
+        """
+        Render the whole disc at once, produces the same lines as add_track called for every track
+        :param tracks: tracks of the disc
+        :return: lines of titles and grouped performers
+        """
+        lines = []
+        performers = []
+        append = lines.append
+        if self._composers_mode == ComposersMode.Inside:
+            for num, composer, title, performer in tracks:
+                append(f"{num}. {composer}: {title}")
+                performers.append(performer)
+        elif self._composers_mode == ComposersMode.Nothing:
+            for num, composer, title, performer in tracks:
+                append(f"{num}. {title}")
+                performers.append(performer)
+        else:
+            split = self._matcher.split
+            cur_composer, cur_piece = self._composer, self._piece
+            for num, composer, title, performer in tracks:
+                performers.append(performer)
+                composer_shown = cur_composer is None or cur_composer != composer
+                if composer_shown:
+                    if cur_composer is not None:
+                        append("")
+                    append(f"[size=16]{composer}[/size]")
+                    cur_composer = composer
+                piece, part = split(title)
+                if piece is not None and piece != cur_piece:
+                    if not composer_shown:
+                        append("")
+                    append(piece)
+                    cur_piece = piece
+                elif piece is None:
+                    cur_piece = None
+                append(f"{num}. {part}")
+            self._composer, self._piece = cur_composer, cur_piece
+        return TitlesResult(lines, list(group_performers(performers)) if performers else [])
+
+
+def render_titles(discs: tt.Iterable[tt.Iterable[TrackRecord]], composers_mode: ComposersMode,
+                  separators: tt.Optional[tt.List[str]] = None) -> tt.List[TitlesResult]:
+    """
+    Render titles of every disc, every disc starts with its own composer
+    """
+    return [TitlesGenerator(composers_mode, separators=separators).add_tracks(tracks) for tracks in discs]
+
 
 def group_performers(performers: tt.List[str]) -> tt.Generator[str, None, None]:
     cur_perf = None
@@ -0,0 +1,291 @@
+"""
+BitTorrent v1 metainfo of release directories: bencoding and parallel piece hashing
+"""
+import os
+import json
+import mmap
+import bisect
+import hashlib
+import pathlib
+import threading
+import typing as tt
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from rt_tools.release_index import ReleaseIndex
+from rt_tools.stats import STATS, HASH
+
+PIECE_HASH_SIZE = 20
+MIN_PIECE_LENGTH = 256 * 1024
+MAX_PIECE_LENGTH = 16 * 1024 * 1024
+# piece length is chosen to keep amount of pieces around this
+TARGET_PIECES = 1500
+# amount of data hashed by one task of the pool, and saved at once into resume file
+TASK_BYTES = 64 * 1024 * 1024
+CREATED_BY = "rt_tools"
+
+Bencodable = tt.Union[int, str, bytes, tt.List[tt.Any], tt.Dict[str, tt.Any]]
+
+
+def bencode(value: Bencodable) -> bytes:
+    """
+    Encode value, keys of dicts are sorted by their raw bytes as the spec requires
+    """
+    if isinstance(value, bool) or not isinstance(value, (int, str, bytes, list, tuple, dict)):
+        raise TypeError(f"Can't bencode {type(value).__name__}")
+    if isinstance(value, int):
+        return b"i%de" % value
+    if isinstance(value, str):
+        value = value.encode("utf-8")
+    if isinstance(value, bytes):
+        return b"%d:%s" % (len(value), value)
+    if isinstance(value, (list, tuple)):
+        return b"l" + b"".join(bencode(v) for v in value) + b"e"
+    items = sorted((k.encode("utf-8") if isinstance(k, str) else k, v) for k, v in value.items())
+    return b"d" + b"".join(bencode(k) + bencode(v) for k, v in items) + b"e"
+
+
+class TorrentFile(tt.NamedTuple):
+    path: pathlib.Path
+    # path inside the torrent
+    parts: tt.Tuple[str, ...]
+    size: int
+    mtime_ns: int
+
+
+def collect_files(root: pathlib.Path, index: tt.Optional[ReleaseIndex] = None,
+                  exclude: tt.Iterable[pathlib.Path] = ()) -> tt.List[TorrentFile]:
+    """
+    Files of the release in the order of the post: directories by path, files by name
+    :param exclude: files to leave out, like the torrent being written
+    """
+    if index is None:
+        index = ReleaseIndex()
+    skip = {os.path.abspath(p) for p in exclude}
+    res = []
+    for disc in index.scan(root):
+        for name in sorted(disc.names):
+            path = disc.path / name
+            if os.path.abspath(path) in skip:
+                continue
+            st = os.stat(path)
+            res.append(TorrentFile(path, path.relative_to(root).parts, st.st_size, st.st_mtime_ns))
+    return res
+
+
+def choose_piece_length(total_size: int) -> int:
+    """
+    Power of two piece length giving about TARGET_PIECES pieces
+    """
+    length = MIN_PIECE_LENGTH
+    while length < MAX_PIECE_LENGTH and total_size // length > TARGET_PIECES:
+        length *= 2
+    return length
+
+
+class _Mapped:
+    """
+    Read-only maps of files opened on demand by one task
+    """
+    def __init__(self, files: tt.List[TorrentFile]):
+        self._files = files
+        self._maps: tt.Dict[int, tt.Tuple[tt.BinaryIO, mmap.mmap, memoryview]] = {}
+
+    def view(self, idx: int) -> memoryview:
+        entry = self._maps.get(idx)
+        if entry is None:
+            f = open(self._files[idx].path, "rb")
+            try:
+                m = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            except BaseException:
+                f.close()
+                raise
+            if hasattr(m, "madvise"):
+                m.madvise(mmap.MADV_SEQUENTIAL)
+            entry = self._maps[idx] = (f, m, memoryview(m))
+        return entry[2]
+
+    def close(self):
+        for f, m, view in self._maps.values():
+            view.release()
+            m.close()
+            f.close()
+        self._maps.clear()
+
+
+class PieceHasher:
+    """
+    Hashes pieces which span across boundaries of files, as if files were one stream
+    """
+    def __init__(self, files: tt.List[TorrentFile], piece_length: int):
+        self.files = files
+        self.piece_length = piece_length
+        # start of every file in the stream, empty files take no room in it
+        self._starts = []
+        self._indexes = []
+        pos = 0
+        for idx, f in enumerate(files):
+            if f.size:
+                self._starts.append(pos)
+                self._indexes.append(idx)
+            pos += f.size
+        self.total_size = pos
+        self.pieces = (pos + piece_length - 1) // piece_length
+
+    def spans(self, start: int, stop: int) -> tt.Generator[tt.Tuple[int, int, int], None, None]:
+        """
+        Parts of files covering [start, stop) of the stream
+        :return: generator of index of file, offset in the file and end in the file
+        """
+        i = bisect.bisect_right(self._starts, start) - 1
+        while start < stop:
+            idx = self._indexes[i]
+            file_start = self._starts[i]
+            end = min(stop, file_start + self.files[idx].size)
+            yield idx, start - file_start, end - file_start
+            start = end
+            i += 1
+
+    def hash_range(self, first: int, last: int) -> bytes:
+        """
+        Hash pieces [first, last)
+        :return: concatenated digests
+        """
+        res = bytearray()
+        mapped = _Mapped(self.files)
+        try:
+            for piece in range(first, last):
+                start = piece * self.piece_length
+                h = hashlib.sha1()
+                # digest of large buffers is computed without GIL, so threads hash in parallel
+                for idx, lo, hi in self.spans(start, min(start + self.piece_length, self.total_size)):
+                    h.update(mapped.view(idx)[lo:hi])
+                res += h.digest()
+        finally:
+            mapped.close()
+        return bytes(res)
+
+    def tasks(self) -> tt.List[tt.Tuple[int, int]]:
+        step = max(1, TASK_BYTES // self.piece_length)
+        return [(first, min(first + step, self.pieces)) for first in range(0, self.pieces, step)]
+
+
+class ResumeFile:
+    """
+    Digests of finished tasks saved as JSON lines after the header line describing inputs.
+    Saved digests are used only if files and piece length are the same.
+    """
+    def __init__(self, path: pathlib.Path, hasher: PieceHasher):
+        self.path = path
+        self.header = {
+            "piece_length": hasher.piece_length,
+            "files": [["/".join(f.parts), f.size, f.mtime_ns] for f in hasher.files],
+        }
+        self._lock = threading.Lock()
+        self._file: tt.Optional[tt.TextIO] = None
+
+    def load(self) -> tt.Dict[int, bytes]:
+        """
+        :return: first piece of task -> digests of the task
+        """
+        res = {}
+        try:
+            with self.path.open(encoding="utf-8") as f:
+                if json.loads(f.readline()) != self.header:
+                    return {}
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        # the last line could be cut by interruption
+                        break
+                    res[entry["first"]] = bytes.fromhex(entry["hashes"])
+        except (OSError, ValueError):
+            return {}
+        return res
+
+    def open(self, done: tt.Dict[int, bytes]):
+        self._file = self.path.open("w", encoding="utf-8")
+        self._file.write(json.dumps(self.header) + "\n")
+        for first, digests in done.items():
+            self._write(first, digests)
+        self._file.flush()
+
+    def _write(self, first: int, digests: bytes):
+        self._file.write(json.dumps({"first": first, "hashes": digests.hex()}) + "\n")
+
+    def save(self, first: int, digests: bytes):
+        with self._lock:
+            self._write(first, digests)
+            self._file.flush()
+
+    def close(self, finished: bool):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        if finished:
+            self.path.unlink()
+
+
+def hash_pieces(hasher: PieceHasher, jobs: int = 1, resume: tt.Optional[ResumeFile] = None,
+                progress: tt.Optional[tt.Callable[[int], None]] = None) -> bytes:
+    """
+    Hash all the pieces on the thread pool
+    :param resume: file to take already computed digests from and to save new ones into
+    :param progress: called with amount of pieces after every task
+    :return: concatenated digests of pieces
+    """
+    done: tt.Dict[int, bytes] = resume.load() if resume is not None else {}
+    tasks = [t for t in hasher.tasks() if t[0] not in done]
+    if resume is not None:
+        resume.open(done)
+    finished = False
+    try:
+        with ThreadPoolExecutor(max_workers=max(1, jobs)) as pool:
+            futures = {pool.submit(hasher.hash_range, first, last): (first, last) for first, last in tasks}
+            try:
+                for future in as_completed(futures):
+                    first, last = futures[future]
+                    done[first] = future.result()
+                    STATS.add(HASH, calls=last - first,
+                              bytes=min(last * hasher.piece_length, hasher.total_size) - first * hasher.piece_length)
+                    if resume is not None:
+                        resume.save(first, done[first])
+                    if progress is not None:
+                        progress(last - first)
+            except BaseException:
+                for future in futures:
+                    future.cancel()
+                raise
+        finished = True
+    finally:
+        if resume is not None:
+            resume.close(finished)
+    return b"".join(done[first] for first in sorted(done))
+
+
+def make_metainfo(name: str, files: tt.List[TorrentFile], piece_length: int, pieces: bytes,
+                  announce: tt.Sequence[str] = (), private: bool = False,
+                  comment: tt.Optional[str] = None, creation_date: tt.Optional[int] = None
+                  ) -> tt.Dict[str, tt.Any]:
+    info = {
+        "name": name,
+        "piece length": piece_length,
+        "pieces": pieces,
+        "files": [{"length": f.size, "path": list(f.parts)} for f in files],
+    }
+    if private:
+        info["private"] = 1
+    res: tt.Dict[str, tt.Any] = {"info": info, "created by": CREATED_BY}
+    if announce:
+        res["announce"] = announce[0]
+        if len(announce) > 1:
+            res["announce-list"] = [[url] for url in announce]
+    if comment:
+        res["comment"] = comment
+    if creation_date is not None:
+        res["creation date"] = creation_date
+    return res
+
+
+def info_hash(metainfo: tt.Dict[str, tt.Any]) -> str:
+    return hashlib.sha1(bencode(metainfo["info"])).hexdigest()
@@ -0,0 +1,85 @@
+"""
+In-memory caches kept warm between runs of commands in the daemon.
+Values are computed from files and dropped once stat of the file changes.
+"""
+import os
+import pathlib
+import threading
+import collections
+import typing as tt
+
+T = tt.TypeVar("T")
+
+DEFAULT_MAX_ENTRIES = 65536
+
+# turned on by the daemon, every hook is a single flag check while off
+ENABLED = False
+
+
+# identity of file for in-memory caches: device, inode, size, mtime_ns
+StatKey = tt.Tuple[int, int, int, int]
+
+
+def stat_key(path: pathlib.Path) -> tt.Optional[StatKey]:
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return st.st_dev, st.st_ino, st.st_size, st.st_mtime_ns
+
+
+class StatCache:
+    """
+    Values of files keyed by resolved path and checked against identity of the file on every access.
+    Clients of the daemon pass paths relative to their own directories, so relative paths never make keys.
+    """
+    def __init__(self, max_entries: int = DEFAULT_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._values: tt.OrderedDict[str, tt.Tuple[tt.Any, tt.Any]] = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, path: pathlib.Path, compute: tt.Callable[[pathlib.Path], T]) -> T:
+        name = str(path.resolve())
+        key = stat_key(path)
+        with self._lock:
+            entry = self._values.get(name)
+            if entry is not None and key is not None and entry[0] == key:
+                self._values.move_to_end(name)
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+        value = compute(path)
+        if key is not None:
+            with self._lock:
+                self._values[name] = (key, value)
+                self._values.move_to_end(name)
+                while len(self._values) > self.max_entries:
+                    self._values.popitem(last=False)
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._values.clear()
+
+    def __len__(self) -> int:
+        return len(self._values)
+
+
+TEXTS = StatCache()
+CUES = StatCache()
+DURATIONS = StatCache()
+LISTINGS = StatCache()
+TAGS = StatCache()
+
+ALL = {"texts": TEXTS, "cues": CUES, "durations": DURATIONS, "listings": LISTINGS, "tags": TAGS}
+
+
+def enable():
+    global ENABLED
+    ENABLED = True
+
+
+def stats() -> str:
+    return ", ".join(f"{name} {len(c)} entries ({c.hits} hits, {c.misses} misses)" for name, c in ALL.items())
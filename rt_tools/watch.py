@@ -0,0 +1,72 @@
+"""
+Polling of release trees for changes
+"""
+import os
+import sys
+import time
+import pathlib
+import traceback
+import typing as tt
+
+DEFAULT_INTERVAL = 0.5
+
+# path -> (size, mtime_ns)
+Snapshot = tt.Dict[str, tt.Tuple[int, int]]
+
+
+def snapshot(roots: tt.Iterable[pathlib.Path]) -> Snapshot:
+    """
+    Stat data of every file under roots, roots could be files too
+    """
+    res = {}
+    stack = [os.path.abspath(r) for r in roots]
+    while stack:
+        path = stack.pop()
+        try:
+            if os.path.isfile(path):
+                st = os.stat(path)
+                res[path] = (st.st_size, st.st_mtime_ns)
+                continue
+            with os.scandir(path) as it:
+                for entry in it:
+                    # symlinks to directories aren't followed, so link cycles don't loop
+                    if entry.is_dir(follow_symlinks=False):
+                        stack.append(entry.path)
+                    else:
+                        st = entry.stat()
+                        res[entry.path] = (st.st_size, st.st_mtime_ns)
+        except OSError:
+            continue
+    return res
+
+
+def watch(roots: tt.Iterable[pathlib.Path], render: tt.Callable[[], tt.Any],
+          interval: float = DEFAULT_INTERVAL, ignore: tt.Iterable[pathlib.Path] = ()):
+    """
+    Call render at start and every time files under roots change, until interrupted
+    :param roots: trees to watch
+    :param render: function to call
+    :param interval: seconds between polls
+    :param ignore: files which changes are not tracked, like output of render itself
+    """
+    roots = list(roots)
+    ignored = {os.path.abspath(p) for p in ignore}
+    last = None
+    try:
+        while True:
+            snap = snapshot(roots)
+            for p in ignored:
+                snap.pop(p, None)
+            if snap != last:
+                last = snap
+                try:
+                    render()
+                except Exception:
+                    # half-written cue or image is usual while editing, wait for the next change
+                    traceback.print_exc(file=sys.stderr)
+                    print(time.strftime("Render failed at %H:%M:%S"), file=sys.stderr)
+                else:
+                    print(time.strftime("Rendered at %H:%M:%S"), file=sys.stderr)
+            time.sleep(interval)
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,40 @@
+import pathlib
+
+from rt_tools.scripts import batch_gen, cue_gen
+from tests.test_cue_gen import make_release, render
+
+
+def make_job(root: pathlib.Path, output: pathlib.Path) -> batch_gen.ReleaseJob:
+    return batch_gen.ReleaseJob(
+        tool=batch_gen.TOOL_CUE, root=root, output=output, mode=cue_gen.GenMode.Full.value,
+        composers="prepend", separators=(), duration=False, use_cache=False, performers=True,
+    )
+
+
+def test_process_release(tmp_path: pathlib.Path):
+    paths = make_release(tmp_path / "rel")
+    out = tmp_path / "rel.txt"
+    res = batch_gen.process_release(make_job(tmp_path / "rel", out))
+    assert res.error is None
+    assert out.read_text(encoding="utf-8") == "".join(l + "\n" for l in map(str, render(paths)))
+
+
+def test_process_release_error(tmp_path: pathlib.Path):
+    res = batch_gen.process_release(make_job(tmp_path / "missing", tmp_path / "missing.txt"))
+    assert "NotADirectoryError" in res.error
+    assert not (tmp_path / "missing.txt").exists()
+
+
+def test_find_releases(tmp_path: pathlib.Path):
+    for name in ("b", "a"):
+        (tmp_path / name).mkdir()
+    (tmp_path / "file.txt").write_text("")
+    assert batch_gen.find_releases(tmp_path) == [tmp_path / "a", tmp_path / "b"]
+
+
+def test_output_names(tmp_path: pathlib.Path):
+    roots = [tmp_path / "Box A" / "CD1", tmp_path / "Box B" / "CD1", tmp_path / "Solo",
+             tmp_path / "x" / "Box A" / "CD1"]
+    assert batch_gen.output_names(roots) == [
+        "Box A - CD1.txt", "Box B - CD1.txt", "Solo.txt", "Box A - CD1 (2).txt",
+    ]
@@ -0,0 +1,31 @@
+import os
+import json
+import pathlib
+import pytest
+
+from rt_tools import flac
+from rt_tools.scripts import cue_gen
+from benchmarks import corpus, runner
+
+BASELINE_PATH = pathlib.Path(__file__).parent.parent / "benchmarks" / "baseline.json"
+
+
+def test_corpus(tmp_path: pathlib.Path):
+    cue_paths = corpus.generate_release(tmp_path, discs=3, tracks=7)
+    assert cue_paths == sorted(tmp_path.glob("**/*.cue"))
+    _, cue = cue_gen.load_cue(cue_paths[0])
+    assert len(cue.tracks) == 7
+    assert cue.tracks[0].performer.split(";")[0] in corpus.COMPOSERS
+    assert flac.read_stream_info(cue_paths[0].with_suffix(".flac")).total_samples > 0
+    assert cue_paths[0].with_suffix(".log").read_text("utf-16").startswith("Exact Audio Copy")
+
+
+@pytest.mark.benchmark
+def test_no_regressions():
+    if not BASELINE_PATH.exists():
+        pytest.skip("no baseline, create it with: python -m benchmarks.runner --save " + str(BASELINE_PATH))
+    baseline = json.loads(BASELINE_PATH.read_text())
+    params = baseline["params"]
+    results = runner.run(params["discs"], params["tracks"], seed=params["seed"])
+    threshold = float(os.environ.get("RT_BENCH_THRESHOLD", runner.DEFAULT_THRESHOLD))
+    assert runner.compare(results, baseline, threshold) == []
@@ -0,0 +1,64 @@
+import os
+import pathlib
+import datetime
+
+from rt_tools import cache, durations
+from tests.test_flac import flac_header
+
+
+def test_duration_cache(tmp_path: pathlib.Path):
+    p = tmp_path / "a.flac"
+    p.write_bytes(flac_header(total_samples=44100 * 10))
+    db_path = tmp_path / "cache" / "d.sqlite"
+
+    with cache.DurationCache(db_path) as c:
+        assert durations.get_flac_durations([p], cache=c)[0].total_seconds() == 10
+        assert (c.hits, c.misses) == (0, 1)
+
+    with cache.DurationCache(db_path) as c:
+        assert c.get(p) == datetime.timedelta(seconds=10)
+        # changed file invalidates the entry
+        p.write_bytes(flac_header(total_samples=44100 * 20))
+        os.utime(p, ns=(0, 0))
+        assert c.get(p) is None
+        assert c.prune() == 1
+        assert durations.get_flac_durations([p], cache=c)[0].total_seconds() == 20
+        assert c.get(p).total_seconds() == 20
+        assert (c.hits, c.misses) == (2, 2)
+        p.unlink()
+        assert c.prune() == 1
+
+
+def test_duration_cache_file_changed_while_probed(tmp_path: pathlib.Path, monkeypatch):
+    p = tmp_path / "a.flac"
+    p.write_bytes(flac_header(total_samples=44100 * 10))
+    probe = durations.get_flac_duration
+
+    def rewriting_probe(path: pathlib.Path) -> datetime.timedelta:
+        res = probe(path)
+        path.write_bytes(flac_header(total_samples=44100 * 20) + b"tail")
+        return res
+
+    monkeypatch.setattr(durations, "get_flac_duration", rewriting_probe)
+    with cache.DurationCache(tmp_path / "d.sqlite") as c:
+        assert durations.get_flac_durations([p], cache=c)[0].total_seconds() == 10
+        # stored under identity of the old file, so the new one is probed again
+        assert c.get(p) is None
+
+
+def test_section_cache(tmp_path: pathlib.Path):
+    p = tmp_path / "a.cue"
+    p.write_text("x")
+    key = cache.fingerprint([p, None], ("full",))
+    assert key == cache.fingerprint([p, None], ("full",))
+    assert key != cache.fingerprint([p, None], ("titles",))
+
+    with cache.SectionCache(tmp_path / "s.sqlite") as c:
+        assert c.get(key) is None
+        c.put(key, "section")
+        assert c.get(key) == "section"
+        assert c.prune() == 0
+        assert c.prune(max_age_days=-1) == 1
+
+    p.write_text("changed")
+    assert key != cache.fingerprint([p, None], ("full",))
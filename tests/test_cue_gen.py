@@ -0,0 +1,58 @@
+import pathlib
+
+from rt_tools import cache
+from rt_tools.titles import ComposersMode
+from rt_tools.scripts import cue_gen
+
+CUE = """REM GENRE Classical
+PERFORMER "Orchestra"
+TITLE "Disc {idx}"
+FILE "CD{idx}.flac" WAVE
+  TRACK 01 AUDIO
+    TITLE "Concerto: I. Allegro"
+    PERFORMER "Bach; Soloist"
+    INDEX 01 00:00:00
+  TRACK 02 AUDIO
+    TITLE "Concerto: II. Adagio"
+    PERFORMER "Bach; Soloist"
+    INDEX 01 03:10:00
+"""
+
+
+def make_release(root: pathlib.Path, discs: int = 3) -> list:
+    paths = []
+    for idx in range(1, discs + 1):
+        d = root / f"CD{idx}"
+        d.mkdir(parents=True)
+        p = d / f"CD{idx}.cue"
+        p.write_text(CUE.format(idx=idx), encoding="utf-8")
+        (d / f"CD{idx}.log").write_text(f"log {idx}\n")
+        paths.append(p)
+    return paths
+
+
+def render(cue_paths, **kwargs) -> list:
+    return list(cue_gen.generate_output(cue_gen.GenMode.Full, cue_paths, ComposersMode.Prepend,
+                                        separators=[], **kwargs))
+
+
+def test_generate_output_lazy(tmp_path: pathlib.Path):
+    paths = make_release(tmp_path)
+    expected = render(paths)
+    assert expected[:5] == ['[spoiler="CD1 - [:]"]', "[size=16]Bach[/size]", "Concerto",
+                            "1. I. Allegro", "2. II. Adagio"]
+    assert render(iter(paths)) == expected
+    assert render(iter(paths), read_ahead=2) == expected
+    assert list(cue_gen.iter_cue_paths([str(tmp_path)])) == paths
+
+
+def test_generate_output_incremental(tmp_path: pathlib.Path):
+    paths = make_release(tmp_path / "release")
+    expected = "\n".join(map(str, render(paths)))
+    with cache.SectionCache(tmp_path / "sections.sqlite") as sections:
+        for hits in (0, 3):
+            assert "\n".join(map(str, render(paths, section_cache=sections))) == expected
+            assert sections.hits == hits
+        paths[1].with_suffix(".log").write_text("new log\n")
+        assert "new log" in "\n".join(map(str, render(paths, section_cache=sections)))
+        assert (sections.hits, sections.misses) == (5, 4)
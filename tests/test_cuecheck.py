@@ -0,0 +1,49 @@
+import pathlib
+
+from rt_tools.scripts import cue_check
+from tests.test_flac import flac_header
+
+CUE = """FILE "{file}" WAVE
+  TRACK 01 AUDIO
+    INDEX 01 00:00:00
+  TRACK 02 AUDIO
+    INDEX 01 {start}
+"""
+
+
+def make_disc(root: pathlib.Path, name: str, samples: int, file: str = None, start: str = "03:00:00") -> pathlib.Path:
+    d = root / name
+    d.mkdir(parents=True)
+    (d / f"{name}.flac").write_bytes(flac_header(total_samples=samples))
+    p = d / f"{name}.cue"
+    p.write_text(CUE.format(file=file or f"{name}.flac", start=start))
+    return p
+
+
+def test_check_cue(tmp_path: pathlib.Path):
+    frame = 588
+    cases = {
+        "ok": (make_disc(tmp_path, "ok", 44100 * 300), []),
+        "wav": (make_disc(tmp_path, "wav", 44100 * 300, file="wav.wav"), []),
+        "missing": (make_disc(tmp_path, "missing", 44100 * 300, file="other.flac"), ['missing file "other.flac"']),
+        "past": (make_disc(tmp_path, "past", 44100 * 100),
+                 ['track 2 starts at 03:00:00, past the end of "past.flac" at 01:40:00']),
+        "offframe": (make_disc(tmp_path, "offframe", 44100 * 300 + 100),
+                     ['"offframe.flac" length is 100 samples off CD frame boundary']),
+        "short": (make_disc(tmp_path, "short", 44100 * 180 + frame * 150),
+                  ['last track 2 of "short.flac" is only 2.00s long']),
+        "order": (make_disc(tmp_path, "order", 44100 * 300, start="00:00:00"),
+                  ["track 2 doesn't start after previous track"]),
+    }
+    (tmp_path / "broken").mkdir()
+    (tmp_path / "broken" / "broken.flac").write_bytes(b"RIFF" + bytes(100))
+    (tmp_path / "broken" / "broken.cue").write_text(CUE.format(file="broken.flac", start="03:00:00"))
+    cases["broken"] = (tmp_path / "broken" / "broken.cue", ['"broken.flac" is not a flac file'])
+
+    for name, (path, expected) in cases.items():
+        assert cue_check.check_disc(path) == expected, name
+
+    (tmp_path / "noindex.cue").write_text('FILE "ok/ok.flac" WAVE\n  TRACK 01 AUDIO\n')
+    assert cue_check.check_disc(tmp_path / "noindex.cue") == ["track 1 has no INDEX"]
+    (tmp_path / "empty.cue").write_text("")
+    assert cue_check.check_disc(tmp_path / "empty.cue") == ["no tracks"]
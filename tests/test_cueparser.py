@@ -0,0 +1,211 @@
+import random
+import io
+import datetime
+import tracemalloc
+
+from rt_tools import cueparser
+from tests import legacy_cueparser
+
+HEADER = "%performer% - %title%\n%file%\n%tracks%"
+TRACK = "%performer% - %title%"
+
+# songwriter is not compared: legacy parser leaks first track's SONGWRITER into the sheet
+SHEET_ATTRS = ("rem", "performer", "title", "file", "aformat")
+# flags, isrc and rem of tracks are not compared: legacy regexps cut first and last
+# characters of unquoted values, duration is not compared as legacy treats CD frames as 1/100 s
+TRACK_ATTRS = ("number", "performer", "songwriter", "title", "index", "offset", "cuetime")
+
+
+def gen_cue(rnd: random.Random) -> str:
+    lines = [
+        'REM GENRE "Classical"',
+        f"REM DATE {rnd.randint(1950, 2020)}",
+        f"REM DISCID {rnd.getrandbits(32):08X}",
+        'REM COMMENT "ExactAudioCopy v1.6"',
+        f'PERFORMER "Orchestra {rnd.randint(1, 9)}"',
+        f'TITLE "Disc {rnd.randint(1, 300)}"',
+        f'FILE "CD{rnd.randint(1, 99):02}.flac" WAVE',
+    ]
+    frames = 0
+    for num in range(1, rnd.randint(1, 99) + 1):
+        lines.append(f"  TRACK {num:02} AUDIO")
+        lines.append(f'    TITLE "Concerto No. {num}: {rnd.choice(["I.", "II.", "III."])} Allegro"')
+        if rnd.random() < 0.7:
+            lines.append(f'    PERFORMER "Bach; Soloist {rnd.randint(1, 5)}"')
+        if rnd.random() < 0.3:
+            lines.append(f'    SONGWRITER "Composer {rnd.randint(1, 5)}"')
+        if rnd.random() < 0.3:
+            lines.append("    FLAGS DCP")
+        if rnd.random() < 0.5:
+            lines.append(f"    ISRC USABC{rnd.randint(0, 9999999):07}")
+        if rnd.random() < 0.3:
+            lines.append('    REM COMPOSER "Bach"')
+        if num > 1 and rnd.random() < 0.3:
+            lines.append(f"    INDEX 00 {frames // 4500:02}:{frames // 75 % 60:02}:{frames % 75:02}")
+            frames += rnd.randint(1, 300)
+        lines.append(f"    INDEX 01 {frames // 4500:02}:{frames // 75 % 60:02}:{frames % 75:02}")
+        frames += rnd.randint(75, 75 * 60 * 20)
+    return "\r\n".join(lines) + "\r\n"
+
+
+def parse(module, text: str):
+    sheet = module.CueSheet()
+    sheet.setOutputFormat(HEADER, TRACK)
+    sheet.setData(text)
+    sheet.parse()
+    return sheet
+
+
+def test_differential_corpus():
+    rnd = random.Random(42)
+    for _ in range(200):
+        text = gen_cue(rnd)
+        new = parse(cueparser, text)
+        old = parse(legacy_cueparser, text)
+        for attr in SHEET_ATTRS:
+            assert getattr(new, attr) == getattr(old, attr), attr
+        assert len(new.tracks) == len(old.tracks)
+        for new_track, old_track in zip(new.tracks, old.tracks):
+            for attr in TRACK_ATTRS:
+                assert getattr(new_track, attr) == getattr(old_track, attr), attr
+        for idx, track in enumerate(new.tracks[:-1]):
+            assert cueparser.timedeltaToFrames(track.duration) == new.frames[idx+1] - new.frames[idx]
+        assert repr(new) == repr(old)
+
+
+def test_long_sheet_no_recursion():
+    lines = ['FILE "a.flac" WAVE']
+    for num in range(1, 5001):
+        lines += [f"TRACK {num:02} AUDIO", f'TITLE "t{num}"', f"INDEX 01 {num:02}:00:00"]
+    sheet = parse(cueparser, "\n".join(lines))
+    assert len(sheet.tracks) == 5000
+    assert sheet.tracks[-1].title == "t5000"
+
+
+def test_index_00_01():
+    sheet = parse(cueparser, "\n".join([
+        'FILE "a.flac" WAVE',
+        "TRACK 01 AUDIO",
+        "INDEX 01 00:00:00",
+        "TRACK 02 AUDIO",
+        "INDEX 00 01:58:00",
+        "INDEX 01 02:00:00",
+        "INDEX 02 02:30:00",
+    ]))
+    track = sheet.tracks[1]
+    assert (track.index, track.offset, track.pregap) == ("01", "02:00:00", "01:58:00")
+    assert sheet.tracks[0].duration.total_seconds() == 120
+
+
+def test_multiple_files():
+    sheet = parse(cueparser, "\n".join([
+        '\ufeffPERFORMER "Perf"',
+        'FILE "01.flac" WAVE',
+        "TRACK 01 AUDIO",
+        'TITLE "One"',
+        "INDEX 01 00:00:00",
+        "TRACK 02 AUDIO",
+        "INDEX 01 03:00:00",
+        'FILE "02.flac" WAVE',
+        "TRACK 03 AUDIO",
+        'TITLE "Three"',
+        "INDEX 01 00:00:00",
+    ]))
+    assert (sheet.performer, sheet.file, sheet.aformat) == ("Perf", "01.flac", "WAVE")
+    assert [t.file for t in sheet.tracks] == ["01.flac", "01.flac", "02.flac"]
+    assert sheet.tracks[0].duration.total_seconds() == 180
+    # duration across FILE boundary is unknown
+    assert sheet.tracks[1].duration is None
+    assert sheet.tracks[2].title == "Three"
+
+
+def test_frames():
+    assert cueparser.offsetToFrames("01:02:74") == (62 * 75) + 74
+    assert cueparser.offsetToTimedelta("00:01:15").total_seconds() == 1.2
+    assert cueparser.timedeltaToFrames(cueparser.framesToTimedelta(123456)) == 123456
+
+    sheet = parse(cueparser, "\n".join([
+        'FILE "a.flac" WAVE',
+        "TRACK 01 AUDIO",
+        "INDEX 01 00:00:00",
+        "TRACK 02 AUDIO",
+        "INDEX 01 00:10:30",
+        "TRACK 03 AUDIO",
+        "INDEX 01 01:00:00",
+    ]))
+    assert list(sheet.frames) == [0, 780, 4500]
+    assert sheet.tracks[0].duration.total_seconds() == 10.4
+    assert sheet.tracks[2].duration is None
+    sheet.setLength(datetime.timedelta(minutes=2))
+    assert sheet.tracks[2].duration.total_seconds() == 60
+
+    tracks = sheet.getTracksByTime([0, 779, 780, datetime.timedelta(seconds=59), datetime.timedelta(hours=1)])
+    assert [t.number for t in tracks] == [1, 1, 2, 2, 3]
+    assert sheet.getTrackByTime(-1) is None
+    assert sheet.getTrackByTime(100, file="other.flac") is None
+
+
+def test_tracks_by_time_without_index():
+    sheet = parse(cueparser, "\n".join([
+        'FILE "a.flac" WAVE',
+        "TRACK 01 AUDIO",
+        "INDEX 01 00:00:00",
+        "TRACK 02 AUDIO",
+        "TRACK 03 AUDIO",
+        "INDEX 01 05:00:00",
+    ]))
+    assert list(sheet.frames) == [0, cueparser.NO_OFFSET, 22500]
+    tracks = sheet.getTracksByTime([datetime.timedelta(seconds=10), datetime.timedelta(seconds=200), 22500])
+    assert [t.number for t in tracks] == [1, 1, 3]
+    assert sheet.getTrackByTime(-1) is None
+
+
+def test_templates():
+    header = "%rem%|%isrc%|%file%|%performer%%title%|50%|%unknown%\n%tracks%"
+    track = "%number%. %performer% - %title% [%cuetime%] %offset% %index% %file% %%"
+    rnd = random.Random(1)
+    for _ in range(20):
+        text = gen_cue(rnd)
+        new, old = cueparser.CueSheet(), legacy_cueparser.CueSheet()
+        for sheet in (new, old):
+            sheet.setOutputFormat(header, track)
+            sheet.setData(text)
+            sheet.parse()
+        assert repr(new) == repr(old)
+        assert new.renderTracks() == [repr(t) for t in old.tracks]
+
+        out = io.StringIO()
+        cueparser.writeTracks([new, new], out)
+        assert out.getvalue() == "".join(line + "\n" for line in cueparser.renderTracks([new, new]))
+
+    sheet = parse(cueparser, 'FILE "a.flac" WAVE\nTRACK 01 AUDIO\nINDEX 01 00:00:00\nTRACK 02 AUDIO\nINDEX 01 01:05:00')
+    sheet.setOutputFormat(HEADER, "%number% %duration% %cuetime% %title%")
+    assert sheet.renderTracks() == ["01 01:05 00:00:00 %title%", "02  00:01:05 %title%"]
+
+
+def test_track_views():
+    sheet = parse(cueparser, 'FILE "a.flac" WAVE\nTRACK 01 AUDIO\nTITLE "One"\nINDEX 01 00:00:00\nTRACK 02 AUDIO')
+    assert sheet.data == []
+    assert sheet.tracks[0] == sheet.tracks[-2] and sheet.tracks[0] != sheet.tracks[1]
+    assert [t.number for t in sheet.tracks[::-1]] == [2, 1]
+    sheet.tracks[1].title = "Two"
+    assert [t.title for t in sheet.tracks] == ["One", "Two"]
+    assert (sheet.tracks[1].cuetime, sheet.tracks[1].duration) == (None, None)
+
+    track = cueparser.CueTrack()
+    track.setOutputFormat("%number% %title%")
+    track.title = "Solo"
+    assert repr(track) == "01 Solo"
+
+
+def test_memory_per_track():
+    rnd = random.Random(3)
+    texts = [gen_cue(rnd) for _ in range(30)]
+    per_track = {}
+    for module in (cueparser, legacy_cueparser):
+        tracemalloc.start()
+        sheets = [parse(module, text) for text in texts]
+        current, _ = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        per_track[module] = current / sum(len(s.tracks) for s in sheets)
+    assert per_track[cueparser] < per_track[legacy_cueparser] / 2
@@ -0,0 +1,69 @@
+import os
+import json
+import socket
+import struct
+import pathlib
+import threading
+
+from rt_tools import daemon, warm
+from tests.test_cue_gen import make_release
+
+
+def test_stat_cache(tmp_path: pathlib.Path):
+    p = tmp_path / "a.txt"
+    p.write_text("one")
+    cache = warm.StatCache()
+    assert cache.get(p, lambda path: path.read_text()) == "one"
+    assert cache.get(p, lambda path: "never called") == "one"
+    p.write_text("three")
+    assert cache.get(p, lambda path: path.read_text()) == "three"
+    assert (cache.hits, cache.misses) == (1, 2)
+    assert cache.get(tmp_path / "missing", lambda path: None) is None
+    assert len(cache) == 1
+
+
+def test_stat_cache_relative_paths(tmp_path: pathlib.Path, monkeypatch):
+    for name in ("a", "b"):
+        (tmp_path / name).mkdir()
+        (tmp_path / name / "x.txt").write_text(name)
+    cache = warm.StatCache()
+    # the same relative path from directories of different clients
+    monkeypatch.chdir(tmp_path / "a")
+    assert cache.get(pathlib.Path("x.txt"), lambda path: path.read_text()) == "a"
+    monkeypatch.chdir(tmp_path / "b")
+    assert cache.get(pathlib.Path("x.txt"), lambda path: path.read_text()) == "b"
+    assert cache.get(tmp_path / "a" / "x.txt", lambda path: "never called") == "a"
+    assert (cache.hits, cache.misses) == (1, 2)
+
+
+def test_handle(tmp_path: pathlib.Path):
+    make_release(tmp_path / "rel", discs=2)
+    server, client = socket.socketpair()
+    request = {"command": "cue_gen", "args": ["-m", "full", "rel"], "cwd": str(tmp_path)}
+    client.sendall(json.dumps(request).encode() + b"\n")
+    thread = threading.Thread(target=daemon.handle, args=(server,))
+    thread.start()
+
+    frames = {daemon.CHANNEL_STDOUT: b"", daemon.CHANNEL_STDERR: b""}
+    while True:
+        channel, size = daemon._HEADER.unpack(daemon._recv_exact(client, daemon._HEADER.size))
+        payload = daemon._recv_exact(client, size)
+        if channel == daemon.CHANNEL_EXIT:
+            break
+        frames[channel] += payload
+    thread.join()
+    server.close()
+    client.close()
+
+    assert struct.unpack(">i", payload)[0] == 0
+    out = frames[daemon.CHANNEL_STDOUT].decode()
+    assert out.startswith('[spoiler="CD1 - [:]"]') and "log 2" in out
+    assert os.getcwd() != str(tmp_path)
+
+
+def test_run_without_daemon(tmp_path: pathlib.Path, capsys):
+    make_release(tmp_path, discs=1)
+    code = daemon.run("cue_gen", ["-m", "logs", str(tmp_path)], socket_path=tmp_path / "no.sock")
+    assert code == 0
+    assert "log 1" in capsys.readouterr().out
+    assert daemon.run("cue_gen", ["--no-such-option"], socket_path=tmp_path / "no.sock") == 2
@@ -0,0 +1,79 @@
+import pathlib
+import subprocess
+
+from rt_tools import discid, durations
+from rt_tools.scripts import disc_check
+from tests.test_flac import flac_header
+
+CUE = """PERFORMER "Orchestra"
+FILE "CD{idx}.flac" WAVE
+  TRACK 01 AUDIO
+    INDEX 01 00:00:00
+  TRACK 02 AUDIO
+    INDEX 00 03:08:00
+    INDEX 01 03:10:{frames:02}
+  TRACK 03 AUDIO
+    INDEX 01 07:00:00
+"""
+
+
+def test_disc_ids():
+    # TOC from libdiscid documentation, offsets there include lead-in
+    toc = discid.Toc(tuple(o - 150 for o in (150, 15363, 32314, 46592, 63414, 80489)), 95462 - 150)
+    assert toc.musicbrainz_id() == "49HHV7Eb8UKF3aQiNmu1GR8vKTY-"
+    assert toc.cddb_id() == "3404f606"
+    assert toc.accuraterip_id().startswith("006-")
+    assert discid.Toc.loads(toc.dumps()) == toc
+    shifted = discid.Toc(tuple(o + 33 for o in toc.offsets), toc.leadout + 33)
+    assert shifted.matches(toc) and shifted.musicbrainz_id() != toc.musicbrainz_id()
+
+
+def make_disc(root: pathlib.Path, idx: int, frames: int = 0, seconds: int = 600) -> pathlib.Path:
+    d = root / f"CD{idx}"
+    d.mkdir(parents=True)
+    (d / f"CD{idx}.flac").write_bytes(flac_header(total_samples=44100 * seconds))
+    p = d / f"CD{idx}.cue"
+    p.write_text(CUE.format(idx=idx, frames=frames))
+    return p
+
+
+def test_index_and_check(tmp_path: pathlib.Path):
+    lib = tmp_path / "lib"
+    cue = make_disc(lib, 1)
+    make_disc(lib, 2, frames=30)
+    make_disc(lib, 3, seconds=700)
+    (lib / "CD4").mkdir()
+    (lib / "CD4" / "CD4.cue").write_text(CUE.format(idx=4, frames=0))
+
+    toc = disc_check.read_toc(cue)
+    assert toc == discid.Toc((0, 190 * 75, 420 * 75), 600 * 75)
+    with discid.DiscIdIndex(tmp_path / "ids.sqlite") as ids:
+        assert disc_check.index_discs(ids, lib) == (4, 0, 0)
+        # cue without TOC is read again, its audio file could be added later
+        assert disc_check.index_discs(ids, lib) == (1, 3, 0)
+        assert ids.stats().endswith("4 cues, 3 with TOC")
+
+        new = make_disc(tmp_path / "new", 1)
+        _, matches = disc_check.check_cue(ids, new)
+        assert [(m.path, m.exact) for m in matches] == [(cue, True), (lib / "CD2" / "CD2.cue", False)]
+        assert [m.path for m in disc_check.check_cue(ids, new, tolerance=0)[1]] == [cue]
+        assert disc_check.check_cue(ids, new, tolerance=29)[1][1:] == []
+        assert [m.path for m in disc_check.check_cue(ids, cue)[1]] == [lib / "CD2" / "CD2.cue"]
+
+        (lib / "CD2" / "CD2.cue").unlink()
+        assert disc_check.index_discs(ids, lib) == (1, 2, 1)
+
+        (lib / "CD4" / "CD4.flac").write_bytes(flac_header(total_samples=44100 * 600))
+        assert disc_check.index_discs(ids, lib) == (1, 2, 0)
+        assert ids.stats().endswith("3 cues, 3 with TOC")
+        assert disc_check.index_discs(ids, lib) == (0, 3, 0)
+
+
+def test_read_toc_not_audio(tmp_path: pathlib.Path, monkeypatch):
+    def ffprobe(path: pathlib.Path):
+        raise subprocess.CalledProcessError(1, ["ffprobe", str(path)])
+
+    monkeypatch.setattr(durations, "get_ffprobe_duration", ffprobe)
+    cue = make_disc(tmp_path, 1)
+    cue.with_suffix(".flac").write_bytes(b"not audio")
+    assert disc_check.read_toc(cue) is None
@@ -0,0 +1,103 @@
+import os
+import pathlib
+
+import pytest
+
+from rt_tools.cache import DigestCache
+from rt_tools.scripts import img_copy
+from rt_tools.filecopy import CopyMode, copy_file, file_hash, is_unchanged
+from rt_tools.scripts.img_copy import CoverCopy, copy_covers, dedup_covers, distinct_destinations
+
+
+@pytest.mark.parametrize("mode", list(CopyMode))
+def test_copy_file(tmp_path: pathlib.Path, mode: CopyMode):
+    src = tmp_path / "src.jpeg"
+    src.write_bytes(os.urandom(3 * 1024 * 1024 + 7))
+    dst = tmp_path / "dst.jpeg"
+    dst.write_bytes(b"old")
+    copy_file(src, dst, mode)
+    assert dst.read_bytes() == src.read_bytes()
+    assert is_unchanged(src, dst)
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["dst.jpeg", "src.jpeg"]
+
+
+def test_is_unchanged(tmp_path: pathlib.Path):
+    src, dst = tmp_path / "a", tmp_path / "b"
+    assert not is_unchanged(src, dst)
+    src.write_bytes(b"abc")
+    dst.write_bytes(b"abc")
+    os.utime(dst, ns=(0, 0))
+    assert not is_unchanged(src, dst)
+    assert is_unchanged(src, dst, check_hash=True)
+    dst.write_bytes(b"abd")
+    os.utime(dst, ns=(0, 0))
+    assert not is_unchanged(src, dst, check_hash=True)
+    assert file_hash(src) != file_hash(dst)
+
+
+def test_copy_covers_dedup(tmp_path: pathlib.Path):
+    copies = []
+    for idx, data in enumerate((b"front", b"other", b"front"), start=1):
+        src = tmp_path / f"CD{idx}" / "Front.jpeg"
+        src.parent.mkdir()
+        src.write_bytes(data)
+        copies.append(CoverCopy(src, tmp_path / f"CD{idx}.jpeg"))
+
+    unique, mapping = dedup_covers(copies)
+    assert [c.dst.name for c in unique] == ["CD1.jpeg", "CD2.jpeg"]
+    assert [p.name for p in mapping] == ["CD1.jpeg", "CD2.jpeg", "CD1.jpeg"]
+
+    assert copy_covers(unique) == [True, True]
+    assert copy_covers(unique) == [False, False]
+    assert (tmp_path / "CD2.jpeg").read_bytes() == b"other"
+
+
+def test_dedup_covers_cache(tmp_path: pathlib.Path, monkeypatch):
+    copies = []
+    for idx, data in enumerate((b"front", b"front"), start=1):
+        src = tmp_path / f"CD{idx}" / "Front.jpeg"
+        src.parent.mkdir()
+        src.write_bytes(data)
+        copies.append(CoverCopy(src, tmp_path / f"CD{idx}.jpeg"))
+
+    hashed = []
+
+    def _hash(path: pathlib.Path) -> str:
+        hashed.append(path)
+        return file_hash(path)
+
+    monkeypatch.setattr(img_copy, "file_hash", _hash)
+    with DigestCache(tmp_path / "digests.sqlite") as cache:
+        assert len(dedup_covers(copies, cache=cache)[0]) == 1
+        assert len(dedup_covers(copies, cache=cache)[0]) == 1
+        assert hashed == [c.src for c in copies]
+        assert cache.stats().endswith("2 hits, 2 misses")
+
+        copies[1].src.write_bytes(b"other")
+        os.utime(copies[1].src, ns=(1, 1))
+        assert len(dedup_covers(copies, cache=cache)[0]) == 2
+        assert hashed[2:] == [copies[1].src]
+
+
+def test_copy_file_concurrent(tmp_path: pathlib.Path):
+    dst = tmp_path / "Disc.jpeg"
+    copies = []
+    for idx in range(32):
+        src = tmp_path / f"{idx}.jpeg"
+        src.write_bytes(b"cover %d" % idx)
+        copies.append(CoverCopy(src, dst))
+    assert all(copy_covers(copies, jobs=16))
+    assert dst.read_bytes() in {c.src.read_bytes() for c in copies}
+    assert [p.name for p in tmp_path.iterdir() if p.name.endswith(".tmp")] == []
+
+
+def test_distinct_destinations(tmp_path: pathlib.Path):
+    copies = [
+        CoverCopy(tmp_path / "Disc 1" / "Front.jpeg", tmp_path / "Disc.jpeg"),
+        CoverCopy(tmp_path / "Disc 2" / "Front.jpeg", tmp_path / "Disc.jpeg"),
+        CoverCopy(tmp_path / "Disc-2" / "Front.jpeg", tmp_path / "Disc-2.jpeg"),
+        CoverCopy(tmp_path / "Disc 3" / "Front.jpeg", tmp_path / "Disc.jpeg"),
+    ]
+    res = distinct_destinations(copies)
+    assert [c.src for c in res] == [c.src for c in copies]
+    assert [c.dst.name for c in res] == ["Disc.jpeg", "Disc-3.jpeg", "Disc-2.jpeg", "Disc-4.jpeg"]
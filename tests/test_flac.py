@@ -0,0 +1,99 @@
+import pathlib
+import pytest
+
+from rt_tools import flac, durations
+
+
+def flac_header(sample_rate: int = 44100, total_samples: int = 44100 * 90,
+                channels: int = 2, bps: int = 16) -> bytes:
+    packed = (sample_rate << 44) | ((channels - 1) << 41) | ((bps - 1) << 36) | total_samples
+    body = (4096).to_bytes(2, "big") * 2 + bytes(6) + packed.to_bytes(8, "big") + bytes(16)
+    return flac.FLAC_MAGIC + bytes([0x80 | flac.BLOCK_STREAMINFO]) + len(body).to_bytes(3, "big") + body
+
+
+def test_read_stream_info(tmp_path: pathlib.Path):
+    p = tmp_path / "a.flac"
+    p.write_bytes(flac_header(sample_rate=96000, total_samples=96000 * 61 + 48000, bps=24) + bytes(1000))
+    info = flac.read_stream_info(p)
+    assert info == flac.StreamInfo(sample_rate=96000, channels=2, bits_per_sample=24,
+                                   total_samples=96000 * 61 + 48000)
+    assert info.duration.total_seconds() == 61.5
+    assert durations.get_flac_duration(p).total_seconds() == 61.5
+
+
+def test_read_stream_info_id3(tmp_path: pathlib.Path):
+    p = tmp_path / "a.flac"
+    p.write_bytes(b"ID3\x04\x00\x00\x00\x00\x01\x00" + bytes(128) + flac_header())
+    assert flac.read_stream_info(p).duration.total_seconds() == 90
+
+
+def test_not_flac(tmp_path: pathlib.Path):
+    p = tmp_path / "a.flac"
+    p.write_bytes(b"RIFF" + bytes(100))
+    with pytest.raises(ValueError):
+        flac.read_stream_info(p)
+    p.write_bytes(flac_header(total_samples=0))
+    assert flac.read_stream_info(p).duration is None
+
+
+def test_get_flac_durations_order(tmp_path: pathlib.Path):
+    paths = []
+    for idx in range(20):
+        p = tmp_path / f"{idx}.flac"
+        p.write_bytes(flac_header(total_samples=44100 * (idx + 1)))
+        paths.append(p)
+    res = durations.get_flac_durations(paths, jobs=4)
+    assert [d.total_seconds() for d in res] == list(range(1, 21))
+
+
+def metadata_block(block_type: int, body: bytes, last: bool = False) -> bytes:
+    return bytes([(0x80 if last else 0) | block_type]) + len(body).to_bytes(3, "big") + body
+
+
+def vorbis_comment(fields: list) -> bytes:
+    vendor = b"reference libFLAC 1.4.3"
+    body = len(vendor).to_bytes(4, "little") + vendor + len(fields).to_bytes(4, "little")
+    for f in fields:
+        data = f.encode()
+        body += len(data).to_bytes(4, "little") + data
+    return body
+
+
+def cuesheet(offsets: list) -> bytes:
+    body = bytes(128) + (88200).to_bytes(8, "big") + bytes([0x80]) + bytes(258) + bytes([len(offsets)])
+    for number, offset in enumerate(offsets, start=1):
+        body += offset.to_bytes(8, "big") + bytes([number]) + b"ISRC00000001" + bytes(14) + bytes([1])
+        body += bytes(12)
+    return body
+
+
+def tagged_flac(fields: list, total_samples: int = 44100 * 90, picture_size: int = 0) -> bytes:
+    head = flac_header(total_samples=total_samples)
+    blocks = []
+    if picture_size:
+        blocks.append(metadata_block(6, bytes(picture_size)))
+    blocks.append(metadata_block(flac.BLOCK_VORBIS_COMMENT, vorbis_comment(fields)))
+    blocks.append(metadata_block(flac.BLOCK_CUESHEET, cuesheet([0, 44100 * 30]), last=True))
+    # flac_header marks STREAMINFO as the last block
+    return head[:4] + bytes([head[4] & 0x7F]) + head[5:] + b"".join(blocks) + bytes(100)
+
+
+def test_read_metadata(tmp_path: pathlib.Path):
+    p = tmp_path / "a.flac"
+    fields = ["TITLE=Concerto: I. Allegro", "composer=Bach", "ARTIST=Soloist", "ARTIST=Orchestra",
+              "TRACKNUMBER=3/12", "DISCNUMBER=2", "broken"]
+    for picture_size in (0, flac.HEADER_READ_SIZE * 2):
+        p.write_bytes(tagged_flac(fields, picture_size=picture_size))
+        meta = flac.read_metadata(p)
+        assert meta.duration.total_seconds() == 90
+        assert (meta.title, meta.composer, meta.performer) == ("Concerto: I. Allegro", "Bach", "Soloist, Orchestra")
+        assert (meta.track_number, meta.disc_number) == (3, 2)
+        assert meta.cuesheet == [flac.CueSheetTrack(1, 0, "ISRC00000001"),
+                                 flac.CueSheetTrack(2, 44100 * 30, "ISRC00000001")]
+
+    p.write_bytes(flac_header())
+    meta = flac.read_metadata(p)
+    assert (meta.comments, meta.cuesheet, meta.track_number) == ({}, [], None)
+    p.write_bytes(tagged_flac(fields)[:200])
+    with pytest.raises(ValueError):
+        flac.read_metadata(p)
@@ -0,0 +1,58 @@
+import sys
+import struct
+import pathlib
+
+from rt_tools import imageinfo
+from rt_tools.scripts import img_copy
+
+
+def jpeg(width: int, height: int, exif_size: int = 100) -> bytes:
+    app0 = b"\xff\xe0" + struct.pack(">H", 16) + b"JFIF\x00" + bytes(9)
+    app1 = b"\xff\xe1" + struct.pack(">H", exif_size + 2) + bytes(exif_size)
+    dht = b"\xff\xc4" + struct.pack(">H", 5) + bytes(3)
+    sof = b"\xff\xc2" + struct.pack(">HBHHB", 11, 8, height, width, 1) + bytes(3)
+    return imageinfo.JPEG_MAGIC + app0 + app1 + dht + b"\xff" + sof + b"\xff\xda" + bytes(1000)
+
+
+def png(width: int, height: int) -> bytes:
+    return imageinfo.PNG_MAGIC + struct.pack(">I", 13) + b"IHDR" + struct.pack(">II", width, height) + bytes(500)
+
+
+def test_probe_image(tmp_path: pathlib.Path):
+    files = {"a.jpg": jpeg(1200, 1000), "b.jpg": jpeg(640, 480, exif_size=60000), "c.png": png(300, 301),
+             "d.jpg": jpeg(10, 10, exif_size=60000)[:3000], "e.txt": b"text"}
+    for name, data in files.items():
+        (tmp_path / name).write_bytes(data)
+    paths = [tmp_path / name for name in files]
+    res = imageinfo.probe_images(paths, jobs=4)
+    assert res[:3] == [
+        imageinfo.ImageInfo(paths[0], "jpeg", 1200, 1000, len(files["a.jpg"])),
+        imageinfo.ImageInfo(paths[1], "jpeg", 640, 480, len(files["b.jpg"])),
+        imageinfo.ImageInfo(paths[2], "png", 300, 301, len(files["c.png"])),
+    ]
+    assert res[3:] == [None, None]
+    assert imageinfo.probe_image(tmp_path / "missing.jpg") is None
+    assert str(res[2]) == "png 300x301, 1 KiB"
+
+
+def test_img_copy_best(tmp_path: pathlib.Path, monkeypatch, capsys):
+    disc = tmp_path / "rel" / "CD1"
+    disc.mkdir(parents=True)
+    (disc / "CD1.cue").write_text("")
+    (disc / "Front.jpeg").write_bytes(jpeg(200, 200))
+    (disc / "cover.png").write_bytes(png(1000, 1000))
+    (disc / "back.jpg").write_bytes(jpeg(1400, 1400))
+    out = tmp_path / "out"
+
+    monkeypatch.setattr(sys, "argv", ["img_copy", "-o", str(out), "--best", "--report",
+                                      "--min-side", "500", "--max-side", "1200", str(tmp_path / "rel")])
+    img_copy.main()
+    lines = capsys.readouterr().out.splitlines()
+    assert f"{disc / 'Front.jpeg'}: jpeg 200x200, 1 KiB" in lines
+    assert f"Skipping {disc / 'back.jpg'}: 1400x1400 is larger than 1200px" in lines
+    assert (out / "CD1.png").read_bytes() == (disc / "cover.png").read_bytes()
+
+    monkeypatch.setattr(sys, "argv", ["img_copy", "-o", str(out), "--min-side", "500", str(tmp_path / "rel")])
+    img_copy.main()
+    assert capsys.readouterr().out.splitlines()[-1] == f"Skipping {disc}"
+    assert not (out / "CD1.jpeg").exists()
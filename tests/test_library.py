@@ -0,0 +1,69 @@
+import os
+import pathlib
+import subprocess
+
+from rt_tools import library, durations
+from rt_tools.scripts import lib_index
+from tests.test_cue_gen import make_release
+from tests.test_flac import flac_header
+
+
+def test_build_query():
+    assert library.build_query(["Op.", "27"]) == '"Op." "27"'
+    assert library.build_query(["conc*"], "title") == 'title : ("conc"*)'
+    assert library.build_query(["*"]) == ""
+
+
+def test_index_and_search(tmp_path: pathlib.Path):
+    paths = make_release(tmp_path / "lib", discs=3)
+    with library.LibraryIndex(tmp_path / "library.sqlite") as lib:
+        assert lib_index.index_library(lib, tmp_path / "lib") == (3, 0, 0)
+        assert lib_index.index_library(lib, tmp_path / "lib") == (0, 3, 0)
+
+        matches = lib.search(library.build_query(["adagio"]))
+        assert [m.disc.path for m in matches] == paths
+        disc, tracks = matches[0]
+        assert (disc.performer, disc.title, disc.tracks, disc.seconds) == ("Orchestra", "Disc 1", 2, None)
+        assert tracks == [library.TrackInfo(2, "Concerto: II. Adagio", "Soloist", "Bach", None)]
+
+        first = lib.search(library.build_query(["allegro"]) + " AND " + library.build_query(["Bach"], "composer"))
+        assert first[0].tracks[0].seconds == 190.0
+        assert len(lib.search(library.build_query(["2"], "album"))) == 1
+        assert len(lib.search(library.build_query(["Bach"], "performer"))) == 0
+        assert len(lib.search(library.build_query(["alle*"]), limit=2)) == 2
+
+        paths[0].write_text(paths[0].read_text().replace("Adagio", "Largo"), encoding="utf-8")
+        os.utime(paths[0], ns=(0, 0))
+        paths[2].unlink()
+        assert lib_index.index_library(lib, tmp_path / "lib") == (1, 1, 1)
+        assert [m.disc.path for m in lib.search(library.build_query(["adagio"]))] == paths[1:2]
+        assert [m.disc.path for m in lib.search(library.build_query(["largo"]))] == paths[:1]
+        assert lib_index.index_library(lib, tmp_path / "other") == (0, 0, 0)
+        assert len(lib.known(tmp_path / "lib")) == 2
+
+
+def test_index_unreadable_cue(tmp_path: pathlib.Path, capsys):
+    paths = make_release(tmp_path / "lib", discs=2)
+    paths[0].write_text(paths[0].read_text().replace("INDEX 01 00:00:00", "INDEX 01 xx:00:00"), encoding="utf-8")
+    with library.LibraryIndex(tmp_path / "library.sqlite") as lib:
+        assert lib_index.index_library(lib, tmp_path / "lib") == (2, 0, 0)
+        assert f"{paths[0]}: cue is not readable" in capsys.readouterr().err
+        assert [m.disc.path for m in lib.search(library.build_query(["adagio"]))] == paths[1:]
+        # failed cue isn't parsed again until changed
+        assert lib_index.index_library(lib, tmp_path / "lib") == (0, 2, 0)
+        assert capsys.readouterr().err == ""
+
+
+def test_index_unreadable_duration(tmp_path: pathlib.Path, monkeypatch, capsys):
+    def ffprobe(path: pathlib.Path):
+        raise subprocess.CalledProcessError(1, ["ffprobe", str(path)])
+
+    monkeypatch.setattr(durations, "get_ffprobe_duration", ffprobe)
+    paths = make_release(tmp_path / "lib", discs=3)
+    for idx, p in enumerate(paths):
+        p.with_suffix(".flac").write_bytes(flac_header(total_samples=44100 * 600) if idx != 1 else b"not audio")
+    with library.LibraryIndex(tmp_path / "library.sqlite") as lib:
+        assert lib_index.index_library(lib, tmp_path / "lib", calculate_duration=True, jobs=2) == (3, 0, 0)
+        assert f"{paths[1].with_suffix('.flac')}: duration is not readable" in capsys.readouterr().err
+        matches = lib.search(library.build_query(["adagio"]))
+        assert [m.disc.seconds for m in matches] == [600, None, 600]
@@ -0,0 +1,31 @@
+import pathlib
+
+from rt_tools import textfiles, output
+
+TEXT = "Exact Audio Copy\r\nТрек 1\r\n" * 500
+
+
+def test_embedded_file_chunks(tmp_path: pathlib.Path, monkeypatch):
+    monkeypatch.setattr(textfiles, "MMAP_MIN_SIZE", 100)
+    monkeypatch.setattr(textfiles, "CHUNK_SIZE", 33)
+    for encoding in ("utf-8", "utf-16", "cp1251"):
+        p = tmp_path / f"{encoding}.log"
+        data = TEXT.encode(encoding)
+        if encoding == "cp1251":
+            # 0x98 isn't defined in cp1251
+            data += b"\x98\r\n"
+        p.write_bytes(data)
+        expected = textfiles.decode(data)
+        assert len(list(textfiles.iter_text_chunks(p))) > 1
+        assert "".join(textfiles.iter_text_chunks(p)) == expected
+        assert str(output.EmbeddedFile(p, skip_head=1, skip_tail=1)) == expected[1:-1]
+        assert str(output.EmbeddedFile(p, skip_head=1)) == expected[1:]
+
+
+def test_output_sink(tmp_path: pathlib.Path):
+    p = tmp_path / "dr14.txt"
+    p.write_text("\nreport\n")
+    out_path = tmp_path / "out.txt"
+    with output.OutputSink(out_path, buffer_size=4) as out:
+        out.lines(["a", output.EmbeddedFile(p, skip_head=1, skip_tail=1), ""])
+    assert out_path.read_text() == "a\nreport\n\n"
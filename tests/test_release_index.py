@@ -0,0 +1,34 @@
+import pathlib
+
+from rt_tools.release_index import ReleaseIndex
+
+
+def test_release_index(tmp_path: pathlib.Path):
+    for name in ("CD1/a.cue", "CD1/a.flac", "CD1/a.log", "CD1/audiochecker.log", "CD1/dr14.txt",
+                 "CD1/Front.jpeg", "CD2/x/b.cue", "CD2/01.flac", "CD2/02.flac", "info.txt"):
+        p = tmp_path / name
+        p.parent.mkdir(parents=True, exist_ok=True)
+        p.write_text("")
+
+    index = ReleaseIndex()
+    assert index.cues(tmp_path) == sorted(tmp_path.glob("**/*.cue"))
+    assert [d.path for d in index.flac_dirs(tmp_path)] == [tmp_path / "CD1", tmp_path / "CD2"]
+
+    disc = index.dir(tmp_path / "CD1")
+    assert disc.rip_logs == [tmp_path / "CD1" / "a.log"]
+    assert disc.audiochecker_log == tmp_path / "CD1" / "audiochecker.log"
+    assert disc.dr_reports == [tmp_path / "CD1" / "dr14.txt"]
+    assert disc.covers == [tmp_path / "CD1" / "Front.jpeg"]
+    assert disc.has("Front.jpeg") and not disc.has("Back.jpeg")
+    assert index.dir(tmp_path / "CD2").flacs == [tmp_path / "CD2" / "01.flac", tmp_path / "CD2" / "02.flac"]
+
+
+def test_release_index_symlinks(tmp_path: pathlib.Path):
+    (tmp_path / "CD1").mkdir()
+    (tmp_path / "CD1" / "a.cue").write_text("")
+    (tmp_path / "CD1" / "loop").symlink_to("..")
+    (tmp_path / "copy").symlink_to("CD1")
+
+    index = ReleaseIndex()
+    assert index.cues(tmp_path) == [tmp_path / "CD1" / "a.cue"]
+    assert not index.dir(tmp_path / "CD1").has("loop")
@@ -0,0 +1,106 @@
+import random
+import pathlib
+
+from rt_tools import riplog
+from benchmarks.corpus import make_log
+
+XLD_LOG = """X Lossless Decoder version 20191004 (152.2)
+
+Used drive : PIONEER BD-RW   BDR-XD05 (revision 1.10)
+Ripper mode             : XLD Secure Ripper
+Read offset correction  : 667
+
+Track 01
+    AccurateRip v1 signature : 12345678
+        ->Accurately ripped (v1+v2, confidence 3+5/12)
+    CRC32 hash (test run)  : 1A2B3C4D
+    CRC32 hash             : 1A2B3C4E
+    CRC32 hash (skip zero) : 00000000
+    Statistics
+        Read error                           : 0
+        Jitter error (maybe fixed)           : 2
+        Peak                                 : 0.982391
+
+Track 02
+        ->Track not present in AccurateRip database.
+    CRC32 hash             : 0000FFFF
+
+Some inconsistencies found
+"""
+
+EAC_RANGE_LOG = """Exact Audio Copy V1.6 from 23. October 2020
+
+Used drive  : PLEXTOR DVDR   PX-716A   Adapter: 1  ID: 0
+Read mode               : Burst
+Read offset correction                      : 30
+
+Range status and errors
+
+Selected range
+
+     Suspicious position 0:02:20
+
+     Peak level 100.0 %
+     Test CRC 0ABCDEF1
+     Copy CRC 0ABCDEF1
+     Copy finished
+
+AccurateRip summary
+
+Track  1  accurately ripped (confidence 12)  [ABCD1234]  (AR v2)
+Track  2  cannot be verified as accurate (confidence 3)  [11111111], AccurateRip returned [22222222]  (AR v2)
+Track  3  not present in database
+
+There were errors
+"""
+
+
+def test_eac_log(tmp_path: pathlib.Path):
+    p = tmp_path / "CD1.log"
+    p.write_text(make_log(random.Random(1), 1, 3), encoding="utf-16")
+    log = riplog.analyze_log(p)
+    assert (log.ripper, log.drive, log.read_mode, log.read_offset) == \
+           (riplog.RIPPER_EAC, "PLEXTOR DVDR PX-716A", "Secure", 30)
+    assert [t.number for t in log.tracks] == [1, 2, 3]
+    assert all(t.copy_ok and t.ar_status == riplog.AR_ACCURATE and t.test_crc == t.copy_crc
+               for t in log.tracks)
+    assert log.problems() == []
+    summary = list(log.summary())
+    assert len(summary) == 6 and summary[-1] == "Problems: none"
+
+
+def test_xld_log():
+    log = riplog.analyze_lines(XLD_LOG.split("\n"))
+    assert (log.ripper, log.read_mode, log.read_offset) == (riplog.RIPPER_XLD, "XLD Secure Ripper", 667)
+    t1, t2 = log.tracks
+    assert (t1.test_crc, t1.copy_crc, t1.ar_confidence, round(t1.peak, 1)) == ("1A2B3C4D", "1A2B3C4E", 8, 98.2)
+    assert (t2.ar_status, t2.copy_crc, t2.copy_ok) == (riplog.AR_NOT_PRESENT, "0000FFFF", None)
+    assert log.problems() == [
+        "Some inconsistencies found",
+        "track 1: test and copy CRC differ",
+        "track 1: Jitter error (maybe fixed) : 2",
+    ]
+
+
+def test_eac_range_log():
+    log = riplog.analyze_lines(EAC_RANGE_LOG.split("\n"))
+    assert [(t.number, t.ar_status, t.ar_confidence) for t in log.tracks] == [
+        (riplog.RANGE_TRACK, None, None),
+        (1, riplog.AR_ACCURATE, 12),
+        (2, riplog.AR_INACCURATE, 3),
+        (3, riplog.AR_NOT_PRESENT, None),
+    ]
+    assert log.problems() == [
+        "read mode is Burst",
+        "There were errors",
+        "range: copy is not OK",
+        "range: Suspicious position 0:02:20",
+        "track 2: not accurate in AccurateRip",
+    ]
+
+
+def test_iter_lines():
+    text = "a\nbb\n\nccc"
+    for size in range(1, len(text) + 1):
+        chunks = [text[i:i + size] for i in range(0, len(text), size)]
+        assert list(riplog.iter_lines(chunks)) == text.split("\n")
@@ -0,0 +1,58 @@
+import json
+import pathlib
+
+from rt_tools import stats
+
+
+@stats.timed("func")
+def func(x: int) -> int:
+    return x * 2
+
+
+@stats.timed("gen")
+def gen(n: int):
+    for i in range(n):
+        yield i
+    return n
+
+
+def gen_result(n: int):
+    res = yield from gen(n)
+    return res
+
+
+def run_all():
+    assert func(2) == 4
+    assert list(gen(3)) == [0, 1, 2]
+    g = gen_result(2)
+    assert list(g) == [0, 1]
+    stats.STATS.count(stats.SUBPROCESSES)
+    stats.STATS.add_bytes("func", 10)
+
+
+def test_disabled():
+    stats.STATS.reset()
+    run_all()
+    assert stats.STATS.as_dict() == {"phases": {}, "counters": {}}
+
+
+def test_enabled(tmp_path: pathlib.Path):
+    stats.STATS.reset()
+    stats.STATS.enabled = True
+    try:
+        run_all()
+        with stats.STATS.phase("block"):
+            pass
+    finally:
+        stats.STATS.enabled = False
+    data = stats.STATS.as_dict()
+    assert {name: (p["calls"], p["bytes"]) for name, p in data["phases"].items()} == {
+        "func": (1, 10), "gen": (2, 0), "block": (1, 0),
+    }
+    assert data["counters"] == {stats.SUBPROCESSES: 1}
+    assert len(list(stats.STATS.format_table())) == 5
+
+    path = tmp_path / "stats.json"
+    stats.report(path)
+    assert json.loads(path.read_text()) == data
+    stats.STATS.reset()
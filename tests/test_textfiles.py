@@ -0,0 +1,34 @@
+import pathlib
+
+from rt_tools import textfiles
+
+TEXT = "Exact Audio Copy\nТрек 1\n"
+
+
+def test_detect_encoding():
+    assert textfiles.detect_encoding(TEXT.encode("utf-8")) == "utf-8"
+    assert textfiles.detect_encoding(TEXT.encode("utf-8-sig")) == "utf-8-sig"
+    assert textfiles.detect_encoding(TEXT.encode("utf-16")) == "utf-16"
+    assert textfiles.detect_encoding("Exact Audio Copy log".encode("utf-16-le")) == "utf-16-le"
+    assert textfiles.detect_encoding("Exact Audio Copy log".encode("utf-16-be")) == "utf-16-be"
+    assert textfiles.detect_encoding(TEXT.encode("cp1251")) == "cp1251"
+
+
+def test_decode():
+    for encoding in ("utf-8", "utf-8-sig", "utf-16", "cp1251"):
+        assert textfiles.decode(TEXT.replace("\n", "\r\n").encode(encoding)) == TEXT
+    # 0x98 isn't defined in cp1251
+    assert textfiles.decode("Трек".encode("cp1251") + b"\x98 1\n") == "Трек\ufffd 1\n"
+
+
+def test_text_cache(tmp_path: pathlib.Path):
+    p1, p2 = tmp_path / "1.log", tmp_path / "2.log"
+    p1.write_text(TEXT, encoding="utf-16")
+    p2.write_text("x" * 100)
+    cache = textfiles.TextCache(max_bytes=len(TEXT) + 10)
+    assert cache.read(p1) == TEXT
+    p1.write_text("changed")
+    assert cache.read(p1) == TEXT
+    assert cache.read(p2) == "x" * 100
+    # p1 was evicted by size limit
+    assert cache.read(p1) == "changed"
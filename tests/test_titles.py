@@ -1,3 +1,5 @@
+import random
+
 from rt_tools import titles
 
 
@@ -53,3 +55,38 @@ def test_group_performers():
         "1-2. p1",
         "3. p2"
     ]
+
+
+def test_separator_matcher():
+    rnd = random.Random(1)
+    separators = [" - ", "- ", ": ", ", "]
+    for _ in range(2000):
+        title = "".join(rnd.choice(["a", " ", "-", ":", ","]) for _ in range(rnd.randint(0, 12)))
+        for n in range(1, len(separators) + 1):
+            assert titles.compile_separators(tuple(separators[:n])).split(title) == \
+                   titles.split_piece_part(title, separators[:n])
+
+
+def test_add_tracks_same_as_add_track():
+    rnd = random.Random(2)
+    composers = ["Bach", "Chopin", None, ""]
+    pieces = ["Concerto", "Sonata: No. 2", "Suite - Prelude", ""]
+    parts = ["I. Allegro", "II. Adagio", "Fuga", "- Coda"]
+    performers = ["p1", "p2", None]
+    for mode in titles.ComposersMode:
+        for separators in ([], [" - "], [": ", " - "]):
+            for _ in range(200):
+                tracks = [
+                    titles.TrackRecord(num, rnd.choice(composers),
+                                       rnd.choice([f"{rnd.choice(pieces)}: {rnd.choice(parts)}",
+                                                   f"{rnd.choice(pieces)} - {rnd.choice(parts)}",
+                                                   rnd.choice(parts)]),
+                                       rnd.choice(performers))
+                    for num in range(1, rnd.randint(0, 12))
+                ]
+                gen = titles.TitlesGenerator(mode, separators=separators)
+                expected = [l for t in tracks for l in gen.add_track(t.num, t.composer, t.title)]
+                res = titles.TitlesGenerator(mode, separators=separators).add_tracks(tracks)
+                assert res.lines == expected
+                expected_perfs = list(titles.group_performers([t.performer for t in tracks])) if tracks else []
+                assert res.performers == expected_perfs
@@ -0,0 +1,76 @@
+import hashlib
+import pathlib
+import pytest
+
+from rt_tools import torrent
+
+
+def test_bencode():
+    assert torrent.bencode({"b": [1, "x"], "a": b"\x00", "c": {}}) == b"d1:a1:\x001:bli1e1:xe1:cdee"
+    assert torrent.bencode(-3) == b"i-3e"
+    with pytest.raises(TypeError):
+        torrent.bencode(1.5)
+
+
+def make_release(root: pathlib.Path) -> bytes:
+    (root / "CD2").mkdir(parents=True)
+    (root / "CD1").mkdir()
+    contents = [("a.txt", b"x" * 1000), ("CD1/01.flac", bytes(range(256)) * 300),
+                ("CD1/02.flac", b""), ("CD2/01.flac", b"y" * 70001)]
+    for name, data in contents:
+        (root / name).write_bytes(data)
+    return b"".join(data for _, data in contents)
+
+
+def expected_pieces(stream: bytes, piece_length: int) -> bytes:
+    return b"".join(hashlib.sha1(stream[i:i + piece_length]).digest()
+                    for i in range(0, len(stream), piece_length))
+
+
+def test_hash_pieces(tmp_path: pathlib.Path):
+    stream = make_release(tmp_path / "rel")
+    files = torrent.collect_files(tmp_path / "rel")
+    assert [f.parts for f in files] == [("a.txt",), ("CD1", "01.flac"), ("CD1", "02.flac"), ("CD2", "01.flac")]
+    for piece_length, jobs in ((16384, 1), (32768, 4), (1 << 20, 2)):
+        hasher = torrent.PieceHasher(files, piece_length)
+        assert torrent.hash_pieces(hasher, jobs=jobs) == expected_pieces(stream, piece_length)
+
+    meta = torrent.make_metainfo("rel", files, 16384, b"", announce=["http://a", "http://b"], private=True)
+    assert meta["announce-list"] == [["http://a"], ["http://b"]]
+    assert meta["info"]["files"][1] == {"length": 76800, "path": ["CD1", "01.flac"]}
+    assert torrent.choose_piece_length(0) == torrent.MIN_PIECE_LENGTH
+    assert torrent.choose_piece_length(40 * 2**30) == torrent.MAX_PIECE_LENGTH
+    assert torrent.choose_piece_length(2 * 2**30) == 2 * 2**20
+
+
+def test_resume(tmp_path: pathlib.Path, monkeypatch):
+    stream = make_release(tmp_path / "rel")
+    files = torrent.collect_files(tmp_path / "rel")
+    monkeypatch.setattr(torrent, "TASK_BYTES", 32768)
+    hasher = torrent.PieceHasher(files, 16384)
+    resume = torrent.ResumeFile(tmp_path / "rel.torrent.resume", hasher)
+
+    calls = []
+    hash_range = hasher.hash_range
+
+    def failing(first, last):
+        calls.append(first)
+        if first >= 4:
+            raise KeyboardInterrupt
+        return hash_range(first, last)
+
+    monkeypatch.setattr(hasher, "hash_range", failing)
+    with pytest.raises(KeyboardInterrupt):
+        torrent.hash_pieces(hasher, resume=resume)
+    assert set(resume.load()) == {0, 2}
+
+    calls.clear()
+    monkeypatch.setattr(hasher, "hash_range", lambda first, last: (calls.append(first), hash_range(first, last))[1])
+    assert torrent.hash_pieces(hasher, resume=resume) == expected_pieces(stream, 16384)
+    assert 0 not in calls and 2 not in calls
+    assert not resume.path.exists()
+
+    # files changed since interruption, saved digests are not used
+    resume.open({0: b"\x00" * 40})
+    resume.close(finished=False)
+    assert torrent.ResumeFile(resume.path, torrent.PieceHasher(files, 32768)).load() == {}
@@ -0,0 +1,35 @@
+import io
+import pathlib
+
+from rt_tools.output import OutputSink
+from rt_tools.scripts import trk_gen
+from tests.test_flac import flac_header, tagged_flac
+
+
+def render_dir(dir: pathlib.Path, **kwargs) -> str:
+    buf = io.StringIO()
+    with OutputSink(stream=buf) as out:
+        trk_gen.generate_dir(dir, out=out, **kwargs)
+    return buf.getvalue()
+
+
+def test_generate_dir_tags(tmp_path: pathlib.Path):
+    # names are sorted against track numbers, so order comes from tags
+    for name, num, performer in (("a.flac", 2, "Soloist"), ("b.flac", 1, "Soloist"), ("c.flac", 3, "Choir")):
+        (tmp_path / name).write_bytes(tagged_flac([f"TITLE=Mass: Part {num}", "COMPOSER=Bach",
+                                                   f"PERFORMER={performer}", f"TRACKNUMBER={num}"]))
+    res = render_dir(tmp_path, calc_duration=True)
+    assert res.splitlines()[:11] == [
+        f'[spoiler="{tmp_path.name} - [4:30]"]', "[size=16]Bach[/size]", "Mass",
+        "1. Part 1", "2. Part 2", "3. Part 3", "", "[b]Исполнители[/b]:", "1-2. Soloist", "3. Choir", "[/spoiler]",
+    ]
+
+
+def test_generate_dir_untagged(tmp_path: pathlib.Path):
+    (tmp_path / "01. Concerto - I. Allegro.flac").write_bytes(flac_header())
+    (tmp_path / "02. Concerto - II. Adagio.flac").write_bytes(b"not flac")
+    res = render_dir(tmp_path)
+    assert res.splitlines()[:7] == [
+        f'[spoiler="{tmp_path.name}"]', "[size=16][/size]", "Concerto ",
+        "1. I. Allegro", "2. II. Adagio", "", "[b]Исполнители[/b]:",
+    ]
@@ -0,0 +1,35 @@
+import pathlib
+
+from rt_tools import watch
+
+
+def test_watch_survives_render_errors(tmp_path: pathlib.Path, monkeypatch, capsys):
+    src = tmp_path / "disc.cue"
+    src.write_text("broken")
+    calls = []
+
+    def render():
+        calls.append(src.read_text())
+        if len(calls) == 1:
+            raise ValueError("bad cue")
+
+    def sleep(_):
+        if len(calls) == 1:
+            src.write_text("fixed cue")
+        else:
+            raise KeyboardInterrupt
+
+    monkeypatch.setattr(watch.time, "sleep", sleep)
+    watch.watch([tmp_path], render)
+    assert calls == ["broken", "fixed cue"]
+    err = capsys.readouterr().err
+    assert "ValueError: bad cue" in err
+    assert "Rendered at" in err
+
+
+def test_snapshot_symlinks(tmp_path: pathlib.Path):
+    (tmp_path / "CD1").mkdir()
+    (tmp_path / "CD1" / "a.cue").write_text("cue")
+    (tmp_path / "CD1" / "loop").symlink_to("..")
+    snap = watch.snapshot([tmp_path])
+    assert sorted(snap) == [str(tmp_path / "CD1" / "a.cue"), str(tmp_path / "CD1" / "loop")]